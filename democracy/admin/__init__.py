@@ -1,7 +1,6 @@
 from functools import partial
 
 from django import forms
-from django.conf import settings
 from django.contrib import admin
 from django.contrib.admin.widgets import FilteredSelectMultiple
 from django.db.models import TextField
@@ -20,8 +19,9 @@ from parler.forms import TranslatableModelForm, TranslatableBaseInlineFormSet
 from democracy import models
 from democracy.admin.widgets import Select2SelectMultiple, ShortTextAreaWidget
 from democracy.enums import InitialSectionType
+from democracy.models.section import section_types
 from democracy.models.utils import copy_hearing
-from democracy.plugins import get_implementation
+from democracy.plugins import plugin_registry
 
 
 class FixedModelForm(TranslatableModelForm):
@@ -106,7 +106,7 @@ class SectionInline(NestedStackedInline, TranslatableStackedInline):
             kwargs["initial"] = _("Enter text here.")
         if not getattr(obj, "pk", None):
             if db_field.name == "type":
-                kwargs["initial"] = models.SectionType.objects.get(identifier=InitialSectionType.MAIN)
+                kwargs["initial"] = section_types.get(InitialSectionType.MAIN)
             elif db_field.name == "content":
                 kwargs["initial"] = _("Enter the introduction text for the hearing here.")
         field = super().formfield_for_dbfield(db_field, **kwargs)
@@ -120,7 +120,7 @@ class SectionInline(NestedStackedInline, TranslatableStackedInline):
 
     def _get_plugin_selection_widget(self, hearing):
         choices = [("", "------")]
-        plugins = getattr(settings, "DEMOCRACY_PLUGINS")
+        plugins = plugin_registry.load()
         if hearing and hearing.pk:
             current_plugin_identifiers = set(hearing.sections.values_list("plugin_identifier", flat=True))
         else:
@@ -129,8 +129,8 @@ class SectionInline(NestedStackedInline, TranslatableStackedInline):
             if plugin_identifier and plugin_identifier not in plugins:
                 # The plugin has been unregistered or something?
                 choices.append((plugin_identifier, plugin_identifier))
-        for idfr, classpath in sorted(plugins.items()):
-            choices.append((idfr, get_implementation(idfr).display_name or idfr))
+        for idfr, plugin_class in sorted(plugins.items()):
+            choices.append((idfr, plugin_class.display_name or idfr))
         widget = forms.Select(choices=choices)
         return widget
 
@@ -200,10 +200,8 @@ class HearingAdmin(NestedModelAdminMixin, HearingGeoAdmin, TranslatableAdmin):
         if not self.has_delete_permission(request):
             raise PermissionDenied
 
-        hearing_count = queryset.count()
+        hearing_count = queryset.soft_delete(cascade=True)
         if hearing_count:
-            for hearing in queryset:
-                hearing.soft_delete()
             self.message_user(request, _('Successfully deleted %(count)d %(items)s.') % {
                 'count': hearing_count, 'items': model_ngettext(self.opts, hearing_count)
             })
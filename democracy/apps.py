@@ -6,3 +6,8 @@ from django.utils.translation import ugettext_lazy as _
 class DemocracyAppConfig(AppConfig):
     name = 'democracy'
     verbose_name = _("Participatory Democracy")
+
+    def ready(self):
+        from democracy.plugins import plugin_registry
+        # fail at startup rather than on the first comment if DEMOCRACY_PLUGINS is misconfigured
+        plugin_registry.load()
@@ -0,0 +1,139 @@
+"""
+JWT authentication with the validated tokens cached in process memory.
+
+The frontend sends the same token with many requests, and `helusers.jwt.JWTAuthentication` verifies
+it, looks the user up by UUID, checks the username for duplicates and looks the user up again for every
+one of them. `CachedJWTAuthentication` remembers the user of each validated token in a small LRU cache
+for `DEMOCRACY_JWT_CACHE_TTL` seconds, at most until the token expires, so that a cached token costs a
+single query for the (active) user.
+
+Changes to the user data in the token are only applied when the token is not cached.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db.models.query import prefetch_related_objects
+from helusers.jwt import JWTAuthentication
+
+# The relations of the user needed by most views, see `kerrokantasi.models.User.get_default_organization`
+USER_PREFETCH_LOOKUPS = ('admin_organizations',)
+
+
+class TokenCache(object):
+    """
+    A thread-safe LRU cache of token digest to user pk, with an expiry time for each entry.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_pk, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user_pk
+
+    def set(self, key, user_pk, token_expires_at=None):
+        """
+        :param token_expires_at: The expiry time of the token as a Unix timestamp, if any
+        """
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            self._entries[key] = (user_pk, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """
+    Get the token cache configured with `DEMOCRACY_JWT_CACHE_SIZE` and `DEMOCRACY_JWT_CACHE_TTL`,
+    or None if tokens are not cached.
+
+    :rtype: TokenCache|None
+    """
+    global _token_cache
+    max_size = getattr(settings, 'DEMOCRACY_JWT_CACHE_SIZE', 1000)
+    ttl = getattr(settings, 'DEMOCRACY_JWT_CACHE_TTL', 60)
+    if not (max_size and ttl):
+        return None
+    with _token_cache_lock:
+        if _token_cache is None:
+            _token_cache = TokenCache(max_size, ttl)
+        return _token_cache
+
+
+def reset_token_cache(setting, **kwargs):
+    global _token_cache
+    if setting.startswith('DEMOCRACY_JWT_CACHE') or setting in ('JWT_AUTH', 'AUTH_USER_MODEL'):
+        _token_cache = None
+
+
+setting_changed.connect(reset_token_cache)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    `helusers.jwt.JWTAuthentication` with the validated tokens cached, see the module docstring.
+
+    The admin organizations of the authenticated user are prefetched.
+    """
+    token_expires_at = None
+
+    def authenticate(self, request):
+        jwt_value = self.get_jwt_value(request)
+        if jwt_value is None:
+            return None
+        token_cache = get_token_cache()
+        key = hashlib.sha256(jwt_value).hexdigest()
+        if token_cache is not None:
+            user_pk = token_cache.get(key)
+            if user_pk is not None:
+                user = get_user_model().objects.prefetch_related(*USER_PREFETCH_LOOKUPS).filter(
+                    pk=user_pk, is_active=True
+                ).first()
+                if user is not None:
+                    return (user, jwt_value)
+                token_cache.delete(key)
+
+        user, jwt_value = super().authenticate(request)
+        prefetch_related_objects([user], USER_PREFETCH_LOOKUPS)
+        if token_cache is not None:
+            token_cache.set(key, user.pk, self.token_expires_at)
+        return (user, jwt_value)
+
+    def authenticate_credentials(self, payload):
+        user = super().authenticate_credentials(payload)
+        self.token_expires_at = payload.get('exp')
+        return user
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Fast creation of large amounts of users and hearings with sections, comments, votes and images.
+
+The field values come from the regular factories, but the objects are saved with `bulk_create`,
+so no `save()` methods or signals are run: derived values such as comment counts are set here.
+All the randomness comes from the `random` module, so the data can be repeated with `seed_random()`.
+"""
+import random
+import string
+import uuid
+from io import BytesIO
+
+import factory
+import factory.fuzzy
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.utils import translation
+from django.utils.text import slugify
+from faker.generator import random as faker_random
+from PIL import Image
+
+from democracy.enums import Commenting, InitialSectionType
+from democracy.factories.hearing import HearingFactory, LabelFactory, SectionCommentFactory, SectionFactory
+from democracy.factories.user import UserFactory
+from democracy.models import Hearing, Label, Section, SectionComment, SectionImage
+from democracy.models.section import section_types
+
+BATCH_SIZE = 500
+
+
+def seed_random(seed):
+    """
+    Seed all the random number generators used by the factories, for repeatable data.
+    """
+    random.seed(seed)
+    factory.fuzzy.reseed_random(seed)
+    faker_random.seed(seed)
+
+
+def generate_id():
+    """
+    Like `democracy.models.base.generate_id`, but seedable.
+    """
+    return ''.join(random.choice(string.ascii_letters + string.digits) for x in range(32))
+
+
+def build_attributes(factory_class, **overrides):
+    """
+    Generate the declared field values of a factory without creating an object or running post generation hooks.
+    """
+    return factory_class.attributes(create=False, extra=overrides)
+
+
+def _through_objects(field, pairs):
+    """
+    Build the intermediate objects of a many-to-many field for the given (source pk, target pk) pairs.
+    """
+    through = field.remote_field.through
+    return [
+        through(**{field.m2m_column_name(): source, field.m2m_reverse_name(): target})
+        for (source, target) in pairs
+    ]
+
+
+def create_users(n_users):
+    """
+    Create users in bulk. They all have an unusable password.
+
+    :return: The pks of the created users
+    :rtype: list
+    """
+    user_model = get_user_model()
+    has_uuid = any(field.name == 'uuid' for field in user_model._meta.fields)
+    password = make_password(None)
+    user_ids = []
+    for batch_start in range(0, n_users, BATCH_SIZE):
+        users = []
+        for x in range(min(BATCH_SIZE, n_users - batch_start)):
+            user = user_model(password=password, **build_attributes(UserFactory))
+            if has_uuid:
+                user.uuid = uuid.UUID(int=random.getrandbits(128), version=4)
+            users.append(user)
+        user_model.objects.bulk_create(users)
+        # not all databases return the pks of bulk created objects
+        user_ids.extend(user_model.objects.filter(
+            username__in=[user.username for user in users]
+        ).values_list('pk', flat=True))
+    return user_ids
+
+
+def _create_translations(model, objects, languages, translated_fields):
+    """
+    Create a translation of each object in each language, with the text taken from its factory attributes.
+
+    :param objects: (object, factory attribute dict) pairs
+    """
+    translation_model = model._parler_meta.root_model
+    translations = [
+        translation_model(master_id=obj.pk, language_code=language, **{
+            field: ('%s (%s)' % (attributes[field], language) if index else attributes[field])
+            for field in translated_fields
+        })
+        for (obj, attributes) in objects
+        for (index, language) in enumerate(languages)
+    ]
+    translation_model.objects.bulk_create(translations, batch_size=BATCH_SIZE)
+
+
+def _create_image_template(section):
+    """
+    Save one real section image, whose file and metadata all the other images share.
+    """
+    image_file = BytesIO()
+    Image.new('RGB', (1200, 800), (120, 160, 200)).save(image_file, format='JPEG')
+    image = SectionImage(section=section, image=ContentFile(image_file.getvalue(), name='bulk.jpg'))
+    image.save()
+    return image
+
+
+def _build_comment(section, language, user_ids, n_votes):
+    attributes = build_attributes(SectionCommentFactory, created_by=None)
+    del attributes['created_by']
+    voter_ids = random.sample(user_ids, random.randint(0, min(n_votes, len(user_ids))))
+    comment = SectionComment(
+        section=section, language_code=language, created_by_id=random.choice(user_ids), n_votes=len(voter_ids),
+        **attributes
+    )
+    return comment, voter_ids
+
+
+def _build_hearing(n_sections, n_comments, languages, user_ids, n_votes, n_followers):
+    attributes = build_attributes(HearingFactory)
+    hearing = Hearing(
+        id=generate_id(), close_at=attributes['close_at'], n_comments=n_comments * n_sections,
+        slug='%s-%s' % (slugify(attributes['title'])[:30], generate_id()[:8].lower()),
+    )
+    follower_ids = random.sample(user_ids, random.randint(0, min(n_followers, len(user_ids))))
+    sections = []
+    comments = []
+    for ordering in range(n_sections):
+        section_type = section_types.get(InitialSectionType.MAIN if ordering == 0 else
+                                         random.choice((InitialSectionType.PART, InitialSectionType.SCENARIO)))
+        section = Section(
+            id=generate_id(), hearing=hearing, ordering=ordering + 1, type=section_type, n_comments=n_comments,
+            commenting=Commenting.OPEN, voting=Commenting.OPEN,
+        )
+        sections.append((section, build_attributes(SectionFactory, type=section_type)))
+        comments.extend(_build_comment(section, languages[0], user_ids, n_votes) for x in range(n_comments))
+    return (hearing, attributes, follower_ids), sections, comments
+
+
+def _create_images(sections, n_images, template):
+    images = [
+        SectionImage(
+            section=section, ordering=ordering + 1, image=template.image.name, variants=template.variants,
+            **{field: getattr(template, field) for field in SectionImage.file_metadata_fields}
+        )
+        for section in sections
+        for ordering in range(n_images)
+        if not (section.pk == template.section_id and ordering == 0)
+    ]
+    SectionImage.objects.bulk_create(images, batch_size=BATCH_SIZE)
+    return len(images)
+
+
+def _get_comment_ids(comments, sections):
+    if comments[0].pk is not None:
+        return [comment.pk for comment in comments]
+    # the comments of new sections, in the order they were inserted in
+    return list(SectionComment._base_manager.filter(
+        section__in=[section.pk for section in sections]
+    ).order_by('pk').values_list('pk', flat=True))
+
+
+def create_hearings(n_hearings, n_sections=3, n_comments=10, n_images=1, languages=('fi',), user_ids=None,
+                    n_votes=0, n_followers=0):
+    """
+    Create hearings in bulk.
+
+    :param n_hearings: Number of hearings
+    :param n_sections: Number of sections per hearing, the first of which is the main section
+    :param n_comments: Number of comments per section
+    :param n_images: Number of images per section
+    :param languages: Languages to create translations in
+    :param user_ids: Pks of the users to pick comment authors, voters and followers from,
+                     or None to use existing users
+    :param n_votes: Maximum number of votes per comment
+    :param n_followers: Maximum number of followers per hearing
+    :return: The number of objects created, by model name
+    :rtype: dict[str, int]
+    """
+    user_ids = list(
+        user_ids or get_user_model().objects.order_by('pk').values_list('pk', flat=True)[:100] or create_users(10)
+    )
+    with translation.override(languages[0]):
+        labels = list(Label.objects.order_by('pk')) or [LabelFactory() for x in range(5)]
+    counts = dict.fromkeys(('hearings', 'sections', 'comments', 'votes', 'followers', 'images'), 0)
+    template = None
+
+    # the objects are created a few hearings at a time to keep the memory use bounded
+    hearings_per_chunk = max(1, BATCH_SIZE // max(1, n_sections * n_comments))
+    for chunk_start in range(0, n_hearings, hearings_per_chunk):
+        hearings, sections, comments = [], [], []
+        for x in range(min(hearings_per_chunk, n_hearings - chunk_start)):
+            hearing, hearing_sections, hearing_comments = _build_hearing(
+                n_sections, n_comments, languages, user_ids, n_votes, n_followers
+            )
+            hearings.append(hearing)
+            sections.extend(hearing_sections)
+            comments.extend(hearing_comments)
+
+        Hearing.objects.bulk_create([hearing for (hearing, attributes, follower_ids) in hearings],
+                                    batch_size=BATCH_SIZE)
+        _create_translations(Hearing, [(hearing, attributes) for (hearing, attributes, follower_ids) in hearings],
+                             languages, ('title', 'borough'))
+        Hearing.labels.through.objects.bulk_create([
+            Hearing.labels.through(hearing_id=hearing.pk, label_id=random.choice(labels).pk)
+            for (hearing, attributes, follower_ids) in hearings
+        ], batch_size=BATCH_SIZE)
+        followers = _through_objects(Hearing._meta.get_field('followers'), [
+            (hearing.pk, user_id) for (hearing, attributes, follower_ids) in hearings for user_id in follower_ids
+        ])
+        Hearing.followers.through.objects.bulk_create(followers, batch_size=BATCH_SIZE)
+        Section.objects.bulk_create([section for (section, attributes) in sections], batch_size=BATCH_SIZE)
+        _create_translations(Section, sections, languages, ('title', 'abstract', 'content'))
+        SectionComment.objects.bulk_create([comment for (comment, voter_ids) in comments], batch_size=BATCH_SIZE)
+        if comments and n_votes:
+            comment_ids = _get_comment_ids([comment for (comment, voter_ids) in comments],
+                                           [section for (section, attributes) in sections])
+            votes = _through_objects(SectionComment._meta.get_field('voters'), [
+                (comment_id, user_id)
+                for (comment_id, (comment, voter_ids)) in zip(comment_ids, comments)
+                for user_id in voter_ids
+            ])
+            SectionComment.voters.through.objects.bulk_create(votes, batch_size=BATCH_SIZE)
+            counts['votes'] += len(votes)
+
+        if n_images and sections:
+            if not template:
+                template = _create_image_template(sections[0][0])
+                counts['images'] += 1
+            counts['images'] += _create_images([section for (section, attributes) in sections], n_images, template)
+        counts['hearings'] += len(hearings)
+        counts['sections'] += len(sections)
+        counts['comments'] += len(comments)
+        counts['followers'] += len(followers)
+    return counts
@@ -12,9 +12,10 @@ from django.utils.text import slugify
 from django.utils.timezone import make_aware
 
 from democracy.enums import InitialSectionType
-from democracy.models import Hearing, Section, SectionType
+from democracy.models import Hearing, Section
 from democracy.models.comment import BaseComment
 from democracy.models.images import BaseImage
+from democracy.models.section import section_types
 
 log = logging.getLogger(__name__)
 
@@ -31,10 +32,37 @@ def parse_aware_datetime(value):
     return make_aware(dt, timezone=source_timezone)
 
 
+def clean_comments_plugin_data(target, comments_data):
+    """
+    Clean the plugin data of the comments with the plugin of the target, in one batch.
+
+    Comments with invalid plugin data, or with plugin data for a target without a plugin,
+    are imported without the plugin data.
+    """
+    comments_with_data = [datum for datum in comments_data if datum.get("plugin_data")]
+    if not comments_with_data:
+        return
+    if not getattr(target, "plugin_identifier", None):
+        log.warning("%r has no plugin, dropping the plugin data of %d comments", target, len(comments_with_data))
+        for datum in comments_with_data:
+            datum["plugin_data"] = ""
+        return
+    results = target.plugin_implementation.clean_client_data_batch(
+        [datum["plugin_data"] for datum in comments_with_data]
+    )
+    for datum, result in zip(comments_with_data, results):
+        if isinstance(result, Exception):
+            log.warning("Dropping invalid plugin data of comment %s: %s", datum["id"], result)
+            result = ""
+        datum["plugin_data"] = result
+
+
 def import_comments(target, comments_data):
     CommentModel = BaseComment.find_subclass(target)
     assert issubclass(CommentModel, BaseComment)
-    for datum in sorted(comments_data, key=itemgetter("id")):
+    comments_data = sorted(comments_data, key=itemgetter("id"))
+    clean_comments_plugin_data(target, comments_data)
+    for datum in comments_data:
         import_comment(CommentModel, datum, target)
 
 
@@ -43,6 +71,7 @@ def import_comment(CommentModel, datum, target):
     like_count = max(int(datum.pop("like_count", 0)), len(datum.pop("likes", ())))
     updated_at = datum.pop("updated_at", None)
     created_at = datum.pop("created_at", None)
+    plugin_data = datum.pop("plugin_data", "")
     c_args = {
         CommentModel.parent_field: target,
         "created_at": parse_aware_datetime(created_at),
@@ -57,6 +86,8 @@ def import_comment(CommentModel, datum, target):
         "n_unregistered_votes": like_count,
         "n_votes": like_count
     }
+    if plugin_data:
+        c_args.update(plugin_data=plugin_data, plugin_identifier=target.plugin_identifier)
     return CommentModel.objects.create(**c_args)
 
 
@@ -99,13 +130,14 @@ def import_section(hearing, section_datum, section_type, force=False):
     # The 2 offset ensures the introduction section (position 1) remains first.
     offset = (1000 if section_type == InitialSectionType.SCENARIO else 2)
     s_args = {
-        "type": SectionType.objects.get(identifier=section_type),
+        "type": section_types.get(section_type),
         "created_at": parse_aware_datetime(section_datum.pop("created_at")),
         "modified_at": parse_aware_datetime(section_datum.pop("updated_at")),
         "ordering": int(section_datum.pop("position", 1)) + offset,
         "title": (section_datum.pop("title") or ""),
         "abstract": (section_datum.pop("lead") or ""),
         "content": (section_datum.pop("body") or ""),
+        "plugin_identifier": (section_datum.pop("plugin_identifier", "") or ""),
     }
     if s_args.get("title"):  # pragma: no branch  # sane ids if possible
         pk = "%s-%s" % (hearing.pk, slugify(s_args["title"]))
@@ -170,7 +202,7 @@ def import_hearing(hearing_datum, force=False, patch=False):
     if patch:
         clean_hearing_for_patching(hearing)
     main_section = hearing.sections.create(
-        type=SectionType.objects.get(identifier=InitialSectionType.MAIN),
+        type=section_types.get(InitialSectionType.MAIN),
         title="",
         abstract=(hearing_datum.pop("lead") or ""),
         content=(hearing_datum.pop("body") or ""),
@@ -0,0 +1,75 @@
+import json
+from optparse import make_option
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from democracy.factories.bulk import create_hearings, seed_random
+from democracy.models import Hearing, Section, SectionComment, SectionImage
+from democracy.utils.benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the GET endpoints of the v1 API, counting SQL queries and peak memory, and output the results as JSON. "
+        "Optionally creates more hearings first; note that they are created in the configured database."
+    )
+    # the API is requested in the default language, like the web server would
+    leave_locale_alone = True
+    option_list = BaseCommand.option_list + (
+        make_option("--hearings", dest="hearings", type="int", default=0,
+                    help="Number of hearings to create before the benchmark"),
+        make_option("--sections", dest="sections", type="int", default=3, help="Sections per created hearing"),
+        make_option("--comments", dest="comments", type="int", default=10, help="Comments per created section"),
+        make_option("--images", dest="images", type="int", default=1, help="Images per created section"),
+        make_option("--languages", dest="languages", default="fi,sv,en",
+                    help="Comma-separated languages to create translations in"),
+        make_option("--random-seed", dest="random_seed", type="int", default=None,
+                    help="Seed for the random data, for repeatable datasets"),
+        make_option("--repeat", dest="repeat", type="int", default=3, help="Timed requests per endpoint"),
+        make_option("--user", dest="username", default=None,
+                    help="Make the requests as this user instead of anonymously"),
+        make_option("--endpoints", dest="endpoints", default=None,
+                    help="Regular expression for the URL names of the endpoints to time"),
+        make_option("--output", dest="output", default=None, help="File to write the results to instead of stdout"),
+    )
+
+    def handle(self, *args, **options):
+        user = None
+        if options.get("username"):
+            try:
+                user = get_user_model().objects.get(username=options["username"])
+            except get_user_model().DoesNotExist:
+                raise CommandError("User %s does not exist" % options["username"])
+
+        created = None
+        if options["hearings"]:
+            if options["random_seed"] is not None:
+                seed_random(options["random_seed"])
+            created = create_hearings(
+                options["hearings"], n_sections=options["sections"], n_comments=options["comments"],
+                n_images=options["images"], languages=options["languages"].split(","),
+            )
+
+        results = {
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "created": created,
+            "objects": {
+                "hearings": Hearing.objects.count(),
+                "sections": Section.objects.count(),
+                "comments": SectionComment.objects.count(),
+                "images": SectionImage.objects.count(),
+            },
+            "endpoints": run_benchmark(
+                repeat=options["repeat"], user=user, name_pattern=options.get("endpoints")
+            ),
+        }
+        output = json.dumps(results, indent=2)
+        if options.get("output"):
+            with open(options["output"], "w") as output_file:
+                output_file.write(output)
+        else:
+            self.stdout.write(output)
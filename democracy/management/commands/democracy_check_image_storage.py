@@ -0,0 +1,44 @@
+import hashlib
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from democracy.models import SectionImage
+from democracy.models.section import CommentImage
+
+
+class Command(BaseCommand):
+    help = "Report section and comment images whose files are missing from the storage"
+    option_list = BaseCommand.option_list + (
+        make_option("--verify", dest="verify", action="store_true",
+                    help="Also check the files against their stored size and content hash"),
+    )
+
+    def _get_problem(self, image, verify):
+        storage = image.image.storage
+        if not storage.exists(image.image.name):
+            return "missing"
+        if not verify or not image.content_hash:
+            return None
+        content_hash = hashlib.sha256()
+        with storage.open(image.image.name) as file:
+            for chunk in file.chunks():
+                content_hash.update(chunk)
+        if content_hash.hexdigest() != image.content_hash:
+            return "content differs from the stored hash"
+
+    def _check_storage(self, klass, verify):
+        n_images = n_problems = 0
+        for image in klass._base_manager.exclude(image='').iterator():
+            n_images += 1
+            problem = self._get_problem(image, verify)
+            if problem:
+                n_problems += 1
+                self.stdout.write("%s %s%s: %s %s" % (
+                    klass.__name__, image.pk, " (deleted)" if image.deleted else "", image.image.name, problem
+                ))
+        self.stdout.write("%s: checked %d, problems with %d" % (klass._meta.verbose_name_plural, n_images, n_problems))
+
+    def handle(self, *args, **options):
+        for klass in (SectionImage, CommentImage):
+            self._check_storage(klass, options.get("verify", False))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from democracy.models import CommentCounterShard
+
+
+class Command(BaseCommand):
+    help = "Fold sharded comment counters (see DEMOCRACY_COMMENT_COUNTER_SHARDS) into the section and hearing counts"
+
+    def handle(self, *args, **options):
+        n_sections = CommentCounterShard.compact()
+        self.stdout.write("Compacted comment counters of %d sections" % n_sections)
@@ -0,0 +1,25 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from democracy.models import Hearing
+from democracy.models.utils import copy_hearing
+
+
+class Command(BaseCommand):
+    args = "<hearing id or slug>"
+    help = "Copy a hearing with its sections and images as a draft. Useful for hearings too large to copy in the admin"
+    option_list = BaseCommand.option_list + (
+        make_option("--published", dest="published", action="store_true",
+                    help="Publish the copy instead of leaving it as a draft"),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("Give the id or slug of the hearing to copy")
+        try:
+            hearing = Hearing.objects.with_unpublished().get_by_id_or_slug(args[0])
+        except Hearing.DoesNotExist:
+            raise CommandError("Hearing %s does not exist" % args[0])
+        new_hearing = copy_hearing(hearing, published=bool(options.get("published")))
+        self.stdout.write("Copied hearing %s as %s" % (hearing.pk, new_hearing.pk))
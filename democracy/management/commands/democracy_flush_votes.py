@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from democracy.utils.vote_buffer import get_vote_buffer
+
+
+class Command(BaseCommand):
+    help = "Write the anonymous votes buffered in the DEMOCRACY_VOTE_BUFFER journal to the database"
+
+    def handle(self, *args, **options):
+        vote_buffer = get_vote_buffer()
+        if not vote_buffer:
+            raise CommandError("Votes are not buffered, DEMOCRACY_VOTE_BUFFER is not set")
+        n_votes = vote_buffer.flush()
+        self.stdout.write("Wrote %d buffered votes" % n_votes)
@@ -0,0 +1,28 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from democracy.models import SectionImage
+from democracy.models.section import CommentImage
+
+
+class Command(BaseCommand):
+    help = "Generate the thumbnail variants (THUMBNAIL_ALIASES) of existing section and comment images"
+    option_list = BaseCommand.option_list + (
+        make_option("--all", dest="all", action="store_true",
+                    help="Regenerate the variants of images that already have them"),
+    )
+
+    def _generate_variants(self, klass, regenerate):
+        queryset = klass._base_manager.exclude(image='')
+        n_images = 0
+        for image in queryset.iterator():
+            if image.variants and not regenerate:
+                continue
+            image.update_variants()
+            n_images += 1
+        self.stdout.write("%s: generated variants for %d images" % (klass._meta.verbose_name_plural, n_images))
+
+    def handle(self, *args, **options):
+        for klass in (SectionImage, CommentImage):
+            self._generate_variants(klass, options.get("all", False))
@@ -1,9 +1,12 @@
 from optparse import make_option
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
+from democracy.factories.bulk import create_hearings, create_users, seed_random
 from democracy.factories.hearing import HearingFactory, LabelFactory
 from democracy.factories.user import UserFactory
 from democracy.management.utils import nuke
@@ -13,23 +16,48 @@ from democracy.models import Hearing, Label
 class Command(BaseCommand):
     option_list = BaseCommand.option_list + (
         make_option("--nuke", dest="nuke", action="store_true"),
+        make_option("--scale", dest="scale", type="int", default=0,
+                    help="Create this many units of 100 users and 10 hearings with sections, comments, votes "
+                         "and followers in bulk, instead of topping up the object counts one object at a time"),
+        make_option("--seed", dest="seed", type="int", default=None,
+                    help="Seed for the random data, for repeatable datasets"),
     )
 
     def handle(self, *args, **options):
+        scale = options.pop("scale", 0)
+        seed = options.pop("seed", None)
         if options.pop("nuke", False):
             nuke(command_options=options)
+        if seed is not None:
+            seed_random(seed)
 
         User = get_user_model()
         if issubclass(User, AbstractUser):
             if not User.objects.filter(username="admin").exists():
                 User.objects.create_superuser(username="admin", email="admin@example.com", password="admin")
                 print("Admin user 'admin' (password 'admin') created")
-            while User.objects.count() < 25:
+        if scale:
+            self.populate_in_bulk(scale)
+            return
+
+        if issubclass(User, AbstractUser):
+            for x in range(25 - User.objects.count()):
                 user = UserFactory()
                 print("Created user %s" % user.pk)
-        while Label.objects.count() < 5:
+        for x in range(5 - Label.objects.count()):
             label = LabelFactory()
             print("Created label %s" % label.pk)
-        while Hearing.objects.count() < 10:
+        for x in range(10 - Hearing.objects.count()):
             hearing = HearingFactory()
             print("Created hearing %s" % hearing.pk)
+
+    def populate_in_bulk(self, scale):
+        with transaction.atomic():
+            user_ids = create_users(100 * scale)
+            print("Created %d users" % len(user_ids))
+            counts = create_hearings(
+                10 * scale, n_sections=4, n_comments=25, n_images=1,
+                languages=[code for (code, name) in settings.LANGUAGES],
+                user_ids=user_ids, n_votes=5, n_followers=10,
+            )
+        print("Created %s" % ", ".join("%d %s" % (counts[name], name) for name in sorted(counts)))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from democracy.models import ImageUpload
+
+
+class Command(BaseCommand):
+    help = "Delete expired image uploads (see DEMOCRACY_IMAGE_UPLOAD_EXPIRY_HOURS) along with their files"
+
+    def handle(self, *args, **options):
+        n_uploads = 0
+        for upload in ImageUpload.objects.expired().iterator():
+            upload.image.delete(save=False)
+            upload.delete()
+            n_uploads += 1
+        self.stdout.write("Deleted %d expired image uploads" % n_uploads)
@@ -0,0 +1,23 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from democracy.models import Section, SectionPluginSummary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the plugin summaries of sections from the plugin data of their comments"
+    option_list = BaseCommand.option_list + (
+        make_option("--section", dest="sections", action="append", default=[],
+                    help="Only rebuild the summary of this section; may be given several times"),
+    )
+
+    def handle(self, *args, **options):
+        sections = Section.objects.exclude(plugin_identifier='')
+        if options["sections"]:
+            sections = sections.filter(pk__in=options["sections"])
+        n_rebuilt = 0
+        for section in sections.iterator():
+            if SectionPluginSummary.rebuild(section):
+                n_rebuilt += 1
+        self.stdout.write("Rebuilt plugin summaries of %d sections" % n_rebuilt)
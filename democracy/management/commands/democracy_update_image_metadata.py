@@ -0,0 +1,36 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from democracy.models import SectionImage
+from democracy.models.section import CommentImage
+
+
+class Command(BaseCommand):
+    help = "Store the dimensions, file size and content hash of existing section and comment images"
+    option_list = BaseCommand.option_list + (
+        make_option("--all", dest="all", action="store_true",
+                    help="Also update images that already have their metadata stored"),
+    )
+
+    def _update_metadata(self, klass, update_all):
+        queryset = klass._base_manager.exclude(image='')
+        if not update_all:
+            queryset = queryset.filter(content_hash='')
+        n_updated = n_missing = 0
+        for image in queryset.iterator():
+            try:
+                image.update_file_metadata()
+            except IOError:
+                self.stderr.write("%s %s: cannot read %s" % (klass.__name__, image.pk, image.image.name))
+                n_missing += 1
+                continue
+            klass._base_manager.filter(pk=image.pk).update(
+                **{field: getattr(image, field) for field in klass.file_metadata_fields}
+            )
+            n_updated += 1
+        self.stdout.write("%s: updated %d, could not read %d" % (klass._meta.verbose_name_plural, n_updated, n_missing))
+
+    def handle(self, *args, **options):
+        for klass in (SectionImage, CommentImage):
+            self._update_metadata(klass, options.get("all", False))
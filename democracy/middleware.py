@@ -0,0 +1,49 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from democracy.utils.request_stats import (
+    RequestStats, get_query_budget, request_stats_collector, start_recording_queries, stop_recording_queries
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStatsMiddleware(object):
+    """
+    Record the SQL queries, SQL and serializer time and response size of each request, when
+    `DEMOCRACY_REQUEST_STATS` is enabled.
+
+    The stats of each request are logged as JSON, with a warning if the view exceeds its query budget
+    or repeats the same query many times. The stats aggregated by view are available to staff users
+    in the `request-stats` endpoint.
+
+    Queries run while a streaming response is iterated over are not included.
+    """
+
+    def __init__(self):
+        if not getattr(settings, 'DEMOCRACY_REQUEST_STATS', False):
+            raise MiddlewareNotUsed()
+
+    def process_request(self, request):
+        request.request_stats = RequestStats()
+        request.request_stats_cursors = start_recording_queries(request.request_stats)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.request_stats.view_name = request.resolver_match.view_name
+        request.request_stats.query_budget = get_query_budget(view_func, request.method)
+
+    def process_response(self, request, response):
+        stats = getattr(request, 'request_stats', None)
+        if stats is None:  # another middleware responded before this one was run
+            return response
+        stop_recording_queries(request.request_stats_cursors)
+        stats.finish(response_size=None if response.streaming else len(response.content))
+        request_stats_collector.add(stats)
+
+        data = stats.as_dict()
+        log_level = logging.WARNING if (stats.over_budget or data['duplicate_queries']) else logging.INFO
+        logger.log(log_level, json.dumps(data, sort_keys=True), extra={'request_stats': data})
+        return response
@@ -8,9 +8,10 @@ from democracy.models import SectionComment
 
 
 def forwards_func(apps, schema_editor):
-    for comment in SectionComment.objects.all():
+    # This uses the real model, so only touch the columns that exist at this point of the migration history
+    for comment in SectionComment.objects.only('pk', 'content', 'language_code'):
         comment._detect_lang()
-        comment.save()
+        SectionComment.objects.filter(pk=comment.pk).update(language_code=comment.language_code)
 
 
 def backwards_func(apps, schema_editor):
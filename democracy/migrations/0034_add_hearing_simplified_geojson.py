@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-19 07:46
+from __future__ import unicode_literals
+
+import json
+
+from django.conf import settings
+from django.contrib.gis.gdal.error import GDALException
+from django.contrib.gis.geos import GEOSGeometry
+from django.contrib.gis.geos.error import GEOSException
+from django.db import migrations
+import jsonfield.fields
+
+# The GeoJSON helpers below are copies of the ones in democracy.utils.geo at the time of this migration,
+# so that later changes to them don't change what the migration does.
+
+SIMPLIFIABLE_GEOMETRY_TYPES = ("LineString", "MultiLineString", "Polygon", "MultiPolygon")
+
+
+def get_geometries(geojson):
+    if not isinstance(geojson, dict):
+        return
+    geojson_type = geojson.get("type")
+    if geojson_type == "FeatureCollection":
+        for feature in geojson.get("features") or ():
+            yield from get_geometries(feature)
+    elif geojson_type == "Feature":
+        yield from get_geometries(geojson.get("geometry"))
+    elif geojson_type == "GeometryCollection":
+        for geometry in geojson.get("geometries") or ():
+            yield from get_geometries(geometry)
+    elif "coordinates" in geojson:
+        yield geojson
+
+
+def simplify_geometry(geometry, tolerance):
+    if geometry.get("type") not in SIMPLIFIABLE_GEOMETRY_TYPES:
+        return geometry
+    simplified = GEOSGeometry(json.dumps(geometry)).simplify(tolerance, preserve_topology=True)
+    return json.loads(simplified.json)
+
+
+def simplify_geojson(geojson, tolerance):
+    geojson_type = geojson.get("type")
+    if geojson_type == "FeatureCollection":
+        return dict(geojson, features=[simplify_geojson(feature, tolerance) for feature in geojson["features"]])
+    elif geojson_type == "Feature":
+        if not geojson.get("geometry"):
+            return geojson
+        return dict(geojson, geometry=simplify_geojson(geojson["geometry"], tolerance))
+    elif geojson_type == "GeometryCollection":
+        return dict(geojson, geometries=[simplify_geojson(geometry, tolerance) for geometry in geojson["geometries"]])
+    return simplify_geometry(geojson, tolerance)
+
+
+def get_simplified_variants(geojson, tolerances):
+    if not any(geometry.get("type") in SIMPLIFIABLE_GEOMETRY_TYPES for geometry in get_geometries(geojson)):
+        return {}
+    variants = {}
+    original_size = len(json.dumps(geojson))
+    for tolerance in sorted(tolerances):
+        simplified = simplify_geojson(geojson, tolerance)
+        if len(json.dumps(simplified)) < original_size:
+            variants[str(tolerance)] = simplified
+    return variants
+
+
+def forwards_func(apps, schema_editor):
+    Hearing = apps.get_model('democracy', 'Hearing')
+    tolerances = getattr(settings, 'DEMOCRACY_MAP_SIMPLIFY_TOLERANCES', ())
+    for hearing in Hearing.objects.exclude(geojson=None).only('pk', 'geojson'):
+        try:
+            variants = get_simplified_variants(hearing.geojson, tolerances)
+        except (GDALException, GEOSException, ValueError):
+            continue
+        if variants:
+            Hearing.objects.filter(pk=hearing.pk).update(geojson_simplified=variants)
+
+
+def backwards_func(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('democracy', '0033_add_n_votes_to_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hearing',
+            name='geojson_simplified',
+            field=jsonfield.fields.JSONField(blank=True, default=dict, editable=False, verbose_name='simplified area'),
+        ),
+        migrations.RunPython(forwards_func, backwards_func),
+    ]
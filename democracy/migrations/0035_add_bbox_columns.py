@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-19 07:51
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+# The GeoJSON helpers below are copies of the ones in democracy.utils.geo at the time of this migration,
+# so that later changes to them don't change what the migration does.
+
+
+def get_geometries(geojson):
+    if not isinstance(geojson, dict):
+        return
+    geojson_type = geojson.get("type")
+    if geojson_type == "FeatureCollection":
+        for feature in geojson.get("features") or ():
+            yield from get_geometries(feature)
+    elif geojson_type == "Feature":
+        yield from get_geometries(geojson.get("geometry"))
+    elif geojson_type == "GeometryCollection":
+        for geometry in geojson.get("geometries") or ():
+            yield from get_geometries(geometry)
+    elif "coordinates" in geojson:
+        yield geojson
+
+
+def iter_positions(coordinates):
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        yield coordinates
+        return
+    for item in coordinates or ():
+        yield from iter_positions(item)
+
+
+def get_bbox(geojson):
+    minx = miny = float("inf")
+    maxx = maxy = float("-inf")
+    for geometry in get_geometries(geojson):
+        for position in iter_positions(geometry["coordinates"]):
+            x, y = position[0], position[1]
+            minx, maxx = min(minx, x), max(maxx, x)
+            miny, maxy = min(miny, y), max(maxy, y)
+    if minx == float("inf"):
+        return None
+    return (minx, miny, maxx, maxy)
+
+
+def forwards_func(apps, schema_editor):
+    for model_name in ('Hearing', 'SectionComment'):
+        model = apps.get_model('democracy', model_name)
+        for obj in model.objects.exclude(geojson=None).only('pk', 'geojson'):
+            bbox = get_bbox(obj.geojson)
+            if bbox:
+                model.objects.filter(pk=obj.pk).update(
+                    bbox_minx=bbox[0], bbox_miny=bbox[1], bbox_maxx=bbox[2], bbox_maxy=bbox[3]
+                )
+
+
+def backwards_func(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('democracy', '0034_add_hearing_simplified_geojson'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hearing',
+            name='bbox_maxx',
+            field=models.FloatField(db_index=True, editable=False, null=True, verbose_name='bounding box max x'),
+        ),
+        migrations.AddField(
+            model_name='hearing',
+            name='bbox_maxy',
+            field=models.FloatField(db_index=True, editable=False, null=True, verbose_name='bounding box max y'),
+        ),
+        migrations.AddField(
+            model_name='hearing',
+            name='bbox_minx',
+            field=models.FloatField(db_index=True, editable=False, null=True, verbose_name='bounding box min x'),
+        ),
+        migrations.AddField(
+            model_name='hearing',
+            name='bbox_miny',
+            field=models.FloatField(db_index=True, editable=False, null=True, verbose_name='bounding box min y'),
+        ),
+        migrations.AddField(
+            model_name='sectioncomment',
+            name='bbox_maxx',
+            field=models.FloatField(db_index=True, editable=False, null=True, verbose_name='bounding box max x'),
+        ),
+        migrations.AddField(
+            model_name='sectioncomment',
+            name='bbox_maxy',
+            field=models.FloatField(db_index=True, editable=False, null=True, verbose_name='bounding box max y'),
+        ),
+        migrations.AddField(
+            model_name='sectioncomment',
+            name='bbox_minx',
+            field=models.FloatField(db_index=True, editable=False, null=True, verbose_name='bounding box min x'),
+        ),
+        migrations.AddField(
+            model_name='sectioncomment',
+            name='bbox_miny',
+            field=models.FloatField(db_index=True, editable=False, null=True, verbose_name='bounding box min y'),
+        ),
+        migrations.RunPython(forwards_func, backwards_func),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-19 08:08
+from __future__ import unicode_literals
+
+from django.db import migrations
+import jsonfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('democracy', '0035_add_bbox_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commentimage',
+            name='variants',
+            field=jsonfield.fields.JSONField(blank=True, default=dict, editable=False, verbose_name='variants'),
+        ),
+        migrations.AddField(
+            model_name='sectionimage',
+            name='variants',
+            field=jsonfield.fields.JSONField(blank=True, default=dict, editable=False, verbose_name='variants'),
+        ),
+    ]
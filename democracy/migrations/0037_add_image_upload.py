@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-19 08:18
+from __future__ import unicode_literals
+
+import democracy.models.base
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('democracy', '0036_add_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageUpload',
+            fields=[
+                ('id', models.CharField(default=democracy.models.base.generate_id, editable=False, max_length=32, primary_key=True, serialize=False, verbose_name='token')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='time of creation')),
+                ('height', models.IntegerField(default=0, editable=False, verbose_name='height')),
+                ('width', models.IntegerField(default=0, editable=False, verbose_name='width')),
+                ('image', models.ImageField(height_field='height', upload_to='image_uploads/%Y/%m', verbose_name='image', width_field='width')),
+                ('created_by', models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='image_uploads', to=settings.AUTH_USER_MODEL, verbose_name='created by')),
+            ],
+            options={
+                'verbose_name': 'image upload',
+                'verbose_name_plural': 'image uploads',
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-19 08:25
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('democracy', '0037_add_image_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commentimage',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='SHA-256 hash'),
+        ),
+        migrations.AddField(
+            model_name='commentimage',
+            name='file_size',
+            field=models.IntegerField(default=0, editable=False, verbose_name='file size'),
+        ),
+        migrations.AddField(
+            model_name='sectionimage',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='SHA-256 hash'),
+        ),
+        migrations.AddField(
+            model_name='sectionimage',
+            name='file_size',
+            field=models.IntegerField(default=0, editable=False, verbose_name='file size'),
+        ),
+        migrations.AlterField(
+            model_name='commentimage',
+            name='image',
+            field=models.ImageField(upload_to='images/%Y/%m', verbose_name='image'),
+        ),
+        migrations.AlterField(
+            model_name='sectionimage',
+            name='image',
+            field=models.ImageField(upload_to='images/%Y/%m', verbose_name='image'),
+        ),
+    ]
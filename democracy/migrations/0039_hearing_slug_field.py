@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-19 08:55
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('democracy', '0038_add_image_file_metadata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='hearing',
+            name='slug',
+            field=models.SlugField(blank=True, help_text='You may leave this empty to automatically generate a slug', unique=True, verbose_name='slug'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-19 09:04
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('democracy', '0039_hearing_slug_field'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentCounterShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='shard')),
+                ('n_comments', models.IntegerField(default=0, verbose_name='number of comments')),
+                ('hearing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comment_counter_shards', to='democracy.Hearing')),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comment_counter_shards', to='democracy.Section')),
+            ],
+            options={
+                'verbose_name': 'comment counter shard',
+                'verbose_name_plural': 'comment counter shards',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='commentcountershard',
+            unique_together=set([('section', 'shard')]),
+        ),
+    ]
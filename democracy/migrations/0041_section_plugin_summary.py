@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-19 09:53
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import jsonfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('democracy', '0040_comment_counter_shard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SectionPluginSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('plugin_identifier', models.CharField(max_length=255, verbose_name='plugin identifier')),
+                ('summary', jsonfield.fields.JSONField(blank=True, null=True, verbose_name='summary')),
+                ('n_comments', models.IntegerField(default=0, verbose_name='number of comments')),
+                ('modified_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='time of last modification')),
+                ('section', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='plugin_summary', to='democracy.Section')),
+            ],
+            options={
+                'verbose_name': 'section plugin summary',
+                'verbose_name_plural': 'section plugin summaries',
+            },
+        ),
+    ]
@@ -1,15 +1,21 @@
+from .counters import CommentCounterShard
 from .hearing import Hearing
+from .images import ImageUpload
 from .label import Label
 from .section import Section, SectionComment, SectionImage, SectionType
 from .organization import ContactPerson, Organization
+from .plugin_summary import SectionPluginSummary
 
 __all__ = [
+    "CommentCounterShard",
     "ContactPerson",
     "Hearing",
+    "ImageUpload",
     "Label",
     "Section",
     "SectionComment",
     "SectionImage",
+    "SectionPluginSummary",
     "SectionType",
     "Organization",
 ]
@@ -3,13 +3,16 @@ from functools import lru_cache
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import ManyToOneRel
+from django.db.models import ManyToOneRel, Q
 from django.utils import timezone
 from django.utils.crypto import get_random_string
 from django.utils.translation import ugettext_lazy as _
 from enumfields.fields import EnumIntegerField
 
 from democracy.enums import Commenting
+from democracy.utils.geo import get_bbox
+
+from .counters import get_n_comment_counter_shards, get_prefetched_n_comments
 
 ORDERING_HELP = _("The ordering position for this object. Objects with smaller numbers appear first.")
 
@@ -18,7 +21,59 @@ def generate_id():
     return get_random_string(32)
 
 
-class BaseModelManager(models.Manager):
+def _update_deleted(queryset, deleted, cascade, recaches):
+    model = queryset.model
+    if cascade:
+        # Children are updated first, as the parent queryset may filter on `deleted` itself
+        for related_name in model.soft_delete_cascade:
+            relation = model._meta.get_field(related_name)
+            children = relation.related_model._base_manager.filter(
+                deleted=(not deleted),
+                **{"%s__in" % relation.field.name: queryset.values('pk')}
+            )
+            _update_deleted(children, deleted, cascade, recaches)
+    recache = model.get_soft_delete_recache(queryset)
+    if recache:
+        recaches.append(recache)
+    return queryset.update(deleted=deleted)
+
+
+class BaseModelQuerySet(models.QuerySet):
+
+    def _set_deleted(self, deleted, cascade):
+        recaches = []
+        n_updated = _update_deleted(self, deleted, cascade, recaches)
+        # Cached counters are only recounted once all the rows have been updated
+        for recache in recaches:
+            recache()
+        return n_updated
+
+    def soft_delete(self, cascade=False):
+        """
+        Soft delete all objects in the queryset with a single UPDATE.
+
+        Unlike `BaseModel.soft_delete`, this does not call `save()` or send any signals.
+
+        :param cascade: Also soft delete the children named in the model's `soft_delete_cascade`,
+                        recursively
+        :return: The number of objects updated (not counting cascaded children)
+        :rtype: int
+        """
+        return self._set_deleted(True, cascade)
+
+    def undelete(self, cascade=False):
+        """
+        Undelete all objects in the queryset with a single UPDATE.
+
+        With `cascade`, all deleted children are restored, including those deleted on their own before.
+
+        :return: The number of objects updated (not counting cascaded children)
+        :rtype: int
+        """
+        return self._set_deleted(False, cascade)
+
+
+class BaseModelManager(models.Manager.from_queryset(BaseModelQuerySet)):
 
     def get_queryset(self):
         return super().get_queryset().exclude(deleted=True)
@@ -56,6 +111,7 @@ class BaseModel(models.Model):
     published = models.BooleanField(verbose_name=_('public'), default=True, db_index=True)
     deleted = models.BooleanField(verbose_name=_('deleted'), default=False, db_index=True, editable=False)
     objects = BaseModelManager()
+    soft_delete_cascade = ()  # Reverse relations soft deleted along with the object by `BaseModelQuerySet`
 
     def save(self, *args, **kwargs):
         pk_type = self._meta.pk.get_internal_type()
@@ -82,6 +138,18 @@ class BaseModel(models.Model):
     def delete(self, using=None):
         raise NotImplementedError("This model does not support hard deletion")
 
+    @classmethod
+    def get_soft_delete_recache(cls, queryset):
+        """
+        Get a callable that updates cached values depending on the objects in `queryset`.
+
+        Called by `BaseModelQuerySet` before soft deleting or undeleting the objects; the
+        callable is called once all objects have been updated.
+
+        :rtype: Callable|None
+        """
+        return None
+
     @classmethod
     @lru_cache()
     def find_subclass(cls, parent_model):
@@ -115,6 +183,54 @@ class StringIdBaseModel(BaseModel):
         abstract = True
 
 
+class SpatiallyIndexed(models.Model):
+    """
+    Mixin for models with a `geojson` geometry.
+
+    The bounding box of the geometry is stored in indexed columns whenever the geometry is saved,
+    so that the objects can be filtered by area without loading and parsing the GeoJSON.
+    """
+    bbox_fields = ('bbox_minx', 'bbox_miny', 'bbox_maxx', 'bbox_maxy')
+    bbox_minx = models.FloatField(verbose_name=_('bounding box min x'), null=True, editable=False, db_index=True)
+    bbox_miny = models.FloatField(verbose_name=_('bounding box min y'), null=True, editable=False, db_index=True)
+    bbox_maxx = models.FloatField(verbose_name=_('bounding box max x'), null=True, editable=False, db_index=True)
+    bbox_maxy = models.FloatField(verbose_name=_('bounding box max y'), null=True, editable=False, db_index=True)
+
+    def update_bbox(self):
+        # geojson validated by the API already knows its bounding box
+        bbox = getattr(self.geojson, 'bbox', None) or get_bbox(self.geojson) or (None, None, None, None)
+        for field, value in zip(self.bbox_fields, bbox):
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'geojson' in update_fields:
+            self.update_bbox()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.bbox_fields)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def get_bbox_q(bbox, prefix=''):
+        """
+        Get a filter for objects whose bounding box intersects the given one.
+
+        :param bbox: (minx, miny, maxx, maxy)
+        :param prefix: Lookup path to the spatially indexed model, e.g. `section__hearing__`
+        :rtype: Q
+        """
+        minx, miny, maxx, maxy = bbox
+        return Q(**{
+            '%sbbox_minx__lte' % prefix: maxx,
+            '%sbbox_maxx__gte' % prefix: minx,
+            '%sbbox_miny__lte' % prefix: maxy,
+            '%sbbox_maxy__gte' % prefix: miny,
+        })
+
+    class Meta:
+        abstract = True
+
+
 class Commentable(models.Model):
     """
     Mixin for models which can be commented.
@@ -124,6 +240,9 @@ class Commentable(models.Model):
     voting = EnumIntegerField(Commenting, verbose_name=_('voting'), default=Commenting.REGISTERED)
 
     def recache_n_comments(self):
+        if get_n_comment_counter_shards():
+            # the exact count replaces any pending sharded increments
+            self.comment_counter_shards.all().delete()
         new_n_comments = self.comments.count()
         if new_n_comments != self.n_comments:
             self.n_comments = new_n_comments
@@ -132,6 +251,19 @@ class Commentable(models.Model):
         if hasattr(self, 'hearing'):
             self.hearing.recache_n_comments()
 
+    def get_n_comments(self):
+        """
+        Get the number of comments, including those not yet compacted into `n_comments`.
+
+        :rtype: int
+        """
+        if not get_n_comment_counter_shards():
+            return self.n_comments
+        n_sharded_comments = get_prefetched_n_comments(self)
+        if n_sharded_comments is None:
+            n_sharded_comments = self.comment_counter_shards.get_n_comments()
+        return self.n_comments + n_sharded_comments
+
     def check_commenting(self, request):
         """
         Check whether the given request (HTTP or DRF) is allowed to comment on this Commentable.
@@ -7,10 +7,11 @@ from djgeojson.fields import GeometryField
 from langdetect import detect_langs
 from langdetect.lang_detect_exception import LangDetectException
 
-from .base import BaseModel
+from .base import BaseModel, SpatiallyIndexed
+from .counters import CommentCounterShard, get_n_comment_counter_shards
 
 
-class BaseComment(BaseModel):
+class BaseComment(SpatiallyIndexed, BaseModel):
     parent_field = None  # Required for factories and API
     parent_model = None  # Required for factories and API
     geojson = GeometryField(blank=True, null=True, verbose_name=_('location'))
@@ -91,6 +92,45 @@ class BaseComment(BaseModel):
         if self.parent_id:  # pragma: no branch
             self.parent.recache_n_comments()
 
+    def increment_parent_n_comments(self):
+        """
+        Count a new comment in a counter shard of the parent, see `CommentCounterShard`.
+        """
+        if self.parent_id:  # pragma: no branch
+            CommentCounterShard.increment(self.parent)
+
+    @classmethod
+    def get_soft_delete_recache(cls, queryset):
+        parent_ids = set(queryset.order_by().values_list("%s_id" % cls.parent_field, flat=True).distinct())
+        if parent_ids:
+            return lambda: cls.recache_parents_n_comments(parent_ids)
+
+    @classmethod
+    def recache_parents_n_comments(cls, parent_ids):
+        """
+        Recount the comments of the given parents, and of their hearings, after a bulk update.
+
+        :param parent_ids: Primary keys of `parent_model` objects
+        """
+        parent_id_field = "%s_id" % cls.parent_field
+        if get_n_comment_counter_shards():
+            CommentCounterShard.objects.filter(section_id__in=parent_ids).delete()
+        n_comments_by_parent = dict(
+            cls.objects.filter(**{"%s__in" % parent_id_field: parent_ids}).order_by()
+            .values_list(parent_id_field).annotate(models.Count('pk'))
+        )
+        hearing_ids = set()
+        for parent in cls.parent_model._base_manager.filter(pk__in=parent_ids):
+            n_comments = n_comments_by_parent.get(parent.pk, 0)
+            if n_comments != parent.n_comments:
+                cls.parent_model._base_manager.filter(pk=parent.pk).update(n_comments=n_comments)
+            if getattr(parent, 'hearing_id', None):
+                hearing_ids.add(parent.hearing_id)
+        if hearing_ids:
+            hearing_model = cls.parent_model._meta.get_field('hearing').related_model
+            for hearing in hearing_model._base_manager.filter(pk__in=hearing_ids):
+                hearing.recache_n_comments()
+
     def can_edit(self, request):
         """
         Whether the given request (HTTP or DRF) is allowed to edit this Comment.
@@ -110,7 +150,9 @@ def comment_recache(sender, instance, using, created, **kwargs):
     """
     :type instance: BaseComment
     """
-    if created or instance.deleted:
+    if created and get_n_comment_counter_shards():
+        instance.increment_parent_n_comments()
+    elif created or instance.deleted:
         instance.recache_parent_n_comments()
     else:
         instance.recache_n_votes()
@@ -0,0 +1,125 @@
+import random
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Prefetch, Sum
+from django.utils.translation import ugettext_lazy as _
+
+PREFETCHED_SHARDS_ATTR = 'prefetched_comment_counter_shards'
+
+
+def get_n_comment_counter_shards():
+    """
+    Get the number of counter shards per section, or 0 if sharded comment counting is disabled.
+
+    :rtype: int
+    """
+    return getattr(settings, 'DEMOCRACY_COMMENT_COUNTER_SHARDS', 0)
+
+
+def prefetch_comment_counter_shards(queryset):
+    """
+    Prefetch the comment counter shards of the sections or hearings of the queryset, for their
+    `get_n_comments()`, if sharded comment counting is enabled.
+    """
+    if not get_n_comment_counter_shards():
+        return queryset
+    shards = CommentCounterShard.objects.all()
+    if queryset.model._meta.model_name == 'hearing':
+        # like `Hearing.get_n_comments`
+        shards = shards.filter(section__deleted=False)
+    return queryset.prefetch_related(
+        Prefetch('comment_counter_shards', queryset=shards, to_attr=PREFETCHED_SHARDS_ATTR)
+    )
+
+
+def set_prefetched_comment_counter_shards(sections, shards):
+    """
+    Set the prefetched comment counter shards of the sections from the given shards, e.g. the prefetched shards
+    of their hearing, instead of prefetching them again.
+    """
+    shards_by_section_id = defaultdict(list)
+    for shard in shards:
+        shards_by_section_id[shard.section_id].append(shard)
+    for section in sections:
+        setattr(section, PREFETCHED_SHARDS_ATTR, shards_by_section_id[section.pk])
+
+
+def get_prefetched_n_comments(obj):
+    """
+    Get the number of comments counted by the prefetched shards of a section or a hearing,
+    or None if the shards have not been prefetched.
+
+    :rtype: int|None
+    """
+    shards = getattr(obj, PREFETCHED_SHARDS_ATTR, None)
+    if shards is None:
+        return None
+    return sum(shard.n_comments for shard in shards)
+
+
+class CommentCounterShardQuerySet(models.QuerySet):
+
+    def get_n_comments(self):
+        """
+        Get the number of comments counted by the shards in this queryset.
+
+        :rtype: int
+        """
+        return self.aggregate(n_comments=Sum('n_comments'))['n_comments'] or 0
+
+
+class CommentCounterShard(models.Model):
+    """
+    Comments added to a section, but not yet compacted into `n_comments` of the section and its hearing.
+
+    Each new comment increments one of the section's shards at random instead of updating the section
+    and hearing rows, so that simultaneous comments don't all wait for the same row locks.
+    """
+    section = models.ForeignKey('democracy.Section', related_name='comment_counter_shards')
+    hearing = models.ForeignKey('democracy.Hearing', related_name='comment_counter_shards')
+    shard = models.PositiveSmallIntegerField(verbose_name=_('shard'))
+    n_comments = models.IntegerField(verbose_name=_('number of comments'), default=0)
+
+    objects = CommentCounterShardQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('comment counter shard')
+        verbose_name_plural = _('comment counter shards')
+        unique_together = (('section', 'shard'),)
+
+    @classmethod
+    def increment(cls, section, delta=1):
+        shard = random.randrange(get_n_comment_counter_shards())
+        shard_counter = cls.objects.filter(section_id=section.pk, shard=shard)
+        if shard_counter.update(n_comments=F('n_comments') + delta):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(section_id=section.pk, hearing_id=section.hearing_id, shard=shard, n_comments=delta)
+        except IntegrityError:
+            # the shard was created by another request in the meantime
+            shard_counter.update(n_comments=F('n_comments') + delta)
+
+    @classmethod
+    def compact(cls):
+        """
+        Fold all the shards into the comment counts of their sections and hearings.
+
+        :return: The number of sections compacted
+        :rtype: int
+        """
+        section_model = cls._meta.get_field('section').related_model
+        hearing_model = cls._meta.get_field('hearing').related_model
+        section_ids = set(cls.objects.order_by().values_list('section_id', flat=True).distinct())
+        for section_id in section_ids:
+            with transaction.atomic():
+                # increments of the locked shards wait until the shards are gone, and then start new ones
+                shards = list(cls.objects.select_for_update().filter(section_id=section_id))
+                n_comments = sum(shard.n_comments for shard in shards)
+                section_model._base_manager.filter(pk=section_id).update(n_comments=F('n_comments') + n_comments)
+                cls.objects.filter(pk__in=[shard.pk for shard in shards]).delete()
+        for hearing in hearing_model._base_manager.filter(sections__in=section_ids).distinct():
+            hearing.recache_n_comments()
+        return len(section_ids)
@@ -1,27 +1,37 @@
 from urllib.parse import urljoin
 
 from django.conf import settings
+from django.contrib.gis.gdal.error import GDALException
+from django.contrib.gis.geos.error import GEOSException
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.db.models import Sum
 from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 from djgeojson.fields import GeometryField
-from autoslug import AutoSlugField
-from autoslug.utils import generate_unique_slug
+from autoslug.settings import slugify
+from jsonfield import JSONField
 from parler.models import TranslatedFields, TranslatableModel
 from parler.managers import TranslatableQuerySet
 
 from democracy.enums import InitialSectionType
+from democracy.utils.geo import get_simplified_variant, get_simplified_variants
 from democracy.utils.hmac_hash import get_hmac_b64_encoded
 
-from .base import BaseModelManager, StringIdBaseModel
+from .base import BaseModelManager, BaseModelQuerySet, SpatiallyIndexed, StringIdBaseModel
+from .counters import get_n_comment_counter_shards, get_prefetched_n_comments
 from .organization import ContactPerson, Organization
 
 
-class HearingQueryset(TranslatableQuerySet):
+# The maximum length of the `-<index>` suffix expected when making slugs unique
+SLUG_INDEX_RESERVE = 6
+
+SLUG_SAVE_ATTEMPTS = 3
+
+
+class HearingQueryset(BaseModelQuerySet, TranslatableQuerySet):
     def get_by_id_or_slug(self, id_or_slug):
         return self.get(models.Q(pk=id_or_slug) | models.Q(slug=id_or_slug))
 
@@ -29,7 +39,7 @@ class HearingQueryset(TranslatableQuerySet):
         return self.filter(models.Q(pk=id_or_slug) | models.Q(slug=id_or_slug))
 
 
-class Hearing(StringIdBaseModel, TranslatableModel):
+class Hearing(SpatiallyIndexed, StringIdBaseModel, TranslatableModel):
     open_at = models.DateTimeField(verbose_name=_('opening time'), default=timezone.now)
     close_at = models.DateTimeField(verbose_name=_('closing time'), default=timezone.now)
     force_closed = models.BooleanField(verbose_name=_('force hearing closed'), default=False)
@@ -39,6 +49,7 @@ class Hearing(StringIdBaseModel, TranslatableModel):
     )
     servicemap_url = models.CharField(verbose_name=_('service map URL'), default='', max_length=255, blank=True)
     geojson = GeometryField(blank=True, null=True, verbose_name=_('area'))
+    geojson_simplified = JSONField(verbose_name=_('simplified area'), blank=True, default=dict, editable=False)
     organization = models.ForeignKey(
         Organization,
         verbose_name=_('organization'),
@@ -51,21 +62,31 @@ class Hearing(StringIdBaseModel, TranslatableModel):
         help_text=_('users who follow this hearing'),
         related_name='followed_hearings', blank=True, editable=False
     )
-    slug = AutoSlugField(verbose_name=_('slug'), populate_from='title', editable=True, unique=True, blank=True,
-                         help_text=_('You may leave this empty to automatically generate a slug'))
+    slug = models.SlugField(verbose_name=_('slug'), unique=True, blank=True,
+                            help_text=_('You may leave this empty to automatically generate a slug'))
     n_comments = models.IntegerField(verbose_name=_('number of comments'), blank=True, default=0, editable=False)
     contact_persons = models.ManyToManyField(ContactPerson, verbose_name=_('contact persons'), related_name='hearings')
 
     objects = BaseModelManager.from_queryset(HearingQueryset)()
     original_manager = models.Manager()
+    soft_delete_cascade = ('sections',)
 
     class Meta:
         verbose_name = _('hearing')
         verbose_name_plural = _('hearings')
 
+    # the slug as it was loaded from (or last saved to) the database
+    _saved_slug = None
+
     def __str__(self):
         return (self.title or self.id)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_slug = instance.__dict__.get('slug')
+        return instance
+
     @property
     def closed(self):
         return self.force_closed or not (self.open_at <= now() <= self.close_at)
@@ -94,13 +115,77 @@ class Hearing(StringIdBaseModel, TranslatableModel):
         )
 
     def save(self, *args, **kwargs):
-        slug_field = self._meta.get_field('slug')
-
-        # we need to manually use autoslug utils here with ModelManager, because automatic slug populating
-        # uses our default manager, which can lead to a slug collision between this and a deleted hearing
-        self.slug = generate_unique_slug(slug_field, self, self.slug, Hearing.original_manager)
-
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        update_slug = (update_fields is None or 'slug' in update_fields) and (
+            not self.pk or not self.slug or self.slug != self._saved_slug
+        )
+        if update_slug:
+            self.slug = self.generate_unique_slug()
+
+        if update_fields is None or 'geojson' in update_fields:
+            self.update_simplified_geojson()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'geojson_simplified'}
+
+        if update_slug:
+            self._save_with_unique_slug(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self._saved_slug = self.slug
+
+    def _save_with_unique_slug(self, *args, **kwargs):
+        # another hearing may have taken the slug between generating and saving it
+        for attempt in range(SLUG_SAVE_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                slug_taken = Hearing.original_manager.filter(slug=self.slug).exclude(pk=self.pk).exists()
+                if attempt == SLUG_SAVE_ATTEMPTS - 1 or not slug_taken:
+                    raise
+                self.slug = self.generate_unique_slug()
+
+    def generate_unique_slug(self):
+        """
+        Generate a slug from the current slug, or the title if there is none, that no other hearing uses.
+
+        All the slugs that could collide are fetched with a single prefix lookup. Deleted hearings are
+        taken into account too, since they still reserve their slugs in the database.
+
+        :rtype: str
+        """
+        max_length = self._meta.get_field('slug').max_length
+        slug = (slugify(self.slug or self.title or '') or self._meta.model_name)[:max_length]
+        # leave room for the index suffix, which may require cropping the slug
+        rivals = Hearing.original_manager.filter(slug__startswith=slug[:max_length - SLUG_INDEX_RESERVE])
+        if self.pk:
+            rivals = rivals.exclude(pk=self.pk)
+        taken_slugs = set(rivals.values_list('slug', flat=True))
+        candidate = slug
+        index = 1
+        while candidate in taken_slugs:
+            index += 1
+            suffix = '-%d' % index
+            candidate = slug[:max_length - len(suffix)] + suffix
+        return candidate
+
+    def update_simplified_geojson(self):
+        try:
+            self.geojson_simplified = get_simplified_variants(
+                self.geojson, getattr(settings, 'DEMOCRACY_MAP_SIMPLIFY_TOLERANCES', ())
+            )
+        except (GDALException, GEOSException, ValueError):
+            # an invalid geometry is still stored as-is, it just won't have simplified variants
+            self.geojson_simplified = {}
+
+    def get_map_geojson(self, tolerance=None):
+        """
+        Get the area of this hearing, simplified to at most the given tolerance if possible.
+
+        :param tolerance: The largest acceptable simplification tolerance in degrees, or None for the original
+        :type tolerance: float|None
+        """
+        return get_simplified_variant(self.geojson, self.geojson_simplified, tolerance)
 
     def recache_n_comments(self):
         new_n_comments = (self.sections.all().aggregate(Sum('n_comments')).get('n_comments__sum') or 0)
@@ -108,6 +193,19 @@ class Hearing(StringIdBaseModel, TranslatableModel):
             self.n_comments = new_n_comments
             self.save(update_fields=("n_comments",))
 
+    def get_n_comments(self):
+        """
+        Get the number of comments, including those not yet compacted into `n_comments`.
+
+        :rtype: int
+        """
+        if not get_n_comment_counter_shards():
+            return self.n_comments
+        n_sharded_comments = get_prefetched_n_comments(self)
+        if n_sharded_comments is None:
+            n_sharded_comments = self.comment_counter_shards.filter(section__deleted=False).get_n_comments()
+        return self.n_comments + n_sharded_comments
+
     def get_main_section(self):
         try:
             return self.sections.get(type__identifier=InitialSectionType.MAIN)
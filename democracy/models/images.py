@@ -1,16 +1,158 @@
-from django.db import models
-from django.db.models import ImageField
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.images import get_image_dimensions
+from django.db import models, transaction
+from django.db.models import ImageField, Q
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
+from easy_thumbnails.alias import aliases
+from easy_thumbnails.files import get_thumbnailer
+from jsonfield import JSONField
+
+from .base import ORDERING_HELP, BaseModel, generate_id
 
-from .base import ORDERING_HELP, BaseModel
+logger = logging.getLogger(__name__)
 
 
 class BaseImage(BaseModel):
+    # the file metadata is stored when the image is saved, so that using images never needs to touch the storage
+    file_metadata_fields = ('width', 'height', 'file_size', 'content_hash')
+
     height = models.IntegerField(verbose_name=_('height'), default=0, editable=False)
     width = models.IntegerField(verbose_name=_('width'), default=0, editable=False)
-    image = ImageField(verbose_name=_('image'), upload_to='images/%Y/%m', width_field='width', height_field='height')
+    file_size = models.IntegerField(verbose_name=_('file size'), default=0, editable=False)
+    content_hash = models.CharField(verbose_name=_('SHA-256 hash'), max_length=64, blank=True, editable=False)
+    image = ImageField(verbose_name=_('image'), upload_to='images/%Y/%m')
     ordering = models.IntegerField(verbose_name=_('ordering'), default=1, db_index=True, help_text=ORDERING_HELP)
+    variants = JSONField(verbose_name=_('variants'), blank=True, default=dict, editable=False)
 
     class Meta:
         abstract = True
         ordering = ("ordering")
+
+    def save(self, *args, **kwargs):
+        new_upload = bool(self.image) and not self.image._committed
+        update_fields = kwargs.get('update_fields')
+        if self.image and (new_upload or not self.content_hash) and (update_fields is None or 'image' in update_fields):
+            try:
+                self.update_file_metadata()
+            except IOError:
+                logger.warning('Could not read image file %s', self.image.name)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.file_metadata_fields)
+        super().save(*args, **kwargs)
+        if new_upload:
+            self.update_variants()
+
+    def update_file_metadata(self):
+        """
+        Read the image file and update its dimensions, size and content hash.
+
+        :raises IOError: if the file cannot be read
+        """
+        committed = self.image._committed
+        file = self.image.file
+        try:
+            content_hash = hashlib.sha256()
+            file_size = 0
+            for chunk in file.chunks():
+                content_hash.update(chunk)
+                file_size += len(chunk)
+            self.width, self.height = (dimension or 0 for dimension in get_image_dimensions(file))
+            self.file_size = file_size
+            self.content_hash = content_hash.hexdigest()
+        finally:
+            if committed:
+                self.image.close()
+
+    def get_variant_aliases(self):
+        """
+        Get the thumbnail aliases (from `THUMBNAIL_ALIASES`) worth generating for this image.
+
+        Aliases at least as wide as the original are left out, the original serves those sizes just as well.
+
+        :rtype: dict[str, dict]
+        """
+        target = '%s.%s.image' % (self._meta.app_label, self._meta.object_name)
+        return {
+            alias: options for (alias, options) in aliases.all(target=target).items()
+            if options['size'][0] < self.width
+        }
+
+    def update_variants(self):
+        """
+        Generate the thumbnail variants of the image and store their names and dimensions.
+        """
+        variants = {}
+        thumbnailer = get_thumbnailer(self.image)
+        for alias, options in self.get_variant_aliases().items():
+            try:
+                thumbnail = thumbnailer.get_thumbnail(options)
+            except Exception:  # pragma: no cover
+                logger.exception('Could not generate thumbnail %s for %s', alias, self.image.name)
+                continue
+            variants[alias] = {'name': thumbnail.name, 'width': thumbnail.width, 'height': thumbnail.height}
+        self.variants = variants
+        type(self)._base_manager.filter(pk=self.pk).update(variants=variants)
+
+
+class ImageUploadQuerySet(models.QuerySet):
+
+    def expired(self):
+        expiry = timedelta(hours=settings.DEMOCRACY_IMAGE_UPLOAD_EXPIRY_HOURS)
+        return self.filter(created_at__lt=timezone.now() - expiry)
+
+    def claimable_by(self, user):
+        """
+        Get the unexpired uploads the given user may attach to images.
+
+        Anonymous uploads can be used by anyone knowing their token.
+        """
+        queryset = self.exclude(pk__in=self.expired())
+        if user and user.is_authenticated():
+            return queryset.filter(Q(created_by__isnull=True) | Q(created_by=user))
+        return queryset.filter(created_by__isnull=True)
+
+
+class ImageUpload(models.Model):
+    """
+    An uploaded image file waiting to be attached to a section or comment image by its token.
+    """
+    id = models.CharField(verbose_name=_('token'), primary_key=True, max_length=32, default=generate_id, editable=False)
+    created_at = models.DateTimeField(
+        verbose_name=_('time of creation'), default=timezone.now, editable=False, db_index=True
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, verbose_name=_('created by'),
+        null=True, blank=True, related_name="image_uploads", editable=False
+    )
+    height = models.IntegerField(verbose_name=_('height'), default=0, editable=False)
+    width = models.IntegerField(verbose_name=_('width'), default=0, editable=False)
+    image = ImageField(
+        verbose_name=_('image'), upload_to='image_uploads/%Y/%m', width_field='width', height_field='height'
+    )
+
+    objects = ImageUploadQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('image upload')
+        verbose_name_plural = _('image uploads')
+
+    def claim(self):
+        """
+        Delete the upload after its image has been copied into a section or comment image, so that its token
+        can only be used once. The file is deleted once the transaction is committed.
+
+        :return: False if the upload had already been claimed
+        :rtype: bool
+        """
+        self.image.close()
+        n_deleted = ImageUpload.objects.filter(pk=self.pk).delete()[0]
+        if not n_deleted:
+            return False
+        storage, name = self.image.storage, self.image.name
+        transaction.on_commit(lambda: storage.delete(name))
+        return True
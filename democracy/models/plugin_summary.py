@@ -0,0 +1,145 @@
+import logging
+
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+from jsonfield import JSONField
+
+logger = logging.getLogger(__name__)
+
+# Comment fields whose change may change the summaries of the comment's old and new section
+SUMMARIZED_COMMENT_FIELDS = ('section_id', 'plugin_identifier', 'plugin_data', 'published', 'deleted')
+
+
+def get_summarized_state(comment):
+    """
+    Get the values of the comment fields that its plugin summary depends on, see `SUMMARIZED_COMMENT_FIELDS`.
+    """
+    return tuple(getattr(comment, field) for field in SUMMARIZED_COMMENT_FIELDS)
+
+
+class SectionPluginSummary(models.Model):
+    """
+    The plugin data of the public comments of a section, summarized by the section's plugin.
+
+    New comments are added to the summary as they are created, with `Plugin.add_to_summary`. Other
+    changes to comments with plugin data rebuild the summary from all the comments of the section.
+    Only sections whose plugin implements `Plugin.get_empty_summary` have summaries.
+    """
+    section = models.OneToOneField('democracy.Section', related_name='plugin_summary')
+    plugin_identifier = models.CharField(verbose_name=_('plugin identifier'), max_length=255)
+    summary = JSONField(verbose_name=_('summary'), blank=True, null=True)
+    n_comments = models.IntegerField(verbose_name=_('number of comments'), default=0)
+    modified_at = models.DateTimeField(verbose_name=_('time of last modification'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('section plugin summary')
+        verbose_name_plural = _('section plugin summaries')
+
+    @staticmethod
+    def is_summarized(comment, section):
+        return bool(
+            comment.plugin_data and comment.published and not comment.deleted and
+            comment.plugin_identifier == section.plugin_identifier
+        )
+
+    @classmethod
+    def rebuild(cls, section):
+        """
+        Summarize the plugin data of all the public comments of the section.
+
+        :return: The new summary, or None if the plugin of the section does not summarize comments
+        :rtype: SectionPluginSummary|None
+        """
+        plugin = section.plugin_implementation
+        summary = plugin.get_empty_summary() if section.plugin_identifier else None
+        if summary is None:
+            cls.objects.filter(section_id=section.pk).delete()
+            return None
+        with transaction.atomic():
+            # the row is created first so that there's always something to lock: get_or_create handles
+            # a concurrent creation, and comments created during the rebuild are then added to the summary
+            # by `add_comment` once it's saved
+            plugin_summary, created = cls.objects.get_or_create(section_id=section.pk, defaults={
+                'plugin_identifier': section.plugin_identifier,
+            })
+            plugin_summary = cls.objects.select_for_update().get(pk=plugin_summary.pk)
+            comments = section.comments.public(plugin_identifier=section.plugin_identifier).exclude(plugin_data='')
+            n_comments = 0
+            for plugin_data in comments.order_by().values_list('plugin_data', flat=True).iterator():
+                summary = plugin.add_to_summary(summary, plugin_data)
+                n_comments += 1
+            plugin_summary.plugin_identifier = section.plugin_identifier
+            plugin_summary.summary = summary
+            plugin_summary.n_comments = n_comments
+            plugin_summary.modified_at = timezone.now()
+            plugin_summary.save()
+        return plugin_summary
+
+    @classmethod
+    def get_for_section(cls, section):
+        """
+        Get the up to date summary of the section, building it if necessary.
+
+        :rtype: SectionPluginSummary|None
+        """
+        plugin_summary = cls.objects.filter(section_id=section.pk).first()
+        if plugin_summary and plugin_summary.plugin_identifier == section.plugin_identifier:
+            return plugin_summary
+        return cls.rebuild(section)
+
+    @classmethod
+    def add_comment(cls, comment):
+        """
+        Add the plugin data of a new comment to the summary of its section.
+        """
+        section = comment.section
+        if not cls.is_summarized(comment, section):
+            return
+        plugin = section.plugin_implementation
+        with transaction.atomic():
+            plugin_summary = cls.objects.select_for_update().filter(section_id=section.pk).first()
+            if plugin_summary and plugin_summary.plugin_identifier == section.plugin_identifier:
+                plugin_summary.summary = plugin.add_to_summary(plugin_summary.summary, comment.plugin_data)
+                plugin_summary.n_comments += 1
+                plugin_summary.modified_at = timezone.now()
+                plugin_summary.save(update_fields=('summary', 'n_comments', 'modified_at'))
+                return
+        # the new comment is already saved, so it's included in the rebuilt summary
+        cls.rebuild(section)
+
+    @classmethod
+    def rebuild_for_comments(cls, section_ids):
+        """
+        Rebuild the summaries of the given sections, after their comments have been changed in bulk.
+        """
+        section_model = cls._meta.get_field('section').related_model
+        for section in section_model._base_manager.filter(pk__in=section_ids).exclude(plugin_identifier=''):
+            cls.rebuild(section)
+
+
+def update_plugin_summary(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Update the plugin summaries of the sections of a saved comment, see `SectionPluginSummary`.
+
+    The summaries of both the old and the new section are rebuilt when any of the `SUMMARIZED_COMMENT_FIELDS`
+    changed since the comment was loaded. Errors are logged, so that a failing plugin cannot prevent saving
+    comments; the summaries can be fixed with the `democracy_rebuild_plugin_summaries` command.
+
+    :type instance: democracy.models.SectionComment
+    """
+    if update_fields is not None and not set(update_fields) & set(SUMMARIZED_COMMENT_FIELDS + ('section',)):
+        return
+    state = get_summarized_state(instance)
+    loaded_state = getattr(instance, '_loaded_summarized_state', None)
+    try:
+        with transaction.atomic():
+            if created:
+                SectionPluginSummary.add_comment(instance)
+            elif state != loaded_state:
+                # the state is unknown if the comment wasn't loaded with all the fields
+                section_ids = {instance.section_id, loaded_state[0] if loaded_state else instance.section_id}
+                SectionPluginSummary.rebuild_for_comments(section_ids)
+    except Exception:
+        logger.exception('Could not update the plugin summary of section %s', instance.section_id)
+    instance._loaded_summarized_state = state
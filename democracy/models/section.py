@@ -1,16 +1,21 @@
 from django.db import models
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_save
 from django.utils.translation import ugettext_lazy as _
 from reversion import revisions
 from autoslug import AutoSlugField
 from parler.models import TranslatedFields, TranslatableModel
-from parler.managers import TranslatableQuerySet, TranslatableManager
+from parler.managers import TranslatableQuerySet
 
 from democracy.models.comment import BaseComment, recache_on_save
 from democracy.models.images import BaseImage
+from democracy.models.plugin_summary import (
+    SUMMARIZED_COMMENT_FIELDS, SectionPluginSummary, get_summarized_state, update_plugin_summary
+)
 from democracy.plugins import get_implementation
 
 from democracy.enums import InitialSectionType
-from .base import ORDERING_HELP, Commentable, StringIdBaseModel, BaseModel, BaseModelManager
+from .base import ORDERING_HELP, Commentable, StringIdBaseModel, BaseModel, BaseModelManager, BaseModelQuerySet
 from .hearing import Hearing
 
 CLOSURE_INFO_ORDERING = -10000
@@ -18,7 +23,7 @@ CLOSURE_INFO_ORDERING = -10000
 INITIAL_SECTION_TYPE_IDS = set(value for key, value in InitialSectionType.__dict__.items() if key[:1] != '_')
 
 
-class SectionTypeQuerySet(models.QuerySet):
+class SectionTypeQuerySet(BaseModelQuerySet):
     def initial(self):
         return self.filter(identifier__in=INITIAL_SECTION_TYPE_IDS)
 
@@ -26,6 +31,10 @@ class SectionTypeQuerySet(models.QuerySet):
         return self.exclude(identifier__in=INITIAL_SECTION_TYPE_IDS)
 
 
+class SectionQuerySet(BaseModelQuerySet, TranslatableQuerySet):
+    pass
+
+
 class SectionType(BaseModel):
     identifier = AutoSlugField(populate_from='name_singular', unique=True)
     name_singular = models.CharField(max_length=64)
@@ -42,6 +51,66 @@ class SectionType(BaseModel):
         return super().save(*args, **kwargs)
 
 
+class SectionTypeRegistry(object):
+    """
+    Process-wide cache of the section types, keyed by identifier and pk (including soft deleted types).
+
+    Section types hardly ever change, so they are loaded once and reloaded only when a section
+    type is saved or deleted in this process, or when an unknown one is looked up (e.g. one
+    added by another process). The cached instances are shared and must not be modified.
+    """
+
+    def __init__(self):
+        self._types = None
+
+    def _load(self, reload=False):
+        types = self._types
+        if types is None or reload:
+            # soft deleted types are still the types of their existing sections, but can't be looked up
+            # by identifier for new ones
+            section_types = list(SectionType._base_manager.all())
+            types = (
+                {section_type.identifier: section_type for section_type in section_types if not section_type.deleted},
+                {section_type.pk: section_type for section_type in section_types},
+            )
+            self._types = types
+        return types
+
+    def _lookup(self, index, key):
+        try:
+            return self._load()[index][key]
+        except KeyError:
+            try:
+                return self._load(reload=True)[index][key]
+            except KeyError:
+                raise SectionType.DoesNotExist("Section type %r does not exist" % (key,))
+
+    def get(self, identifier):
+        """
+        :raises SectionType.DoesNotExist: if there is no such section type
+        :rtype: SectionType
+        """
+        return self._lookup(0, identifier)
+
+    def get_by_pk(self, pk):
+        """
+        :raises SectionType.DoesNotExist: if there is no such section type
+        :rtype: SectionType
+        """
+        return self._lookup(1, pk)
+
+    def get_pk(self, identifier):
+        return self.get(identifier).pk
+
+    def clear(self, **kwargs):
+        self._types = None
+
+
+section_types = SectionTypeRegistry()
+post_save.connect(section_types.clear, sender=SectionType)
+post_delete.connect(section_types.clear, sender=SectionType)
+
+
 class Section(Commentable, StringIdBaseModel, TranslatableModel):
     hearing = models.ForeignKey(Hearing, related_name='sections', on_delete=models.PROTECT)
     ordering = models.IntegerField(verbose_name=_('ordering'), default=1, db_index=True, help_text=ORDERING_HELP)
@@ -55,7 +124,8 @@ class Section(Commentable, StringIdBaseModel, TranslatableModel):
     plugin_data = models.TextField(verbose_name=_('plugin data'), blank=True)
     plugin_iframe_url = models.URLField(verbose_name=_('plugin iframe url'), blank=True)
     plugin_fullscreen = models.BooleanField(default=False)
-    objects = BaseModelManager.from_queryset(TranslatableQuerySet)()
+    objects = BaseModelManager.from_queryset(SectionQuerySet)()
+    soft_delete_cascade = ('images', 'comments')
 
     class Meta:
         ordering = ["ordering"]
@@ -68,14 +138,24 @@ class Section(Commentable, StringIdBaseModel, TranslatableModel):
     def save(self, *args, **kwargs):
         if self.hearing_id:
             # Closure info should be the first
-            if self.type == SectionType.objects.get(identifier=InitialSectionType.CLOSURE_INFO):
+            if self.type_id == section_types.get_pk(InitialSectionType.CLOSURE_INFO):
                 self.ordering = CLOSURE_INFO_ORDERING
             elif (not self.pk and self.ordering == 1) or self.ordering == CLOSURE_INFO_ORDERING:
                 # This is a new section or changing type from closure info,
                 # automatically derive next ordering, if possible
-                self.ordering = max(self.hearing.sections.values_list("ordering", flat=True) or [0]) + 1
+                max_ordering = Section.objects.filter(hearing_id=self.hearing_id).aggregate(Max('ordering'))
+                self.ordering = (max_ordering['ordering__max'] or 0) + 1
         return super(Section, self).save(*args, **kwargs)
 
+    @classmethod
+    def get_soft_delete_recache(cls, queryset):
+        hearing_ids = set(queryset.order_by().values_list('hearing_id', flat=True).distinct())
+
+        def recache():
+            for hearing in Hearing._base_manager.filter(pk__in=hearing_ids):
+                hearing.recache_n_comments()
+        return recache
+
     def check_commenting(self, request):
         super().check_commenting(request)
         self.hearing.check_commenting(request)
@@ -89,7 +169,11 @@ class Section(Commentable, StringIdBaseModel, TranslatableModel):
         return get_implementation(self.plugin_identifier)
 
 
-class SectionImageManager(TranslatableManager, BaseModelManager):
+class SectionImageQuerySet(BaseModelQuerySet, TranslatableQuerySet):
+    pass
+
+
+class SectionImageManager(BaseModelManager.from_queryset(SectionImageQuerySet)):
 
     def get_queryset(self):
         return super(SectionImageManager, self).get_queryset().order_by('pk')
@@ -118,12 +202,36 @@ class SectionComment(BaseComment):
     section = models.ForeignKey(Section, related_name="comments")
     title = models.CharField(verbose_name=_('title'), blank=True, max_length=255)
     content = models.TextField(verbose_name=_('content'), blank=True)
+    soft_delete_cascade = ('images',)
 
     class Meta:
         verbose_name = _('section comment')
         verbose_name_plural = _('section comments')
         ordering = ('-created_at',)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        comment = super().from_db(db, field_names, values)
+        if set(SUMMARIZED_COMMENT_FIELDS).issubset(field_names):
+            # to know which plugin summaries to update when the comment is saved
+            comment._loaded_summarized_state = get_summarized_state(comment)
+        return comment
+
+    @classmethod
+    def get_soft_delete_recache(cls, queryset):
+        recache_n_comments = super().get_soft_delete_recache(queryset)
+        section_ids = set(queryset.exclude(plugin_data='').order_by().values_list('section_id', flat=True).distinct())
+
+        def recache():
+            if recache_n_comments:
+                recache_n_comments()
+            if section_ids:
+                SectionPluginSummary.rebuild_for_comments(section_ids)
+        return recache
+
+
+post_save.connect(update_plugin_summary, sender=SectionComment)
+
 
 class CommentImage(BaseImage):
     title = models.CharField(verbose_name=_('title'), max_length=255, blank=True, default='')
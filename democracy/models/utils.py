@@ -1,17 +1,56 @@
-from copy import deepcopy
-
 from django.db import transaction
+from django.utils import timezone
 
 from democracy.enums import InitialSectionType
-from democracy.models import SectionType
+from democracy.models import Hearing, Section, SectionImage
+from democracy.models.base import generate_id
+from democracy.models.section import section_types
+
 
+def _copy_translations(model, pk_map):
+    """
+    Copy the translations of the given objects of a translatable model in one query.
 
-def _copy_translations(new_obj, old_obj):
-    for old_translation in old_obj.translations.all():
-        translation = deepcopy(old_translation)
+    :param model: Translatable model class
+    :param pk_map: dict of old object pk to the pk of its copy
+    """
+    translation_model = model._parler_meta.root_model
+    translations = []
+    for translation in translation_model.objects.filter(master_id__in=pk_map):
         translation.pk = None
-        translation.master_id = new_obj.pk
-        translation.save()
+        translation.master_id = pk_map[translation.master_id]
+        translations.append(translation)
+    translation_model.objects.bulk_create(translations)
+
+
+def _copy_sections(old_hearing, new_hearing):
+    closure_info_pk = section_types.get_pk(InitialSectionType.CLOSURE_INFO)
+    sections = list(old_hearing.sections.exclude(type_id=closure_info_pk).order_by('ordering', 'pk'))
+    modified_at = timezone.now()
+
+    # the instances are fresh from the database, so they can be turned into the copies as such
+    section_pk_map = {}
+    for section in sections:
+        section_pk_map[section.pk] = generate_id()
+        section.pk = section_pk_map[section.pk]
+        section.hearing = new_hearing
+        section.n_comments = 0
+        section.modified_at = modified_at
+    Section.objects.bulk_create(sections)
+    _copy_translations(Section, section_pk_map)
+
+    images = list(SectionImage.objects.filter(section_id__in=section_pk_map).order_by('pk'))
+    old_image_pks = [image.pk for image in images]
+    for image in images:
+        image.pk = None
+        image.section_id = section_pk_map[image.section_id]
+        image.modified_at = modified_at
+    SectionImage.objects.bulk_create(images)
+    # not all databases return the ids of bulk created rows, but they are created in order
+    new_image_pks = SectionImage._base_manager.filter(
+        section_id__in=section_pk_map.values()
+    ).order_by('pk').values_list('pk', flat=True)
+    _copy_translations(SectionImage, dict(zip(old_image_pks, new_image_pks)))
 
 
 @transaction.atomic
@@ -27,38 +66,35 @@ def copy_hearing(old_hearing, **kwargs):
         for closure info type
       * The same labels will be set for the new Hearing
 
+    Sections, section images and all the translations are created in bulk,
+    so the number of queries does not depend on the size of the hearing.
+
     :param old_hearing: Hearing to be copied
     :param kwargs: field value overrides
     :return: newly created Hearing
     """
 
-    new_hearing = deepcopy(old_hearing)
+    # a fresh instance, so that no cached translations of the old hearing get saved with the new one
+    new_hearing = Hearing._base_manager.get(pk=old_hearing.pk)
     new_hearing.pk = None
 
-    # possible field value overrides
+    # possible field value overrides, translated fields are set once the translations have been copied
+    translated_fields = set(Hearing._parler_meta.get_all_fields())
     for key, value in kwargs.items():
-        setattr(new_hearing, key, value)
+        if key not in translated_fields:
+            setattr(new_hearing, key, value)
 
     new_hearing.n_comments = 0
     new_hearing.save()
     new_hearing.labels = old_hearing.labels.all()
-    _copy_translations(new_hearing, old_hearing)
-
-    # create new sections and section images
-    closure_info = SectionType.objects.get(identifier=InitialSectionType.CLOSURE_INFO)
-    for old_section in old_hearing.sections.exclude(type=closure_info):
-        old_images = old_section.images.all()
-        section = deepcopy(old_section)
-        section.pk = None
-        section.hearing = new_hearing
-        section.n_comments = 0
-        section.save()
-        _copy_translations(section, old_section)
-        for old_image in old_images:
-            image = deepcopy(old_image)
-            image.pk = None
-            image.section = section
-            image.save()
-            _copy_translations(image, old_image)
+    _copy_translations(Hearing, {old_hearing.pk: new_hearing.pk})
+
+    translated_kwargs = {key: value for (key, value) in kwargs.items() if key in translated_fields}
+    if translated_kwargs:
+        for key, value in translated_kwargs.items():
+            setattr(new_hearing, key, value)
+        new_hearing.save_translations()
+
+    _copy_sections(old_hearing, new_hearing)
 
     return new_hearing
@@ -1 +1 @@
-from ._base import Plugin, get_implementation  # noqa
+from ._base import Plugin, PluginRegistry, get_implementation, plugin_registry  # noqa
@@ -1,5 +1,12 @@
+import threading
+import time
+
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.signals import setting_changed
 from django.utils.module_loading import import_string
+from django.utils.translation import ugettext as _
+from rest_framework.exceptions import ValidationError as APIValidationError
 
 
 class Plugin(object):
@@ -10,6 +17,18 @@ class Plugin(object):
     #: The user-friendly displayable name for this plugin.
     display_name = None
 
+    #: Whether the plugin keeps no state in its instance, so a single instance can be shared
+    #: by all sections and threads. Otherwise a new instance is created for each use.
+    stateless = False
+
+    #: The maximum length of a single client data string, or None for no limit.
+    max_client_data_size = None
+
+    #: The maximum time in seconds to spend cleaning a batch of client data, or None for no limit.
+    #: The data that are still uncleaned when the time is up are rejected; cleaning a single
+    #: string is not interrupted.
+    clean_time_limit = None
+
     def clean_client_data(self, data):
         """
         Validate and transmogrify client (comment) data.
@@ -23,20 +42,142 @@ class Plugin(object):
 
         return data
 
+    def get_empty_summary(self):
+        """
+        Get the summary of no client data, or None if the plugin does not summarize client data.
+
+        Plugins that summarize the client data of comments (e.g. count the answers to a questionnaire)
+        return a JSON-serializable value here and implement `add_to_summary`. The summaries are kept up to
+        date as comments are created, and served by the `plugin_summary` endpoint of the section.
+
+        :return: object|None
+        """
+        return None
+
+    def add_to_summary(self, summary, data):
+        """
+        Add the cleaned client data of a comment to a summary.
+
+        :param summary: A summary of other client data, as first returned by `get_empty_summary`
+        :param data: str
+        :return: The new summary
+        """
+        raise NotImplementedError("Plugins that summarize client data must implement add_to_summary")
+
+    def clean_client_data_batch(self, data_list):
+        """
+        Validate and transmogrify many client data strings, e.g. the plugin data of many comments.
+
+        Rejects the strings longer than `max_client_data_size`, and the rest of the strings once
+        `clean_time_limit` is exceeded. By default, cleans each string with `clean_client_data`;
+        plugins with a fixed cost per call (such as parsing a schema) may override this to pay it once.
+
+        :param data_list: list[str]
+        :return: The cleaned data or the `ValidationError` raised for it, for each string in order
+        :rtype: list[str|ValidationError]
+        """
+        deadline = (time.perf_counter() + self.clean_time_limit) if self.clean_time_limit is not None else None
+        results = []
+        for data in data_list:
+            try:
+                if deadline is not None and time.perf_counter() > deadline:
+                    raise ValidationError(_("Cleaning the plugin data took too long."), code="timeout")
+                if self.max_client_data_size is not None and len(data) > self.max_client_data_size:
+                    raise ValidationError(
+                        _("The plugin data may be at most %(max_size)d characters long.") % {
+                            "max_size": self.max_client_data_size
+                        },
+                        code="max_size"
+                    )
+                results.append(self.clean_client_data(data))
+            except (ValidationError, APIValidationError) as error:
+                results.append(error)
+        return results
+
+
+class PluginRegistry(object):
+    """
+    The plugin classes of `settings.DEMOCRACY_PLUGINS`, imported once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._classes = None
+        self._instances = {}
+
+    def load(self):
+        """
+        Import and validate the plugin classes, if not done yet.
+
+        :raises ImproperlyConfigured: if a plugin class cannot be imported or is not a `Plugin`
+        :return: dict of plugin identifier to plugin class
+        :rtype: dict[str, type]
+        """
+        classes = self._classes
+        if classes is not None:
+            return classes
+        with self._lock:
+            if self._classes is None:
+                self._classes = self._import_classes(getattr(settings, 'DEMOCRACY_PLUGINS', {}))
+            return self._classes
+
+    def _import_classes(self, plugins):
+        classes = {}
+        for identifier, classpath in plugins.items():
+            try:
+                cls = import_string(classpath)
+            except ImportError as exc:
+                raise ImproperlyConfigured('Could not import plugin %r (%s): %s' % (identifier, classpath, exc))
+            if not (isinstance(cls, type) and issubclass(cls, Plugin)):
+                raise ImproperlyConfigured('Plugin %r (%s) is not a subclass of %s.%s' % (
+                    identifier, classpath, Plugin.__module__, Plugin.__name__
+                ))
+            classes[identifier] = cls
+        return classes
+
+    def get_class(self, plugin_identifier):
+        """
+        :return: The plugin class for the identifier, or `Plugin` for unknown identifiers
+        :rtype: type
+        """
+        return self.load().get(plugin_identifier, Plugin)
+
+    def get_implementation(self, plugin_identifier):
+        cls = self.get_class(plugin_identifier)
+        if not cls.stateless:
+            return cls()
+        instance = self._instances.get(cls)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.setdefault(cls, cls())
+        return instance
+
+    def clear(self):
+        with self._lock:
+            self._classes = None
+            self._instances = {}
+
+
+plugin_registry = PluginRegistry()
+
 
 def get_implementation(plugin_identifier):
     """
     Get a plugin implementation instance for the given plugin identifier.
 
     The map of identifier to plugin class lives in `settings.DEMOCRACY_PLUGINS`.
+    Instances of stateless plugins are shared, see `Plugin.stateless`.
 
     :param plugin_identifier: Plugin identifier string
     :return: An object instance deriving from `Plugin`.
     :rtype: Plugin
     """
-    classpath = settings.DEMOCRACY_PLUGINS.get(plugin_identifier)
-    if classpath:
-        cls = import_string(classpath)
-    else:
-        cls = Plugin
-    return cls()
+    return plugin_registry.get_implementation(plugin_identifier)
+
+
+def reset_plugin_registry(setting, **kwargs):
+    if setting == 'DEMOCRACY_PLUGINS':
+        plugin_registry.clear()
+
+
+setting_changed.connect(reset_plugin_registry)
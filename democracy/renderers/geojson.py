@@ -46,4 +46,26 @@ class GeoJSONRenderer(JSONRenderer):
             return self.get_list_response(data)
 
     def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None and response.exception:
+            # error details are not features
+            return super().render(data, accepted_media_type, renderer_context)
         return super().render(self.geojsonify(data), accepted_media_type, renderer_context)
+
+    def render_stream(self, items, accepted_media_type=None, renderer_context=None):
+        """
+        Render serialized items into a GeoJSON FeatureCollection piece by piece.
+
+        Each item is turned into a feature and encoded as soon as it is consumed from `items`,
+        so the whole collection never needs to be held in memory.
+
+        :param items: iterable of serialized (dict) items
+        :return: generator of bytestrings
+        """
+        yield b'{"type":"FeatureCollection","features":['
+        separator = b''
+        for item in items:
+            yield separator
+            yield super().render(self.get_single_response(item), accepted_media_type, renderer_context)
+            separator = b','
+        yield b']}'
@@ -2,7 +2,10 @@ import datetime
 
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.utils.functional import empty
 from django.utils.timezone import now
+from easy_thumbnails.storage import thumbnail_default_storage
 from rest_framework.test import APIClient
 
 from democracy.enums import Commenting, InitialSectionType
@@ -31,6 +34,18 @@ def pytest_configure():
     )
 
 
+@pytest.fixture(autouse=True)
+def media_root(settings, tmpdir, monkeypatch):
+    """
+    Save the files of the tests, e.g. uploaded images and their variants, in a temporary directory
+    instead of the MEDIA_ROOT in the source tree.
+    """
+    settings.MEDIA_ROOT = str(tmpdir.mkdir('media'))
+    # the storages read MEDIA_ROOT when they are first used
+    monkeypatch.setattr(default_storage, '_wrapped', empty)
+    monkeypatch.setattr(thumbnail_default_storage, '_wrapped', empty)
+
+
 @pytest.fixture()
 def default_organization():
     return Organization.objects.create(name='The department for squirrel welfare')
@@ -10,3 +10,24 @@ class TestPlugin(Plugin):
         if "6" not in data:
             raise ValidationError("The data must contain a 6.")
         return data[::-1]
+
+
+class StatelessTestPlugin(TestPlugin):
+    stateless = True
+
+
+class LimitedTestPlugin(TestPlugin):
+    max_client_data_size = 10
+
+
+class SummarizingTestPlugin(TestPlugin):
+    """
+    Counts the comments by their (cleaned) data.
+    """
+
+    def get_empty_summary(self):
+        return {}
+
+    def add_to_summary(self, summary, data):
+        summary[data] = summary.get(data, 0) + 1
+        return summary
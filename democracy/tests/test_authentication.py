@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import time
+
+import jwt
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from helusers.jwt import JWTAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from democracy.authentication import CachedJWTAuthentication, TokenCache, get_token_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    with override_settings(DEMOCRACY_JWT_CACHE_TTL=60, DEMOCRACY_JWT_CACHE_SIZE=10):
+        yield
+
+
+def get_token(user, expires_in=3600):
+    payload = {
+        'sub': str(user.uuid),
+        'username': user.username,
+        'aud': settings.JWT_AUTH['JWT_AUDIENCE'],
+        'exp': int(time.time()) + expires_in,
+    }
+    return jwt.encode(payload, settings.JWT_AUTH['JWT_SECRET_KEY']).decode('ascii')
+
+
+def authenticate(token):
+    request = APIRequestFactory().get('/', HTTP_AUTHORIZATION='JWT %s' % token)
+    return CachedJWTAuthentication().authenticate(request)
+
+
+def count_validations(monkeypatch):
+    validations = []
+    authenticate_credentials = JWTAuthentication.authenticate_credentials
+
+    def counting_authenticate_credentials(self, payload):
+        validations.append(payload)
+        return authenticate_credentials(self, payload)
+
+    monkeypatch.setattr(JWTAuthentication, 'authenticate_credentials', counting_authenticate_credentials)
+    return validations
+
+
+@pytest.mark.django_db
+def test_cached_jwt_authentication(monkeypatch, john_smith, default_organization):
+    validations = count_validations(monkeypatch)
+    token = get_token(john_smith)
+    user, jwt_value = authenticate(token)
+    assert user == john_smith
+    assert len(validations) == 1
+
+    with CaptureQueriesContext(connection) as context:
+        user, jwt_value = authenticate(token)
+        assert user.get_default_organization() == default_organization
+    assert user == john_smith
+    assert len(validations) == 1
+    assert len(context) == 2  # the user and the prefetched organizations
+
+
+@pytest.mark.django_db
+def test_cached_jwt_authentication_inactive_user(john_smith):
+    token = get_token(john_smith)
+    authenticate(token)
+    john_smith.is_active = False
+    john_smith.save()
+    with pytest.raises(AuthenticationFailed):
+        authenticate(token)
+
+
+@pytest.mark.django_db
+def test_jwt_authentication_without_cache(monkeypatch, john_smith):
+    validations = count_validations(monkeypatch)
+    token = get_token(john_smith)
+    with override_settings(DEMOCRACY_JWT_CACHE_TTL=0):
+        assert get_token_cache() is None
+        authenticate(token)
+        authenticate(token)
+    assert len(validations) == 2
+
+
+def test_token_cache_expiry(monkeypatch):
+    token_cache = TokenCache(max_size=10, ttl=60)
+    now = time.time()
+    token_cache.set('a', 1)
+    token_cache.set('b', 2, token_expires_at=now + 10)
+    monkeypatch.setattr(time, 'time', lambda: now + 30)
+    assert token_cache.get('a') == 1
+    assert token_cache.get('b') is None
+    monkeypatch.setattr(time, 'time', lambda: now + 90)
+    assert token_cache.get('a') is None
+
+
+def test_token_cache_size():
+    token_cache = TokenCache(max_size=2, ttl=60)
+    token_cache.set('a', 1)
+    token_cache.set('b', 2)
+    token_cache.get('a')
+    token_cache.set('c', 3)
+    assert len(token_cache) == 2
+    assert token_cache.get('a') == 1
+    assert token_cache.get('b') is None
+    assert token_cache.get('c') == 3
@@ -1,7 +1,7 @@
 import pytest
 
 from democracy.factories.hearing import HearingFactory
-from democracy.models import Hearing
+from democracy.models import Hearing, Section, SectionComment
 
 
 @pytest.mark.django_db
@@ -34,3 +34,43 @@ def test_unpublished():
     assert not Hearing.objects.with_unpublished(pk=hearing.pk).exists()  # deleted, not in unpub anymore
     assert Hearing.objects.everything(pk=hearing.pk).exists()  # but still in everything
     assert Hearing.objects.deleted(pk=hearing.pk).exists()  # and now also in deleted
+
+
+@pytest.mark.django_db
+def test_queryset_soft_delete():
+    for _ in range(5):
+        HearingFactory()
+    pks = list(Hearing.objects.values_list('pk', flat=True)[:3])
+    assert Hearing.objects.filter(pk__in=pks).soft_delete() == 3
+    assert Hearing.objects.count() == 2
+    assert Hearing.objects.deleted().count() == 3
+    assert Hearing.objects.deleted(pk__in=pks[:2]).undelete() == 2
+    assert Hearing.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_queryset_soft_delete_cascade(default_hearing):
+    section = default_hearing.sections.first()
+    comment = section.comments.first()
+    comment.images.create(image=section.images.first().image)
+    default_hearing.recache_n_comments()
+    assert default_hearing.n_comments == 9
+
+    section_queryset = Section.objects.filter(pk=section.pk)
+    section_queryset.soft_delete(cascade=True)
+    assert not section.images.exists()
+    assert not section.comments.exists()
+    assert not comment.images.exists()
+    assert Section.objects.everything(pk=section.pk).get().n_comments == 0
+    assert Hearing.objects.get(pk=default_hearing.pk).n_comments == 6
+
+    Section.objects.deleted(pk=section.pk).undelete(cascade=True)
+    assert section.images.count() == 3
+    assert section.comments.count() == 3
+    assert comment.images.count() == 1
+    assert Hearing.objects.get(pk=default_hearing.pk).n_comments == 9
+
+    Hearing.objects.filter(pk=default_hearing.pk).soft_delete(cascade=True)
+    assert not Section.objects.filter(hearing=default_hearing).exists()
+    assert not SectionComment.objects.filter(section__hearing=default_hearing).exists()
+    assert Hearing.objects.everything(pk=default_hearing.pk).get().n_comments == 0
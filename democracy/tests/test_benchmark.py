@@ -0,0 +1,36 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from democracy.models import Hearing, SectionComment, SectionImage
+
+
+@pytest.mark.django_db
+def test_benchmark(default_hearing):
+    output = StringIO()
+    call_command(
+        'democracy_benchmark', hearings=3, sections=2, comments=4, images=2, languages='fi,en', repeat=1,
+        random_seed=1, stdout=output
+    )
+    results = json.loads(output.getvalue())
+
+    assert results['created'] == {
+        'hearings': 3, 'sections': 6, 'comments': 24, 'votes': 0, 'followers': 0, 'images': 12
+    }
+    assert Hearing.objects.count() == 4
+    assert SectionComment.objects.count() == 24 + 9
+    assert SectionImage.objects.filter(image=SectionImage.objects.last().image.name).count() == 12
+    new_hearing = Hearing.objects.exclude(pk=default_hearing.pk).first()
+    assert new_hearing.n_comments == 8
+    assert new_hearing.sections.count() == 2
+
+    endpoints = {result['name']: result for result in results['endpoints']}
+    for name in ('hearing-list', 'hearing-detail', 'sections-list', 'comments-detail', 'image-list', 'label-list'):
+        assert endpoints[name]['status'] == 200
+        assert endpoints[name]['queries'] > 0
+        assert endpoints[name]['peak_memory_bytes'] > 0
+        assert endpoints[name]['time_min'] <= endpoints[name]['time_max']
+    assert endpoints['users-detail'] == {'name': 'users-detail', 'skipped': 'no object to request'}
+    assert not any(name.endswith('vote') for name in endpoints)
@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
+import base64
 import datetime
+import json
 from copy import deepcopy
+from io import StringIO
 
 import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
 from django.test.utils import override_settings
 from django.utils.encoding import force_text
 from django.utils.timezone import now
@@ -11,12 +16,15 @@ from reversion.models import Version
 
 from democracy.enums import Commenting, InitialSectionType
 from democracy.factories.hearing import SectionCommentFactory
-from democracy.models import Hearing, Label, Section, SectionType
+from democracy.models import CommentCounterShard, Hearing, Label, Section, SectionType
 from democracy.models.section import SectionComment
 from democracy.tests.conftest import default_comment_content, default_lang_code
 from democracy.tests.utils import (
-    assert_common_keys_equal, get_data_from_response, get_geojson, get_hearing_detail_url, image_test_json
+    assert_common_keys_equal, get_data_from_response, get_geojson, get_hearing_detail_url, get_polygon_geojson,
+    image_test_json
 )
+from democracy.utils import geo
+from democracy.utils.geo import validate_geometry
 
 
 root_list_url = '/v1/comment/'
@@ -232,6 +240,59 @@ def test_56_add_comment_to_section_with_no_geometry_in_geojson(john_doe_api_clie
     assert data["geojson"][0] == 'Invalid geojson format. "geometry" field is required. Got {\'hello\': \'world\'}'
 
 
+BOWTIE = [[[0, 0], [1, 1], [1, 0], [0, 1], [0, 0]]]
+SQUARE_WITH_HOLE = [[[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]], [[1, 1], [2, 1], [2, 2], [1, 2], [1, 1]]]
+
+
+def densify(ring, n_points_per_edge):
+    points = []
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        points.extend(
+            [x1 + (x2 - x1) * i / n_points_per_edge, y1 + (y2 - y1) * i / n_points_per_edge]
+            for i in range(n_points_per_edge)
+        )
+    return points + [ring[-1]]
+
+
+@pytest.mark.parametrize('geometry', [
+    {'type': 'Point', 'coordinates': [200, 60]},
+    {'type': 'Point', 'coordinates': [24, 'x']},
+    {'type': 'Point', 'coordinates': [24]},
+    {'type': 'LineString', 'coordinates': [[24, 60]]},
+    {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 1]]]},
+    {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]], BOWTIE[0]]},
+    {'type': 'Circle', 'coordinates': [24, 60]},
+    get_polygon_geojson(n_vertices=20000)['geometry'],
+    {'type': 'Polygon', 'coordinates': [densify(BOWTIE[0], 50)]},
+])
+@pytest.mark.django_db
+def test_add_comment_with_out_of_limits_geojson(john_doe_api_client, default_hearing, geometry):
+    section = default_hearing.sections.first()
+    comment_data = get_comment_data(section=section.pk, geojson={'type': 'Feature', 'geometry': geometry})
+    response = john_doe_api_client.post('/v1/comment/', data=comment_data, format='json')
+    data = get_data_from_response(response, status_code=400)
+    assert data["geojson"][0].startswith('Invalid geojson format: ')
+
+
+@pytest.mark.django_db
+def test_add_comment_with_polygon_geojson(john_doe_api_client, default_hearing):
+    section = default_hearing.sections.first()
+    geojson = {'geometry': {'type': 'Polygon', 'coordinates': SQUARE_WITH_HOLE}}
+    comment_data = get_comment_data(section=section.pk, geojson=geojson)
+    response = john_doe_api_client.post('/v1/comment/', data=comment_data, format='json')
+    data = get_data_from_response(response, status_code=201)
+    comment = SectionComment.objects.get(pk=data['id'])
+    assert (comment.bbox_minx, comment.bbox_miny, comment.bbox_maxx, comment.bbox_maxy) == (0, 0, 4, 4)
+
+
+def test_geos_validation_requires_gdal(monkeypatch):
+    validate_geometry({'type': 'Polygon', 'coordinates': SQUARE_WITH_HOLE})
+    monkeypatch.setattr(geo, 'HAS_GDAL', False)
+    # a setup error, not an invalid polygon
+    with pytest.raises(ImproperlyConfigured):
+        validate_geometry({'type': 'Polygon', 'coordinates': SQUARE_WITH_HOLE})
+
+
 @pytest.mark.django_db
 def test_56_add_comment_with_label_to_section(john_doe_api_client, default_hearing, get_comments_url_and_data):
     label_one = Label(id=1, label='The Label')
@@ -412,6 +473,7 @@ def test_56_add_comment_with_images_to_section(john_doe_api_client, default_hear
         'url': data['images'][0]['url'],
         'height': 635,
         'width': 952,
+        'variants': data['images'][0]['variants'],
     })
 
     assert len(new_comment_list) == len(old_comment_list) + 1
@@ -480,6 +542,31 @@ def test_56_add_comment_with_image_too_big(john_doe_api_client, default_hearing,
     assert data['images'][0]['image'][0] == 'Image size should be smaller than 10 bytes.'
 
 
+@pytest.mark.django_db
+def test_add_comment_with_image_too_many_pixels(john_doe_api_client, default_hearing):
+    section = default_hearing.sections.first()
+    comment_data = get_comment_data(section=section.pk, images=[image_test_json()])
+    with override_settings(MAX_IMAGE_PIXELS=1000):
+        response = john_doe_api_client.post(root_list_url, data=comment_data, format='json')
+    data = get_data_from_response(response, status_code=400)
+    assert data['images'][0]['image'][0] == 'Image should have less than 1000 pixels.'
+
+
+@pytest.mark.parametrize('image_data, expected_error', [
+    ('data:image/jpg;base64,QUJD;base64,QUJD', 'Not a valid base64 image.'),
+    ('data:image/jpg;base64,QUJDR', 'Not a valid base64 image.'),
+    ('data:image/png;base64,' + base64.b64encode(b'definitely not an image' * 100).decode('ascii'),
+     'Upload a valid image. The file you uploaded was either not an image or a corrupted image.'),
+])
+@pytest.mark.django_db
+def test_add_comment_with_broken_base64_image(john_doe_api_client, default_hearing, image_data, expected_error):
+    section = default_hearing.sections.first()
+    comment_data = get_comment_data(section=section.pk, images=[dict(image_test_json(), image=image_data)])
+    response = john_doe_api_client.post(root_list_url, data=comment_data, format='json')
+    data = get_data_from_response(response, status_code=400)
+    assert data['images'][0]['image'][0] == expected_error
+
+
 @pytest.mark.django_db
 def test_add_comment_to_section_user_has_name(john_doe_api_client, john_doe, default_hearing,
                                               get_comments_url_and_data):
@@ -601,6 +688,35 @@ def test_n_comments_updates(admin_user, default_hearing):
     assert Hearing.objects.get(pk=default_hearing.pk).n_comments == 9
 
 
+@pytest.mark.django_db
+@override_settings(DEMOCRACY_COMMENT_COUNTER_SHARDS=4)
+def test_sharded_n_comments(john_doe_api_client, default_hearing):
+    main_section = default_hearing.get_main_section()
+    url = get_main_comments_url(default_hearing)
+    for _ in range(5):
+        get_data_from_response(john_doe_api_client.post(url, data=get_comment_data()), 201)
+
+    # the counts are not updated directly, but they are included in the API
+    hearing = Hearing.objects.get(pk=default_hearing.pk)
+    assert hearing.n_comments == 9
+    assert hearing.get_n_comments() == 14
+    data = get_data_from_response(john_doe_api_client.get('/v1/hearing/%s/' % hearing.pk))
+    assert data['n_comments'] == 14
+    assert [section['n_comments'] for section in data['sections'] if section['id'] == main_section.pk] == [8]
+    assert 1 <= CommentCounterShard.objects.count() <= 4
+
+    call_command('democracy_compact_comment_counters', stdout=StringIO())
+    assert not CommentCounterShard.objects.exists()
+    assert Section.objects.get(pk=main_section.pk).n_comments == 8
+    assert Hearing.objects.get(pk=default_hearing.pk).n_comments == 14
+
+    # deleting a comment recounts the comments exactly, and drops any pending shards
+    get_data_from_response(john_doe_api_client.post(url, data=get_comment_data()), 201)
+    main_section.comments.first().soft_delete()
+    assert not CommentCounterShard.objects.exists()
+    assert Hearing.objects.get(pk=default_hearing.pk).get_n_comments() == 14
+
+
 @pytest.mark.django_db
 def test_comment_edit_versioning(john_doe_api_client, default_hearing, lookup_field):
     url = get_main_comments_url(default_hearing, lookup_field)
@@ -775,6 +891,68 @@ def test_get_plugin_data_for_comment(api_client, default_hearing):
         assert created_comment["plugin_data"] == comment_data["plugin_data"][::-1]  # The TestPlugin reverses data
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize("root", (False, True))
+def test_add_comment_batch(john_doe_api_client, default_hearing, root):
+    with override_settings(
+        DEMOCRACY_PLUGINS={
+            "test_plugin": "democracy.tests.plug.TestPlugin"
+        }
+    ):
+        section = default_hearing.sections.first()
+        section.plugin_identifier = "test_plugin"
+        section.save()
+        url = get_hearing_detail_url(default_hearing.id, 'sections/%s/comments/batch' % section.id)
+        comments_data = [get_comment_data(content="", plugin_data="foo%d6" % x) for x in range(3)]
+        if root:
+            url = '/v1/comment/batch/'
+            for comment_data in comments_data:
+                comment_data["section"] = section.id
+        response = john_doe_api_client.post(url, data=comments_data, format='json')
+        data = get_data_from_response(response, status_code=201)
+        assert [comment["section"] for comment in data] == [section.id] * 3
+        created_comments = SectionComment.objects.filter(plugin_identifier="test_plugin")
+        assert sorted(comment.plugin_data for comment in created_comments) == ["60oof", "61oof", "62oof"]
+        assert all(comment.created_by == john_doe_api_client.user for comment in created_comments)
+
+
+@pytest.mark.django_db
+def test_add_comment_batch_invalid_plugin_data(john_doe_api_client, default_hearing):
+    with override_settings(
+        DEMOCRACY_PLUGINS={
+            "test_plugin": "democracy.tests.plug.LimitedTestPlugin"
+        }
+    ):
+        section = default_hearing.sections.first()
+        section.plugin_identifier = "test_plugin"
+        section.save()
+        url = get_hearing_detail_url(default_hearing.id, 'sections/%s/comments/batch' % section.id)
+        n_comments = SectionComment.objects.count()
+        comments_data = [
+            get_comment_data(content="", plugin_data="foo6"),
+            get_comment_data(content="", plugin_data="foo"),
+            get_comment_data(content="", plugin_data="foo6" * 3),
+        ]
+        response = john_doe_api_client.post(url, data=comments_data, format='json')
+        data = get_data_from_response(response, status_code=400)
+        assert data[0] == {}
+        assert data[1] == {"plugin_data": ["The data must contain a 6."]}
+        assert "at most 10 characters" in data[2]["plugin_data"][0]
+        assert SectionComment.objects.count() == n_comments
+
+
+@pytest.mark.django_db
+def test_add_comment_batch_too_large(john_doe_api_client, default_hearing):
+    section = default_hearing.sections.first()
+    url = get_hearing_detail_url(default_hearing.id, 'sections/%s/comments/batch' % section.id)
+    n_comments = SectionComment.objects.count()
+    with override_settings(DEMOCRACY_COMMENT_BATCH_MAX_SIZE=2):
+        response = john_doe_api_client.post(url, data=[get_comment_data()] * 3, format='json')
+    data = get_data_from_response(response, status_code=400)
+    assert "At most 2 comments" in data["non_field_errors"][0]
+    assert SectionComment.objects.count() == n_comments
+
+
 @pytest.mark.parametrize('data', [{'section': 'nonexistingsection'}, None])
 @pytest.mark.django_db
 def test_post_to_root_endpoint_invalid_section(john_doe_api_client, default_hearing, data):
@@ -813,6 +991,59 @@ def test_root_endpoint_filters(api_client, default_hearing, random_hearing):
     assert len(response_data['results']) == 9
 
 
+@pytest.mark.django_db
+def test_root_endpoint_bbox_filter(api_client, default_hearing):
+    url = '/v1/comment/'
+    comment = default_hearing.sections.first().comments.first()
+    comment.geojson = get_geojson()
+    comment.save()
+    comment.refresh_from_db()
+    assert (comment.bbox_minx, comment.bbox_miny) == tuple(get_geojson()['geometry']['coordinates'])
+
+    response_data = get_data_from_response(api_client.get(url, {'bbox': '-105,39,-104,40'}))
+    assert [result['id'] for result in response_data['results']] == [comment.id]
+
+    response_data = get_data_from_response(api_client.get(url, {'bbox': '24,60,25,61'}))
+    assert len(response_data['results']) == 0
+
+    get_data_from_response(api_client.get(url, {'bbox': 'foo'}), status_code=400)
+
+
+@pytest.mark.django_db
+def test_root_endpoint_geojson_stream(api_client, default_hearing):
+    url = '/v1/comment/'
+    comment = default_hearing.sections.first().comments.first()
+    comment.geojson = get_geojson()
+    comment.save()
+
+    paginated_data = get_data_from_response(api_client.get(url, {'format': 'geojson', 'limit': 100}))
+    response = api_client.get(url, {'format': 'geojson', 'stream': '1'})
+    assert response.status_code == 200
+    assert response.streaming
+    stream_data = json.loads(b''.join(response.streaming_content).decode('utf-8'))
+    assert stream_data['type'] == 'FeatureCollection'
+    assert stream_data['features'] == paginated_data['features']
+    streamed_comment = [feature for feature in stream_data['features'] if feature['id'] == comment.id][0]
+    assert streamed_comment['geometry'] == comment.geojson['geometry']
+
+    response = api_client.get(url, {'format': 'geojson', 'stream': '1', 'bbox': '24,60,25,61'})
+    assert json.loads(b''.join(response.streaming_content).decode('utf-8'))['features'] == []
+
+
+@pytest.mark.django_db
+def test_root_endpoint_geojson_stream_max_objects(api_client, default_hearing):
+    url = '/v1/comment/'
+    n_comments = get_data_from_response(api_client.get(url))['count']
+    with override_settings(DEMOCRACY_GEOJSON_STREAM_MAX_OBJECTS=n_comments - 1):
+        response = api_client.get(url, {'format': 'geojson', 'stream': '1'})
+        data = get_data_from_response(response, status_code=400)
+        assert data['stream'][0].startswith('At most %d objects can be streamed at once' % (n_comments - 1))
+    with override_settings(DEMOCRACY_GEOJSON_STREAM_MAX_OBJECTS=n_comments):
+        response = api_client.get(url, {'format': 'geojson', 'stream': '1'})
+        assert response.status_code == 200
+        assert len(json.loads(b''.join(response.streaming_content).decode('utf-8'))['features']) == n_comments
+
+
 @pytest.mark.parametrize('hearing_update', [
     ('deleted', True),
     ('published', False),
@@ -1,8 +1,13 @@
+import threading
+
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 
 from democracy.enums import InitialSectionType, Commenting
 from democracy.models import Section, SectionComment, SectionType
 from democracy.tests.test_images import get_hearing_detail_url
+from democracy.utils.vote_buffer import get_vote_buffer
 
 
 default_content = 'Awesome comment to vote.'
@@ -65,6 +70,66 @@ def test_anonymous_vote_section_comment_vote_add_vote_check_amount_of_votes(api_
     assert comment.n_votes == 2
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_anonymous_votes_buffered(api_client, john_doe_api_client, default_hearing, backend, tmpdir):
+    section, comment = add_default_section_and_comment(default_hearing)
+    other_comment = SectionComment.objects.create(content='Other comment', section=section)
+    section.voting = Commenting.OPEN
+    section.save()
+    john_doe_api_client.post(get_section_comment_vote_url(default_hearing.id, section.id, comment.id))
+
+    buffer_setting = 'memory' if backend == 'memory' else str(tmpdir.join('votes.sqlite3'))
+    with override_settings(DEMOCRACY_VOTE_BUFFER=buffer_setting, DEMOCRACY_VOTE_BUFFER_FLUSH_SIZE=1000):
+        for voted_comment in [comment] * 5 + [other_comment] * 3:
+            response = api_client.post(get_section_comment_vote_url(default_hearing.id, section.id, voted_comment.id))
+            assert response.status_code == 200
+        # acknowledged, but not written yet
+        assert SectionComment.objects.get(pk=comment.pk).n_votes == 1
+
+        with CaptureQueriesContext(connection) as queries:
+            assert get_vote_buffer().flush() == 8
+        assert len([query for query in queries if query['sql'].startswith('UPDATE')]) == 2
+
+    comment = SectionComment.objects.get(pk=comment.pk)
+    assert (comment.n_votes, comment.n_unregistered_votes) == (6, 5)
+    other_comment = SectionComment.objects.get(pk=other_comment.pk)
+    assert (other_comment.n_votes, other_comment.n_unregistered_votes) == (3, 3)
+
+
+@pytest.mark.django_db
+def test_vote_buffer_flushed_when_full(api_client, default_hearing):
+    section, comment = add_default_section_and_comment(default_hearing)
+    section.voting = Commenting.OPEN
+    section.save()
+    with override_settings(DEMOCRACY_VOTE_BUFFER='memory', DEMOCRACY_VOTE_BUFFER_FLUSH_SIZE=3):
+        for _ in range(4):
+            api_client.post(get_section_comment_vote_url(default_hearing.id, section.id, comment.id))
+        assert SectionComment.objects.get(pk=comment.pk).n_votes == 3
+        get_vote_buffer().flush()
+    assert SectionComment.objects.get(pk=comment.pk).n_votes == 4
+
+
+@pytest.mark.django_db
+def test_vote_buffer_flushed_after_interval(monkeypatch, api_client, default_hearing):
+    section, comment = add_default_section_and_comment(default_hearing)
+    section.voting = Commenting.OPEN
+    section.save()
+    started_timers = []
+    monkeypatch.setattr(threading.Timer, 'start', lambda timer: started_timers.append(timer))
+    # the timer function is run in the test thread, whose connection must stay open
+    monkeypatch.setattr(connection, 'close', lambda: None)
+    with override_settings(DEMOCRACY_VOTE_BUFFER='memory', DEMOCRACY_VOTE_BUFFER_FLUSH_INTERVAL=5):
+        for _ in range(2):
+            api_client.post(get_section_comment_vote_url(default_hearing.id, section.id, comment.id))
+        timer, = started_timers
+        assert timer.interval == 5
+        assert SectionComment.objects.get(pk=comment.pk).n_votes == 0
+        timer.function()
+        assert SectionComment.objects.get(pk=comment.pk).n_votes == 2
+        assert get_vote_buffer().flush() == 0
+
+
 @pytest.mark.django_db
 def test_31_section_comment_vote_add_vote(john_doe_api_client, default_hearing):
     section, comment = add_default_section_and_comment(default_hearing)
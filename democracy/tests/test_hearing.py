@@ -1,6 +1,9 @@
 import datetime
+import json
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.encoding import force_text
 from django.utils.timezone import now
 
@@ -10,8 +13,8 @@ from democracy.models import (
 )
 from democracy.models.utils import copy_hearing
 from democracy.tests.utils import (
-    assert_common_keys_equal, assert_datetime_fuzzy_equal, get_data_from_response, get_geojson,
-    get_hearing_detail_url, sectionimage_test_json
+    assert_common_keys_equal, assert_datetime_fuzzy_equal, create_default_images, get_data_from_response, get_geojson,
+    get_hearing_detail_url, get_polygon_geojson, sectionimage_test_json
 )
 from democracy.tests.conftest import default_lang_code
 
@@ -467,6 +470,47 @@ def test_hearing_geo(api_client, random_hearing):
     assert_common_keys_equal(geojson_data["properties"], random_hearing.geojson["properties"])
     map_data = get_data_from_response(api_client.get(list_endpoint + "map/"))
     assert map_data['results'][0]["geojson"] == random_hearing.geojson
+    response = api_client.get(list_endpoint, {'format': 'geojson', 'stream': '1'})
+    stream_data = json.loads(b''.join(response.streaming_content).decode('utf-8'))
+    assert [feature['id'] for feature in stream_data['features']] == [random_hearing.id]
+    assert_common_keys_equal(stream_data['features'][0]["geometry"], random_hearing.geojson["geometry"])
+
+
+@pytest.mark.django_db
+def test_hearing_map_simplified(api_client, random_hearing):
+    random_hearing.geojson = get_polygon_geojson()
+    random_hearing.save()
+    n_vertices = len(random_hearing.geojson["geometry"]["coordinates"][0])
+
+    map_data = get_data_from_response(api_client.get(list_endpoint + "map/"))
+    assert map_data['results'][0]["geojson"] == random_hearing.geojson
+
+    for params in ({'zoom': 10}, {'tolerance': 0.001}):
+        map_data = get_data_from_response(api_client.get(list_endpoint + "map/", params))
+        geojson = map_data['results'][0]["geojson"]
+        assert geojson["properties"] == random_hearing.geojson["properties"]
+        assert 4 <= len(geojson["geometry"]["coordinates"][0]) < n_vertices
+
+    # tolerances below the precomputed ones get the original geometry
+    map_data = get_data_from_response(api_client.get(list_endpoint + "map/", {'tolerance': 0.0000001}))
+    assert map_data['results'][0]["geojson"] == random_hearing.geojson
+
+    get_data_from_response(api_client.get(list_endpoint + "map/", {'zoom': 'foo'}), status_code=400)
+
+
+@pytest.mark.django_db
+def test_hearing_map_bbox(api_client, random_hearing):
+    random_hearing.geojson = get_polygon_geojson(center=(24.94, 60.17))
+    random_hearing.save()
+
+    map_data = get_data_from_response(api_client.get(list_endpoint + "map/", {'bbox': '24.9,60.1,25.0,60.2'}))
+    assert [result['id'] for result in map_data['results']] == [random_hearing.id]
+    map_data = get_data_from_response(api_client.get(list_endpoint + "map/", {'bbox': '22.2,60.4,22.3,60.5'}))
+    assert map_data['results'] == []
+    list_data = get_data_from_response(api_client.get(list_endpoint, {'bbox': '24.9,60.1,25.0,60.2'}))
+    assert [result['id'] for result in list_data['results']] == [random_hearing.id]
+
+    get_data_from_response(api_client.get(list_endpoint + "map/", {'bbox': '1,2,3'}), status_code=400)
 
 
 @pytest.mark.django_db
@@ -514,6 +558,36 @@ def test_hearing_copy(default_hearing, random_label):
     # closure info section should not have been copied
     assert not new_hearing.sections.filter(type__identifier=InitialSectionType.CLOSURE_INFO).exists()
 
+    # the old hearing should be left as it was
+    assert Hearing.objects.get(pk=default_hearing.pk).title == default_hearing.title
+    assert default_hearing.sections.count() == 4
+
+    # section images should have been copied with their translations
+    old_titles = set(SectionImage.objects.filter(section__hearing=default_hearing).values_list(
+        'translations__title', flat=True))
+    new_titles = set(SectionImage.objects.filter(section__hearing=new_hearing).values_list(
+        'translations__title', flat=True))
+    assert new_titles == old_titles
+
+
+@pytest.mark.django_db
+def test_hearing_copy_query_count(default_hearing):
+    with CaptureQueriesContext(connection) as small_copy_queries:
+        copy_hearing(default_hearing, slug='small-copy')
+
+    for section in list(default_hearing.sections.all()):
+        for i in range(3):
+            section.pk = None
+            section.ordering = 1
+            section.save()
+            create_default_images(section)
+    with CaptureQueriesContext(connection) as large_copy_queries:
+        new_hearing = copy_hearing(default_hearing, slug='large-copy')
+
+    assert len(large_copy_queries) == len(small_copy_queries)
+    assert new_hearing.sections.count() == 12
+    assert SectionImage.objects.filter(section__hearing=new_hearing).count() == 36
+
 
 @pytest.mark.parametrize('client, expected', [
     ('api_client', False),
@@ -564,6 +638,41 @@ def test_slug():
     assert hearing.slug == 'slug-3'
 
 
+@pytest.mark.django_db
+def test_slug_not_regenerated_on_save(default_hearing):
+    hearing = Hearing.objects.get(pk=default_hearing.pk)
+    with CaptureQueriesContext(connection) as queries:
+        hearing.n_comments = 42
+        hearing.save(update_fields=('n_comments',))
+    assert len(queries) == 1
+
+    with CaptureQueriesContext(connection) as queries:
+        hearing.save()
+    assert not any('LIKE' in query['sql'] for query in queries)
+
+
+@pytest.mark.django_db
+def test_long_slug_collision():
+    title = 'a very long hearing title that does not fit in a slug as is'
+    first = Hearing.objects.create(title=title)
+    second = Hearing.objects.create(title=title)
+    max_length = Hearing._meta.get_field('slug').max_length
+    assert len(first.slug) == len(second.slug) == max_length
+    assert second.slug == first.slug[:max_length - 2] + '-2'
+
+
+@pytest.mark.django_db
+def test_slug_taken_while_saving(monkeypatch):
+    Hearing.objects.create(title='taken', slug='taken')
+    hearing = Hearing(title='new')
+    # simulate another hearing getting the slug between generating and saving it
+    generated_slugs = iter(['taken', 'taken-2'])
+    monkeypatch.setattr(hearing, 'generate_unique_slug', lambda: next(generated_slugs))
+    hearing.save()
+    hearing.refresh_from_db()
+    assert hearing.slug == 'taken-2'
+
+
 @pytest.mark.django_db
 def test_access_hearing_using_slug(api_client, default_hearing):
     default_hearing.slug = 'new-slug'
@@ -1,8 +1,21 @@
 import datetime
+import hashlib
+import os
+from io import StringIO
+
 import pytest
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test.utils import override_settings
 from django.utils.timezone import now
 
-from democracy.tests.utils import IMAGES, create_default_images, get_data_from_response, get_hearing_detail_url
+from democracy.models import ImageUpload, SectionImage
+from democracy.models.section import CommentImage
+from democracy.tests.utils import (
+    IMAGE_SOURCE_PATH, IMAGES, create_default_images, get_data_from_response, get_hearing_detail_url,
+    image_test_json
+)
 from democracy.tests.conftest import default_lang_code
 
 
@@ -20,6 +33,7 @@ def check_entity_images(entity, images_field=True):
         assert 'width' in im
         assert 'height' in im
         assert 'url' in im
+        assert 'variants' in im
 
 
 @pytest.mark.django_db
@@ -126,3 +140,165 @@ def test_root_endpoint_filtering_by_hearing_visibility(api_client, default_heari
     response = api_client.get('/v1/image/')
     response_data = get_data_from_response(response)['results']
     assert len(response_data) == 0
+
+
+def check_original_image_variants(variants):
+    # the original test image is 952 pixels wide, so only the smaller aliases are generated
+    assert set(variants) == {'small', 'medium'}
+    assert (variants['small']['width'], variants['medium']['width']) == (320, 768)
+    for variant in variants.values():
+        assert variant['url'].startswith('http://testserver/media/images/')
+        assert 0 < variant['height'] < 635
+
+
+@pytest.mark.django_db
+def test_image_variants_generated_on_upload(john_doe_api_client, default_hearing):
+    section = default_hearing.get_main_section()
+    comment_data = {'section': section.pk, 'content': 'Look at this', 'images': [image_test_json()]}
+    response = john_doe_api_client.post('/v1/comment/', data=comment_data, format='json')
+    data = get_data_from_response(response, status_code=201)
+    check_original_image_variants(data['images'][0]['variants'])
+
+
+@pytest.mark.django_db
+def test_generate_image_variants_command(api_client, default_hearing):
+    images = default_hearing.get_main_section().images
+    image = images.get(translations__title=IMAGES['ORIGINAL'])
+    assert image.variants == {}
+
+    call_command('democracy_generate_image_variants')
+    image.refresh_from_db()
+    assert set(image.variants) == {'small', 'medium'}
+    assert images.get(translations__title=IMAGES['THUMBNAIL']).variants == {}
+
+    data = get_data_from_response(api_client.get('/v1/image/%s/' % image.pk))
+    check_original_image_variants(data['variants'])
+
+
+def upload_image(api_client, filename=IMAGES['ORIGINAL'], raw=False):
+    with open(os.path.join(IMAGE_SOURCE_PATH, filename), 'rb') as image_file:
+        if raw:
+            return api_client.generic('POST', '/v1/image_upload/', image_file.read(), content_type='image/jpeg')
+        return api_client.post('/v1/image_upload/', {'image': image_file}, format='multipart')
+
+
+@pytest.mark.parametrize('raw', [False, True])
+@pytest.mark.django_db
+def test_image_upload(john_doe_api_client, default_hearing, raw):
+    data = get_data_from_response(upload_image(john_doe_api_client, raw=raw), status_code=201)
+    assert (data['width'], data['height']) == (952, 635)
+    assert ImageUpload.objects.get(pk=data['token']).created_by == john_doe_api_client.user
+
+    comment_data = {
+        'section': default_hearing.get_main_section().pk,
+        'content': 'Look at this',
+        'images': [{'title': 'Uploaded', 'upload': data['token']}],
+    }
+    response = john_doe_api_client.post('/v1/comment/', data=comment_data, format='json')
+    data = get_data_from_response(response, status_code=201)
+    image = data['images'][0]
+    assert image['url'].startswith('http://testserver/media/images/')
+    assert (image['title'], image['width'], image['height']) == ('Uploaded', 952, 635)
+    check_original_image_variants(image['variants'])
+
+
+@pytest.mark.django_db
+def test_image_upload_token_checks(api_client, john_doe_api_client, jane_doe_api_client, default_hearing):
+    token = get_data_from_response(upload_image(john_doe_api_client), status_code=201)['token']
+
+    def post_comment(client, images):
+        comment_data = {'section': default_hearing.get_main_section().pk, 'content': 'Look', 'images': images}
+        return client.post('/v1/comment/', data=comment_data, format='json')
+
+    # somebody else's upload
+    data = get_data_from_response(post_comment(jane_doe_api_client, [{'upload': token}]), status_code=400)
+    assert data['images'][0]['upload'][0] == 'Invalid or expired upload token "%s".' % token
+
+    ImageUpload.objects.filter(pk=token).update(created_at=now() - datetime.timedelta(days=2))
+    data = get_data_from_response(post_comment(john_doe_api_client, [{'upload': token}]), status_code=400)
+    assert data['images'][0]['upload'][0] == 'Invalid or expired upload token "%s".' % token
+    call_command('democracy_purge_image_uploads')
+    assert not ImageUpload.objects.filter(pk=token).exists()
+
+    data = get_data_from_response(post_comment(john_doe_api_client, [{'title': 'nothing'}]), status_code=400)
+    assert data['images'][0]['image'][0] == 'This field is required.'
+
+    # anonymous uploads are available to anyone with the token
+    token = get_data_from_response(upload_image(api_client), status_code=201)['token']
+    get_data_from_response(post_comment(jane_doe_api_client, [{'upload': token}]), status_code=201)
+
+
+@pytest.mark.django_db
+def test_image_upload_used_once(john_doe_api_client, default_hearing):
+    token = get_data_from_response(upload_image(john_doe_api_client), status_code=201)['token']
+    upload = ImageUpload.objects.get(pk=token)
+    comment_data = {
+        'section': default_hearing.get_main_section().pk,
+        'content': 'Look at this',
+        'images': [{'title': 'Uploaded', 'upload': token}],
+    }
+    get_data_from_response(john_doe_api_client.post('/v1/comment/', data=comment_data, format='json'), 201)
+    assert not ImageUpload.objects.filter(pk=token).exists()
+
+    data = get_data_from_response(
+        john_doe_api_client.post('/v1/comment/', data=comment_data, format='json'), status_code=400
+    )
+    assert data['images'][0]['upload'][0] == 'Invalid or expired upload token "%s".' % token
+    assert CommentImage.objects.filter(comment__section__hearing=default_hearing).count() == 1
+    # a concurrent request having already validated the token can't claim it anymore
+    assert not upload.claim()
+
+
+@pytest.mark.django_db
+def test_image_upload_invalid(api_client):
+    with override_settings(MAX_IMAGE_SIZE=10):
+        data = get_data_from_response(upload_image(api_client, raw=True), status_code=400)
+    assert data['image'][0] == 'Image size should be smaller than 10 bytes.'
+
+    with override_settings(MAX_IMAGE_PIXELS=1000):
+        data = get_data_from_response(upload_image(api_client), status_code=400)
+    assert data['image'][0] == 'Image should have less than 1000 pixels.'
+
+    response = api_client.generic('POST', '/v1/image_upload/', b'not an image', content_type='image/jpeg')
+    get_data_from_response(response, status_code=400)
+    assert not ImageUpload.objects.exists()
+
+
+@pytest.mark.django_db
+def test_image_upload_throttled(api_client, john_doe_api_client):
+    cache.clear()
+    with override_settings(DEMOCRACY_IMAGE_UPLOAD_RATE='2/hour'):
+        for _ in range(2):
+            get_data_from_response(upload_image(api_client), status_code=201)
+        get_data_from_response(upload_image(api_client), status_code=429)
+        # the uploads of users are counted separately
+        get_data_from_response(upload_image(john_doe_api_client), status_code=201)
+    with override_settings(DEMOCRACY_IMAGE_UPLOAD_RATE=None):
+        get_data_from_response(upload_image(api_client), status_code=201)
+    assert ImageUpload.objects.count() == 4
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_image_file_metadata(api_client, default_hearing):
+    image = default_hearing.get_main_section().images.get(translations__title=IMAGES['ORIGINAL'])
+    with open(os.path.join(IMAGE_SOURCE_PATH, IMAGES['ORIGINAL']), 'rb') as image_file:
+        content = image_file.read()
+    assert (image.width, image.height) == (952, 635)
+    assert image.file_size == len(content)
+    assert image.content_hash == hashlib.sha256(content).hexdigest()
+
+    # images are serialized from the stored metadata even if their files have gone missing
+    SectionImage.objects.filter(pk=image.pk).update(image='images/missing.jpg')
+    data = get_data_from_response(api_client.get('/v1/image/%s/' % image.pk))
+    assert (data['width'], data['height']) == (952, 635)
+
+    out = StringIO()
+    call_command('democracy_check_image_storage', stdout=out)
+    assert 'SectionImage %s: images/missing.jpg missing' % image.pk in out.getvalue()
+    assert 'section images: checked 9, problems with 1' in out.getvalue()
+
+    SectionImage.objects.filter(pk=image.pk).update(content_hash='')
+    err = StringIO()
+    call_command('democracy_update_image_metadata', stdout=StringIO(), stderr=err)
+    assert 'SectionImage %s: cannot read images/missing.jpg' % image.pk in err.getvalue()
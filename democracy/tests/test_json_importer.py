@@ -3,6 +3,7 @@
 from copy import deepcopy
 
 import pytest
+from django.test.utils import override_settings
 from django.utils.crypto import get_random_string
 
 from democracy.enums import InitialSectionType
@@ -119,3 +120,19 @@ def test_json_importer():
     assert hearing.sections.filter(type__identifier=InitialSectionType.SCENARIO).count() == 2
     assert hearing.sections.filter(type__identifier=InitialSectionType.PART).count() == 1
     # TODO: This test could probably be better
+
+
+@pytest.mark.django_db
+def test_json_importer_plugin_data():
+    data = deepcopy(EXAMPLE_DATA)
+    hearing_id = get_random_string()
+    hearing_data = data["hearings"]["1"]
+    hearing_data["slug"] = hearing_id
+    section_data = hearing_data["sections"][0]
+    section_data["plugin_identifier"] = "test_plugin"
+    section_data["comments"][0]["plugin_data"] = "foo6"
+    section_data["comments"][1]["plugin_data"] = "invalid"
+    with override_settings(DEMOCRACY_PLUGINS={"test_plugin": "democracy.tests.plug.TestPlugin"}):
+        import_from_data(data)
+    section = Hearing.objects.get(id=hearing_id).sections.get(plugin_identifier="test_plugin")
+    assert sorted(section.comments.values_list("plugin_data", flat=True)) == ["", "6oof"]
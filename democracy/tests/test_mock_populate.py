@@ -0,0 +1,43 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Count
+
+from democracy.factories.bulk import create_hearings, seed_random
+from democracy.models import Hearing, SectionComment
+
+
+@pytest.mark.django_db
+def test_mock_populate_scale():
+    call_command('democracy_mock_populate', scale=1, seed=42)
+
+    assert get_user_model().objects.count() == 101
+    assert Hearing.objects.count() == 10
+    assert SectionComment.objects.count() == 1000
+    assert Hearing.objects.first().translations.count() == 3
+    assert Hearing.followers.through.objects.exists()
+    assert SectionComment.voters.through.objects.exists()
+    for comment in SectionComment.objects.annotate(n_voters=Count('voters')):
+        assert comment.n_votes == comment.n_voters
+
+
+@pytest.mark.django_db
+def test_bulk_data_is_repeatable(john_doe, jane_doe):
+    user_ids = [john_doe.pk, jane_doe.pk]
+
+    def get_data():
+        with transaction.atomic():
+            seed_random(7)
+            create_hearings(2, n_sections=2, n_comments=3, n_images=0, user_ids=user_ids, n_votes=2, n_followers=2)
+            data = [
+                (hearing.title, hearing.slug, sorted(hearing.followers.values_list('pk', flat=True)))
+                for hearing in Hearing.objects.order_by('slug')
+            ] + [
+                (comment.content, comment.created_by_id, sorted(comment.voters.values_list('pk', flat=True)))
+                for comment in SectionComment.objects.order_by('content')
+            ]
+            transaction.set_rollback(True)
+        return data
+
+    assert get_data() == get_data()
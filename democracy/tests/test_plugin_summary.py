@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.test.utils import override_settings
+
+from democracy.models import SectionComment, SectionPluginSummary
+from democracy.tests.plug import SummarizingTestPlugin
+from democracy.tests.utils import get_data_from_response, get_hearing_detail_url
+
+
+@pytest.fixture
+def plugin_section(default_hearing):
+    with override_settings(DEMOCRACY_PLUGINS={
+        "test_plugin": "democracy.tests.plug.SummarizingTestPlugin",
+        "plain_plugin": "democracy.tests.plug.TestPlugin",
+    }):
+        section = default_hearing.sections.first()
+        section.plugin_identifier = "test_plugin"
+        section.save()
+        yield section
+
+
+def add_plugin_comment(section, plugin_data):
+    return section.comments.create(plugin_identifier=section.plugin_identifier, plugin_data=plugin_data)
+
+
+def get_summary(api_client, section, status_code=200):
+    url = get_hearing_detail_url(section.hearing_id, 'sections/%s/plugin_summary' % section.id)
+    return get_data_from_response(api_client.get(url), status_code=status_code)
+
+
+@pytest.mark.django_db
+def test_plugin_summary(api_client, plugin_section):
+    data = get_summary(api_client, plugin_section)
+    assert data["plugin_identifier"] == "test_plugin"
+    assert data["n_comments"] == 0
+    assert data["summary"] == {}
+
+    add_plugin_comment(plugin_section, "a")
+    add_plugin_comment(plugin_section, "b")
+    add_plugin_comment(plugin_section, "a")
+    data = get_summary(api_client, plugin_section)
+    assert data["n_comments"] == 3
+    assert data["summary"] == {"a": 2, "b": 1}
+
+
+@pytest.mark.django_db
+def test_plugin_summary_built_from_existing_comments(api_client, plugin_section):
+    add_plugin_comment(plugin_section, "a")
+    SectionPluginSummary.objects.all().delete()
+    add_plugin_comment(plugin_section, "b")
+    assert get_summary(api_client, plugin_section)["summary"] == {"a": 1, "b": 1}
+
+
+@pytest.mark.django_db
+def test_plugin_summary_comment_removal(api_client, plugin_section):
+    comments = [add_plugin_comment(plugin_section, data) for data in ("a", "b", "c", "c")]
+    comments[0].soft_delete()
+    comments[1].published = False
+    comments[1].save()
+    SectionComment.objects.filter(pk=comments[2].pk).soft_delete()
+    data = get_summary(api_client, plugin_section)
+    assert data["n_comments"] == 1
+    assert data["summary"] == {"c": 1}
+
+
+@pytest.mark.django_db
+def test_plugin_summary_plugin_change(api_client, plugin_section):
+    add_plugin_comment(plugin_section, "a")
+    plugin_section.plugin_identifier = "plain_plugin"
+    plugin_section.save()
+    get_summary(api_client, plugin_section, status_code=404)
+    assert not SectionPluginSummary.objects.exists()
+
+
+@pytest.mark.django_db
+def test_no_plugin_summary(api_client, default_hearing):
+    get_summary(api_client, default_hearing.sections.first(), status_code=404)
+
+
+@pytest.mark.django_db
+def test_rebuild_plugin_summaries(plugin_section):
+    add_plugin_comment(plugin_section, "a")
+    SectionPluginSummary.objects.update(summary={}, n_comments=0)
+    output = StringIO()
+    call_command("democracy_rebuild_plugin_summaries", stdout=output)
+    assert "1 sections" in output.getvalue()
+    assert SectionPluginSummary.objects.get(section=plugin_section).summary == {"a": 1}
+
+
+@pytest.mark.django_db
+def test_plugin_summary_plugin_data_cleared(api_client, plugin_section):
+    comment = add_plugin_comment(plugin_section, "a")
+    add_plugin_comment(plugin_section, "b")
+    comment = SectionComment.objects.get(pk=comment.pk)
+    comment.plugin_data = ""
+    comment.content = "No more plugin data"
+    comment.save()
+    assert get_summary(api_client, plugin_section)["summary"] == {"b": 1}
+
+
+@pytest.mark.django_db
+def test_plugin_summary_comment_moved(api_client, plugin_section):
+    other_section = plugin_section.hearing.sections.exclude(pk=plugin_section.pk).first()
+    other_section.plugin_identifier = plugin_section.plugin_identifier
+    other_section.save()
+    comment = add_plugin_comment(plugin_section, "a")
+    add_plugin_comment(other_section, "b")
+    comment = SectionComment.objects.get(pk=comment.pk)
+    comment.section = other_section
+    comment.save()
+    assert get_summary(api_client, plugin_section)["summary"] == {}
+    assert get_summary(api_client, other_section)["summary"] == {"a": 1, "b": 1}
+
+
+@pytest.mark.django_db
+def test_plugin_summary_error_does_not_prevent_commenting(monkeypatch, api_client, plugin_section):
+    def fail(self, summary, data):
+        raise ValueError("Broken plugin")
+
+    monkeypatch.setattr(SummarizingTestPlugin, "add_to_summary", fail)
+    comment = add_plugin_comment(plugin_section, "a")
+    assert SectionComment.objects.filter(pk=comment.pk).exists()
+    monkeypatch.undo()
+    assert get_summary(api_client, plugin_section)["summary"] == {"a": 1}
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import pytest
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.test.utils import override_settings
+
+from democracy.plugins import Plugin, PluginRegistry, get_implementation
+from democracy.tests.plug import LimitedTestPlugin, StatelessTestPlugin, TestPlugin
+
+
+def test_stateless_plugin_instance_is_shared():
+    with override_settings(DEMOCRACY_PLUGINS={"test_plugin": "democracy.tests.plug.StatelessTestPlugin"}):
+        plugin = get_implementation("test_plugin")
+        assert isinstance(plugin, StatelessTestPlugin)
+        assert get_implementation("test_plugin") is plugin
+
+
+def test_stateful_plugin_is_instantiated_for_each_use():
+    with override_settings(DEMOCRACY_PLUGINS={"test_plugin": "democracy.tests.plug.TestPlugin"}):
+        plugin = get_implementation("test_plugin")
+        assert isinstance(plugin, TestPlugin)
+        assert get_implementation("test_plugin") is not plugin
+
+
+def test_unknown_plugin_identifier():
+    assert type(get_implementation("nonexistent")) is Plugin
+
+
+def test_plugin_settings_change_clears_registry():
+    with override_settings(DEMOCRACY_PLUGINS={"test_plugin": "democracy.tests.plug.TestPlugin"}):
+        assert isinstance(get_implementation("test_plugin"), TestPlugin)
+    assert type(get_implementation("test_plugin")) is Plugin
+
+
+@pytest.mark.parametrize("classpath", ("democracy.tests.plug.NoSuchPlugin", "democracy.models.Hearing"))
+def test_invalid_plugin_settings(classpath):
+    with override_settings(DEMOCRACY_PLUGINS={"test_plugin": classpath}):
+        with pytest.raises(ImproperlyConfigured):
+            PluginRegistry().load()
+
+
+def test_clean_client_data_batch():
+    plugin = LimitedTestPlugin()
+    results = plugin.clean_client_data_batch(["foo6", "foo", "foo6" * 3])
+    assert results[0] == "6oof"
+    assert isinstance(results[1], ValidationError)
+    assert results[2].code == "max_size"
+
+
+def test_clean_client_data_batch_time_limit():
+    plugin = TestPlugin()
+    plugin.clean_time_limit = 0
+    results = plugin.clean_client_data_batch(["foo6", "bar6"])
+    assert all(isinstance(result, ValidationError) and result.code == "timeout" for result in results)
@@ -0,0 +1,169 @@
+import json
+
+import pytest
+from django.test.utils import override_settings
+from rest_framework.serializers import Serializer
+
+from democracy.enums import InitialSectionType
+from democracy.middleware import logger
+from democracy.models import SectionImage
+from democracy.models.section import section_types
+from democracy.tests.utils import get_data_from_response
+from democracy.utils.request_stats import RequestStats, request_stats_collector
+
+request_stats_enabled = override_settings(DEMOCRACY_REQUEST_STATS=True)
+
+
+@pytest.fixture(autouse=True)
+def clear_request_stats():
+    request_stats_collector.clear()
+
+
+def load_section_types():
+    # the section types are loaded once per process, not per request, see `SectionTypeRegistry`
+    section_types.get_pk(InitialSectionType.MAIN)
+
+
+def get_budgeted_urls(hearing):
+    section = hearing.sections.first()
+    contact_person = hearing.contact_persons.first()
+    return [
+        ('v1:hearing-detail', '/v1/hearing/%s/' % hearing.pk),
+        ('v1:sections-list', '/v1/hearing/%s/sections/' % hearing.pk),
+        ('v1:section-list', '/v1/section/'),
+        ('v1:comments-list', '/v1/hearing/%s/sections/%s/comments/' % (hearing.pk, section.pk)),
+        ('v1:contact_person-list', '/v1/contact_person/'),
+        ('v1:contact_person-detail', '/v1/contact_person/%s/' % contact_person.pk),
+    ]
+
+
+@pytest.mark.django_db
+@request_stats_enabled
+def test_query_budgets(api_client, default_hearing):
+    load_section_types()
+    for view_name, url in get_budgeted_urls(default_hearing):
+        get_data_from_response(api_client.get(url))
+        view_stats = request_stats_collector.as_dict()[view_name]
+        assert view_stats['requests'] == 1
+        assert view_stats['over_budget'] == 0, '%s exceeds its query budget' % url
+
+
+def get_query_counts(api_client, hearing):
+    load_section_types()
+    request_stats_collector.clear()
+    for view_name, url in get_budgeted_urls(hearing):
+        get_data_from_response(api_client.get(url))
+    return {view_name: stats['queries']['sum'] for (view_name, stats) in request_stats_collector.as_dict().items()}
+
+
+@pytest.mark.django_db
+@request_stats_enabled
+def test_query_counts_with_comment_counter_shards(api_client, default_hearing):
+    query_counts = get_query_counts(api_client, default_hearing)
+    with override_settings(DEMOCRACY_COMMENT_COUNTER_SHARDS=4):
+        for section in default_hearing.sections.all():
+            section.comments.create(content='Sharded comment')
+        # the shards of all the hearings and sections of a response are prefetched with a single query
+        for view_name, n_queries in get_query_counts(api_client, default_hearing).items():
+            assert n_queries <= query_counts[view_name] + 1, '%s queries the shards more than once' % view_name
+
+
+@pytest.mark.django_db
+@request_stats_enabled
+def test_comment_serializer_time(api_client, default_hearing):
+    section = default_hearing.sections.first()
+    get_data_from_response(api_client.get('/v1/hearing/%s/sections/%s/comments/' % (default_hearing.pk, section.pk)))
+    assert request_stats_collector.as_dict()['v1:comments-list']['serializer_time'] > 0
+
+
+@pytest.mark.django_db
+@request_stats_enabled
+def test_request_stats_logged(api_client, default_hearing, monkeypatch):
+    logged = []
+    monkeypatch.setattr(logger, 'log', lambda level, message, **kwargs: logged.append(json.loads(message)))
+    get_data_from_response(api_client.get('/v1/hearing/%s/' % default_hearing.pk))
+
+    stats, = logged
+    assert stats['view'] == 'v1:hearing-detail'
+    assert stats['queries'] > 0
+    assert stats['sql_time'] > 0
+    assert 0 < stats['serializer_time'] < stats['duration']
+    assert stats['response_size'] > 0
+
+
+@override_settings(DEMOCRACY_REQUEST_STATS_DUPLICATE_THRESHOLD=3)
+def test_duplicate_queries():
+    stats = RequestStats()
+    for x in range(3):
+        stats.add_query('SELECT * FROM democracy_sectionimage WHERE section_id = %s', 0.001)
+        stats.add_query('SELECT * FROM democracy_section WHERE id = %s', 0.001)
+    stats.add_query('SELECT * FROM democracy_section WHERE id = %s', 0.001)
+    stats.add_query('SELECT * FROM democracy_hearing', 0.001)
+    assert stats.get_duplicate_queries() == [
+        ('SELECT * FROM democracy_section WHERE id = %s', 4),
+        ('SELECT * FROM democracy_sectionimage WHERE section_id = %s', 3),
+    ]
+
+
+@pytest.mark.django_db
+@request_stats_enabled
+def test_request_stats_endpoint(api_client, admin_api_client, default_hearing):
+    for x in range(3):
+        get_data_from_response(api_client.get('/v1/hearing/'))
+
+    assert api_client.get('/v1/request_stats/').status_code in (401, 403)
+    stats = get_data_from_response(admin_api_client.get('/v1/request_stats/'))
+    hearing_list_stats = stats['v1:hearing-list']
+    assert hearing_list_stats['requests'] == 3
+    assert sum(hearing_list_stats['duration']['buckets'].values()) == 3
+    assert hearing_list_stats['queries']['sum'] > 0
+
+    assert admin_api_client.delete('/v1/request_stats/').status_code == 204
+    assert 'v1:hearing-list' not in get_data_from_response(admin_api_client.get('/v1/request_stats/'))
+
+
+@pytest.mark.django_db
+def test_request_stats_disabled(api_client, default_hearing):
+    get_data_from_response(api_client.get('/v1/hearing/'))
+    assert request_stats_collector.as_dict() == {}
+
+
+def find_profile_node(node, *path):
+    for name in path:
+        node = next(child for child in node['fields'] if child['name'] == name)
+    return node
+
+
+@pytest.mark.django_db
+def test_serializer_profiling(admin_api_client, default_hearing):
+    url = '/v1/hearing/%s/' % default_hearing.pk
+    to_representation = Serializer.to_representation
+    data = get_data_from_response(admin_api_client.get(url, HTTP_X_PROFILE_SERIALIZERS='1'))
+    assert data['data'] == get_data_from_response(admin_api_client.get(url))
+    # only the serializers of the profiled request are measured
+    assert Serializer.to_representation is to_representation
+
+    profile = data['serializer_profile']
+    assert profile['name'] == 'HearingViewSet'
+    assert profile['queries'] > 0
+    sections = find_profile_node(profile, 'sections')
+    assert sections['field'] == 'SerializerMethodField'
+    assert sections['calls'] == 1
+    assert 0 < sections['queries'] <= profile['queries']
+    section_images = find_profile_node(sections, 'images')
+    assert section_images['calls'] == default_hearing.sections.count()
+    assert find_profile_node(section_images, 'url')['calls'] == SectionImage.objects.filter(
+        section__hearing=default_hearing
+    ).count()
+    assert section_images['time'] <= sections['time'] <= profile['time']
+
+
+@pytest.mark.django_db
+def test_serializer_profiling_staff_only(john_doe_api_client, admin_api_client, default_hearing):
+    url = '/v1/hearing/%s/' % default_hearing.pk
+    data = get_data_from_response(john_doe_api_client.get(url, HTTP_X_PROFILE_SERIALIZERS='1'))
+    assert 'serializer_profile' not in data
+
+    with override_settings(DEMOCRACY_SERIALIZER_PROFILING=True):
+        assert 'serializer_profile' not in get_data_from_response(john_doe_api_client.get(url))
+        assert 'serializer_profile' in get_data_from_response(admin_api_client.get(url))
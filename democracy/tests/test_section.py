@@ -1,12 +1,14 @@
 import datetime
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.encoding import force_text
 from django.utils.timezone import now
 
 from democracy.enums import InitialSectionType
 from democracy.models import Organization, Section, SectionType
-from democracy.models.section import CLOSURE_INFO_ORDERING
+from democracy.models.section import CLOSURE_INFO_ORDERING, section_types
 from democracy.tests.conftest import default_lang_code
 from democracy.tests.utils import assert_id_in_results, get_data_from_response, get_hearing_detail_url
 from democracy.views.section import SectionSerializer
@@ -263,6 +265,19 @@ def test_closure_info_ordering(closure_info_section):
     assert closure_info_section.ordering == CLOSURE_INFO_ORDERING
 
 
+@pytest.mark.django_db
+def test_new_section_ordering(default_hearing):
+    part_type = SectionType.objects.get(identifier=InitialSectionType.PART)
+    max_ordering = max(section.ordering for section in default_hearing.sections.all())
+    section_types.get(InitialSectionType.CLOSURE_INFO)
+
+    with CaptureQueriesContext(connection) as queries:
+        section = Section.objects.create(hearing=default_hearing, type=part_type)
+    assert section.ordering == max_ordering + 1
+    # one for the ordering and one for the insert, but none for the section type
+    assert len(queries) == 2
+
+
 @pytest.mark.django_db
 def test_closure_info_visibility(api_client, closure_info_section, get_sections_url):
     hearing = closure_info_section.hearing
@@ -340,6 +355,27 @@ def test_added_section_type_can_be_edited(new_section_type):
     assert new_section_type.name_singular == 'edited name'
 
 
+@pytest.mark.django_db
+def test_section_type_registry(new_section_type):
+    main = section_types.get(InitialSectionType.MAIN)
+    with CaptureQueriesContext(connection) as queries:
+        assert section_types.get(InitialSectionType.MAIN) is main
+        assert section_types.get_by_pk(main.pk) is main
+        assert section_types.get_pk(InitialSectionType.MAIN) == main.pk
+    assert not queries
+
+    # saving a section type reloads the registry
+    new_section_type.name_singular = 'edited name'
+    new_section_type.save()
+    assert section_types.get(new_section_type.identifier).name_singular == 'edited name'
+
+    # types created elsewhere are found as well
+    SectionType.objects.filter(pk=new_section_type.pk).update(identifier='updated-elsewhere')
+    assert section_types.get('updated-elsewhere').pk == new_section_type.pk
+    with pytest.raises(SectionType.DoesNotExist):
+        section_types.get('nonexistent')
+
+
 @pytest.mark.django_db
 def test_root_endpoint_filters(api_client, default_hearing, random_hearing):
     url = '/v1/section/'
@@ -408,3 +444,19 @@ def test_hearing_visibility(john_smith_api_client, default_hearing):
     response = john_smith_api_client.get('/v1/image/')
     response_data = get_results_from_response(response)
     assert len(response_data) > 1
+
+
+@pytest.mark.django_db
+def test_get_section_with_deleted_section_type(api_client, default_hearing, new_section_type):
+    section = default_hearing.sections.first()
+    section.type = new_section_type
+    section.save()
+    new_section_type.soft_delete()
+
+    data = get_data_from_response(api_client.get(get_hearing_detail_url(default_hearing.id)))
+    assert new_section_type.identifier in [section_data['type'] for section_data in data['sections']]
+    with CaptureQueriesContext(connection) as queries:
+        assert section_types.get_by_pk(new_section_type.pk).deleted
+    assert not queries
+    with pytest.raises(SectionType.DoesNotExist):
+        section_types.get(new_section_type.identifier)
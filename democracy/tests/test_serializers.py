@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 import pytest
+from rest_framework import serializers
 
 from democracy.views.section import SectionSerializer
+from democracy.views.utils import TranslatableSerializer
 from democracy.enums import InitialSectionType
-from democracy.models import SectionType
+from democracy.models import Section, SectionType
 
 
 @pytest.mark.django_db
@@ -12,3 +14,26 @@ def test_section_serializer(random_hearing):
     section.type = SectionType.objects.get(identifier=InitialSectionType.PART)
     data = SectionSerializer(instance=section).data
     assert data["type"] == InitialSectionType.PART
+
+
+def test_translated_fields_are_found_once_per_class():
+    fields = list(SectionSerializer.Meta.fields)
+    assert set(SectionSerializer.translated_fields) == {'title', 'abstract', 'content'}
+    SectionSerializer()
+    SectionSerializer()
+    assert SectionSerializer.Meta.fields == fields
+
+
+def test_translated_fields_with_all_fields():
+    class AllFieldsSerializer(TranslatableSerializer, serializers.ModelSerializer):
+        class Meta:
+            model = Section
+            fields = '__all__'
+
+    class ExcludeSerializer(TranslatableSerializer, serializers.ModelSerializer):
+        class Meta:
+            model = Section
+            exclude = ('abstract',)
+
+    assert set(AllFieldsSerializer.translated_fields) == {'title', 'abstract', 'content'}
+    assert set(ExcludeSerializer.translated_fields) == {'title', 'content'}
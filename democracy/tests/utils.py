@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import base64
 import json
+import math
 import os
 from io import BytesIO
 
@@ -114,6 +115,26 @@ def get_geojson():
     }
 
 
+def get_polygon_geojson(center=(24.94, 60.17), radius=0.01, n_vertices=360):
+    """
+    A roughly circular polygon feature with a lot of vertices.
+    """
+    ring = [
+        [center[0] + radius * math.cos(2 * math.pi * i / n_vertices),
+         center[1] + radius * math.sin(2 * math.pi * i / n_vertices)]
+        for i in range(n_vertices)
+    ]
+    ring.append(ring[0])
+    return {
+        "type": "Feature",
+        "properties": {"name": "Circle"},
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [ring]
+        }
+    }
+
+
 def assert_id_in_results(id, results, expected=True):
     included = id in [value['id'] for value in results]
     assert included is expected
@@ -2,8 +2,8 @@ from django.conf.urls import include, url
 from rest_framework_nested import routers
 
 from democracy.views import (
-    CommentViewSet, ContactPersonViewSet, HearingViewSet, ImageViewSet, LabelViewSet, RootSectionViewSet,
-    SectionCommentViewSet, SectionViewSet, UserDataViewSet
+    CommentViewSet, ContactPersonViewSet, HearingViewSet, ImageUploadViewSet, ImageViewSet, LabelViewSet,
+    RequestStatsView, RootSectionViewSet, SectionCommentViewSet, SectionViewSet, UserDataViewSet
 )
 
 router = routers.DefaultRouter()
@@ -11,6 +11,7 @@ router.register(r'hearing', HearingViewSet, base_name='hearing')
 router.register(r'users', UserDataViewSet, base_name='users')
 router.register(r'comment', CommentViewSet, base_name='comment')
 router.register(r'image', ImageViewSet, base_name='image')
+router.register(r'image_upload', ImageUploadViewSet, base_name='image_upload')
 router.register(r'section', RootSectionViewSet, base_name='section')
 router.register(r'label', LabelViewSet, base_name='label')
 router.register(r'contact_person', ContactPersonViewSet, base_name='contact_person')
@@ -28,4 +29,7 @@ urlpatterns = [
     url(r'^', include(hearing_comments_router.urls, namespace='v1')),
     url(r'^', include(hearing_child_router.urls, namespace='v1')),
     url(r'^', include(section_comments_router.urls, namespace='v1')),
+    url(r'^', include([
+        url(r'^request_stats/$', RequestStatsView.as_view(), name='request-stats'),
+    ], namespace='v1')),
 ]
@@ -0,0 +1,156 @@
+"""
+Timing of the v1 API endpoints, see the `democracy_benchmark` management command.
+"""
+import re
+import statistics
+import time
+import tracemalloc
+
+from django.core.urlresolvers import RegexURLResolver, reverse
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from democracy import urls_v1
+from democracy.models import ContactPerson, Hearing, Label
+
+
+def _iterate_patterns(urlpatterns):
+    for pattern in urlpatterns:
+        if isinstance(pattern, RegexURLResolver):
+            yield from _iterate_patterns(pattern.url_patterns)
+        else:
+            yield pattern
+
+
+def get_endpoints():
+    """
+    List the endpoints of the v1 API that respond to GET requests. Format suffix variants are left out.
+
+    :return: (URL name, URL pattern) pairs
+    :rtype: list[tuple[str, RegexURLPattern]]
+    """
+    endpoints = {}
+    for pattern in _iterate_patterns(urls_v1.urlpatterns):
+        actions = getattr(pattern.callback, 'actions', None)
+        if not pattern.name or 'format' in pattern.regex.groupindex or (actions is not None and 'get' not in actions):
+            continue
+        endpoints.setdefault(pattern.name, pattern)
+    return sorted(endpoints.items())
+
+
+def reverse_endpoint(pattern, kwargs):
+    """
+    Reverse the URL of an endpoint. The nested routers all share the `v1` namespace, so `reverse()`
+    can't find their URLs by name.
+    """
+    return RegexURLResolver(r'^', [pattern])._reverse_with_prefix(pattern.name, reverse('v1:api-root'), **kwargs)
+
+
+def get_sample_objects(user=None):
+    """
+    Pick the objects to request the detail endpoints for: the hearing with the most comments, its most
+    commented section and so on.
+
+    :return: dict of URL basename to object
+    """
+    hearing = Hearing.objects.public().order_by('-n_comments').first()
+    section = hearing.sections.order_by('-n_comments').first() if hearing else None
+    comment = section.comments.first() if section else None
+    image = section.images.first() if section else None
+    return {
+        'hearing': hearing,
+        'section': section,
+        'sections': section,
+        'comment': comment,
+        'comments': comment,
+        'image': image,
+        'label': Label.objects.first(),
+        'contact_person': ContactPerson.objects.first(),
+        'users': user,
+    }
+
+
+def get_url_kwargs(name, kwarg_names, samples):
+    """
+    :return: the URL keyword arguments, or None if there is no object to request the URL for
+    """
+    basename = name.rsplit('-', 1)[0]
+    kwargs = {}
+    for kwarg_name in kwarg_names:
+        sample = {'hearing_pk': samples['hearing'], 'comment_parent_pk': samples['sections']}.get(
+            kwarg_name, samples.get(basename)
+        )
+        if sample is None:
+            return None
+        kwargs[kwarg_name] = getattr(sample, 'uuid' if kwarg_name == 'uuid' else 'pk')
+    return kwargs
+
+
+def _get_response_size(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def time_url(client, url, repeat):
+    """
+    Request the given URL `repeat` times, plus once more to warm up and to trace the memory use.
+
+    :rtype: dict
+    """
+    # `CaptureQueriesContext` can't be used, as the query log is reset when each request starts
+    force_debug_cursor = connection.force_debug_cursor
+    connection.force_debug_cursor = True
+    tracemalloc.start()
+    try:
+        response = client.get(url)
+        response_size = _get_response_size(response)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        n_queries = len(connection.queries)
+    finally:
+        tracemalloc.stop()
+        connection.force_debug_cursor = force_debug_cursor
+    times = []
+    for x in range(repeat):
+        start = time.perf_counter()
+        _get_response_size(client.get(url))
+        times.append(time.perf_counter() - start)
+    return {
+        'url': url,
+        'status': response.status_code,
+        'queries': n_queries,
+        'response_bytes': response_size,
+        'peak_memory_bytes': peak_memory,
+        'time_min': min(times) if times else None,
+        'time_median': statistics.median(times) if times else None,
+        'time_max': max(times) if times else None,
+    }
+
+
+def run_benchmark(repeat=3, user=None, name_pattern=None):
+    """
+    Time all the GET endpoints of the v1 API with the DRF test client.
+
+    :param repeat: Number of timed requests per endpoint
+    :param user: User to make the requests as, or None for anonymous requests
+    :param name_pattern: Regular expression the URL names of the endpoints to time must match
+    :return: A result dict for each endpoint
+    :rtype: list[dict]
+    """
+    client = APIClient()
+    if user:
+        client.force_authenticate(user)
+    samples = get_sample_objects(user)
+    results = []
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        for name, pattern in get_endpoints():
+            if name_pattern and not re.search(name_pattern, name):
+                continue
+            kwargs = get_url_kwargs(name, sorted(pattern.regex.groupindex), samples)
+            if kwargs is None:
+                results.append({'name': name, 'skipped': 'no object to request'})
+                continue
+            result = time_url(client, reverse_endpoint(pattern, kwargs), repeat)
+            results.append(dict(result, name=name))
+    return results
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+import json
+import math
+
+from django.contrib.gis.gdal import HAS_GDAL
+from django.contrib.gis.gdal.error import GDALException
+from django.contrib.gis.geos import GEOSException, GEOSGeometry
+from django.core.exceptions import ImproperlyConfigured
+
+# Geometry types whose vertex count can be reduced by simplification
+SIMPLIFIABLE_GEOMETRY_TYPES = ("LineString", "MultiLineString", "Polygon", "MultiPolygon")
+
+# Geometry types with a `coordinates` member
+GEOMETRY_TYPES = ("Point", "MultiPoint", "LineString", "MultiLineString", "Polygon", "MultiPolygon")
+
+
+class GeoJSONValidationError(ValueError):
+    pass
+
+
+class ValidatedGeoJSON(dict):
+    """
+    A GeoJSON object that has passed `validate_geojson`, carrying the bounding box computed while validating.
+    """
+
+    def __init__(self, *args, bbox=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bbox = bbox
+
+
+def get_geometries(geojson):
+    """
+    Iterate over the geometry objects contained in a GeoJSON object.
+
+    Features, FeatureCollections and GeometryCollections are unwrapped, so only
+    plain geometries (Point, Polygon, ...) are yielded.
+
+    :param geojson: GeoJSON object
+    :type geojson: dict|None
+    :rtype: Iterable[dict]
+    """
+    if not isinstance(geojson, dict):
+        return
+    geojson_type = geojson.get("type")
+    if geojson_type == "FeatureCollection":
+        for feature in geojson.get("features") or ():
+            yield from get_geometries(feature)
+    elif geojson_type == "Feature":
+        yield from get_geometries(geojson.get("geometry"))
+    elif geojson_type == "GeometryCollection":
+        for geometry in geojson.get("geometries") or ():
+            yield from get_geometries(geometry)
+    elif "coordinates" in geojson:
+        yield geojson
+
+
+def _iter_positions(coordinates):
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        yield coordinates
+        return
+    for item in coordinates or ():
+        yield from _iter_positions(item)
+
+
+def get_bbox(geojson):
+    """
+    Get the bounding box of all coordinates in a GeoJSON object.
+
+    :param geojson: GeoJSON object
+    :type geojson: dict|None
+    :return: (minx, miny, maxx, maxy), or None if the object has no coordinates
+    :rtype: tuple[float]|None
+    """
+    minx = miny = float("inf")
+    maxx = maxy = float("-inf")
+    for geometry in get_geometries(geojson):
+        for position in _iter_positions(geometry["coordinates"]):
+            x, y = position[0], position[1]
+            minx, maxx = min(minx, x), max(maxx, x)
+            miny, maxy = min(miny, y), max(maxy, y)
+    if minx == float("inf"):
+        return None
+    return (minx, miny, maxx, maxy)
+
+
+class _GeometryValidator(object):
+
+    def __init__(self, max_vertices, bounds, geos_vertex_threshold):
+        self.max_vertices = max_vertices
+        self.bounds = bounds
+        self.geos_vertex_threshold = geos_vertex_threshold
+        self.n_vertices = 0
+        self.bbox = [float("inf"), float("inf"), float("-inf"), float("-inf")]
+
+    def validate(self, geometry):
+        if not isinstance(geometry, dict):
+            raise GeoJSONValidationError("geometry must be an object")
+        geometry_type = geometry.get("type")
+        if geometry_type == "GeometryCollection":
+            geometries = geometry.get("geometries")
+            if not isinstance(geometries, list):
+                raise GeoJSONValidationError("GeometryCollection must have a list of geometries")
+            for member in geometries:
+                self.validate(member)
+        elif geometry_type in ("Polygon", "MultiPolygon"):
+            self._validate_polygonal(geometry)
+        elif geometry_type in GEOMETRY_TYPES:
+            self._validate_non_polygonal(geometry_type, geometry.get("coordinates"))
+        else:
+            raise GeoJSONValidationError("unknown geometry type %r" % geometry_type)
+
+    def _validate_non_polygonal(self, geometry_type, coordinates):
+        if geometry_type == "Point":
+            self._validate_position(coordinates)
+        elif geometry_type == "MultiLineString":
+            for line in self._as_list(coordinates):
+                self._validate_positions(line, min_length=2)
+        else:
+            self._validate_positions(coordinates, min_length=(2 if geometry_type == "LineString" else 0))
+
+    def _validate_polygonal(self, geometry):
+        n_vertices_before = self.n_vertices
+        coordinates = geometry.get("coordinates")
+        polygons = [coordinates] if geometry["type"] == "Polygon" else self._as_list(coordinates)
+        for polygon in polygons:
+            self._validate_polygon(polygon)
+        is_complex = (
+            len(polygons) > 1 or any(len(rings) > 1 for rings in polygons) or
+            self.n_vertices - n_vertices_before > self.geos_vertex_threshold
+        )
+        if is_complex:
+            self._validate_with_geos(geometry)
+
+    def _as_list(self, value):
+        if not isinstance(value, (list, tuple)):
+            raise GeoJSONValidationError("coordinates must be nested lists")
+        return value
+
+    def _validate_position(self, position):
+        if not isinstance(position, (list, tuple)) or len(position) not in (2, 3):
+            raise GeoJSONValidationError("a position must have two or three coordinates")
+        for coordinate in position:
+            if isinstance(coordinate, bool) or not isinstance(coordinate, (int, float)) or \
+                    not math.isfinite(coordinate):
+                raise GeoJSONValidationError("coordinates must be finite numbers")
+        x, y = position[0], position[1]
+        if self.bounds and not (self.bounds[0] <= x <= self.bounds[2] and self.bounds[1] <= y <= self.bounds[3]):
+            raise GeoJSONValidationError("position %r is out of bounds" % (position,))
+        self.n_vertices += 1
+        if self.max_vertices is not None and self.n_vertices > self.max_vertices:
+            raise GeoJSONValidationError("geometry has more than %d vertices" % self.max_vertices)
+        bbox = self.bbox
+        bbox[0], bbox[2] = min(bbox[0], x), max(bbox[2], x)
+        bbox[1], bbox[3] = min(bbox[1], y), max(bbox[3], y)
+
+    def _validate_positions(self, positions, min_length):
+        if len(self._as_list(positions)) < min_length:
+            raise GeoJSONValidationError("expected at least %d positions" % min_length)
+        for position in positions:
+            self._validate_position(position)
+
+    def _validate_polygon(self, rings):
+        if not self._as_list(rings):
+            raise GeoJSONValidationError("a polygon must have at least one ring")
+        for ring in rings:
+            self._validate_positions(ring, min_length=4)
+            if list(ring[0]) != list(ring[-1]):
+                raise GeoJSONValidationError("polygon rings must be closed")
+
+    def _validate_with_geos(self, geometry):
+        if not HAS_GDAL:
+            # GEOS geometries are created from GeoJSON with GDAL
+            raise ImproperlyConfigured("GDAL is required for validating polygons with GEOS")
+        try:
+            valid = GEOSGeometry(json.dumps(geometry)).valid
+        except (GDALException, GEOSException):
+            valid = False
+        if not valid:
+            raise GeoJSONValidationError("polygon is not valid")
+
+
+def validate_geometry(geometry, max_vertices=None, bounds=None, geos_vertex_threshold=0):
+    """
+    Validate a GeoJSON geometry object and compute its bounding box in the same pass.
+
+    The structure, coordinates and vertex count are checked in pure Python. Polygons with
+    more than `geos_vertex_threshold` vertices, or more than one ring, are additionally checked
+    for validity (e.g. self-intersection) with GEOS.
+
+    :param geometry: GeoJSON geometry object
+    :param max_vertices: Maximum total number of vertices, or None for no limit
+    :type max_vertices: int|None
+    :param bounds: (minx, miny, maxx, maxy) all positions must lie within, or None for no limit
+    :type bounds: tuple[float]|None
+    :param geos_vertex_threshold: Vertex count above which polygons are checked with GEOS
+    :type geos_vertex_threshold: int
+    :raises GeoJSONValidationError: if the geometry is not valid
+    :return: (minx, miny, maxx, maxy), or None if the geometry has no positions
+    :rtype: tuple[float]|None
+    """
+    validator = _GeometryValidator(max_vertices, bounds, geos_vertex_threshold)
+    validator.validate(geometry)
+    if not validator.n_vertices:
+        return None
+    return tuple(validator.bbox)
+
+
+def bbox_intersects(bbox1, bbox2):
+    return not (
+        bbox1[2] < bbox2[0] or bbox1[0] > bbox2[2] or
+        bbox1[3] < bbox2[1] or bbox1[1] > bbox2[3]
+    )
+
+
+def parse_bbox(value):
+    """
+    Parse a `minx,miny,maxx,maxy` bounding box string.
+
+    :raises ValueError: if the value is not a valid bounding box
+    :rtype: tuple[float]
+    """
+    try:
+        bbox = tuple(float(part) for part in value.split(","))
+    except (AttributeError, TypeError):
+        raise ValueError("bbox must be a string of four comma-separated numbers")
+    if len(bbox) != 4 or not all(math.isfinite(coord) for coord in bbox):
+        raise ValueError("bbox must be a string of four comma-separated numbers")
+    if bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise ValueError("bbox must be given as minx,miny,maxx,maxy")
+    return bbox
+
+
+def zoom_to_tolerance(zoom):
+    """
+    Get the simplification tolerance (in degrees) matching roughly one pixel at a web map zoom level.
+    """
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def simplify_geometry(geometry, tolerance):
+    if geometry.get("type") not in SIMPLIFIABLE_GEOMETRY_TYPES:
+        return geometry
+    simplified = GEOSGeometry(json.dumps(geometry)).simplify(tolerance, preserve_topology=True)
+    return json.loads(simplified.json)
+
+
+def simplify_geojson(geojson, tolerance):
+    """
+    Return a copy of the GeoJSON object with its geometries simplified to the given tolerance.
+
+    Properties and other members of Features are kept as-is.
+
+    :param geojson: GeoJSON object
+    :type geojson: dict
+    :param tolerance: Simplification tolerance in coordinate units
+    :type tolerance: float
+    :rtype: dict
+    """
+    geojson_type = geojson.get("type")
+    if geojson_type == "FeatureCollection":
+        return dict(geojson, features=[simplify_geojson(feature, tolerance) for feature in geojson["features"]])
+    elif geojson_type == "Feature":
+        if not geojson.get("geometry"):
+            return geojson
+        return dict(geojson, geometry=simplify_geojson(geojson["geometry"], tolerance))
+    elif geojson_type == "GeometryCollection":
+        return dict(geojson, geometries=[simplify_geojson(geometry, tolerance) for geometry in geojson["geometries"]])
+    return simplify_geometry(geojson, tolerance)
+
+
+def get_simplified_variants(geojson, tolerances):
+    """
+    Get simplified versions of a GeoJSON object for each of the given tolerances.
+
+    Variants that would not be any smaller than the original are left out.
+
+    :param geojson: GeoJSON object
+    :type geojson: dict|None
+    :param tolerances: Simplification tolerances in coordinate units
+    :type tolerances: Iterable[float]
+    :return: dict of tolerance (as a string) to simplified GeoJSON object
+    :rtype: dict[str, dict]
+    """
+    if not any(geometry.get("type") in SIMPLIFIABLE_GEOMETRY_TYPES for geometry in get_geometries(geojson)):
+        return {}
+    variants = {}
+    original_size = len(json.dumps(geojson))
+    for tolerance in sorted(tolerances):
+        simplified = simplify_geojson(geojson, tolerance)
+        if len(json.dumps(simplified)) < original_size:
+            variants[str(tolerance)] = simplified
+    return variants
+
+
+def get_simplified_variant(geojson, variants, tolerance):
+    """
+    Pick the coarsest precomputed variant that is still within the given tolerance.
+
+    Falls back to the original GeoJSON object if there is no such variant.
+
+    :param geojson: The original GeoJSON object
+    :param variants: Variants as returned by `get_simplified_variants`
+    :type variants: dict[str, dict]|None
+    :param tolerance: The largest acceptable simplification tolerance, or None for no simplification
+    :type tolerance: float|None
+    """
+    if tolerance is None or not variants:
+        return geojson
+    acceptable = [key for key in variants if float(key) <= tolerance]
+    if not acceptable:
+        return geojson
+    return variants[max(acceptable, key=float)]
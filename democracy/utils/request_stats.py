@@ -0,0 +1,244 @@
+"""
+Per-request SQL, serializer and response size statistics, see `democracy.middleware.RequestStatsMiddleware`.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.utils import CursorWrapper
+
+# Upper bounds of the histogram buckets; the last bucket has no upper bound
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)  # seconds
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class RequestStats(object):
+    """
+    Statistics of a single request.
+    """
+
+    def __init__(self):
+        self.view_name = None
+        self.query_budget = None
+        self.started_at = time.perf_counter()
+        self.duration = None
+        self.queries = []  # (SQL, seconds) pairs
+        self.serializer_time = 0.0
+        self.response_size = None
+
+    def add_query(self, sql, duration):
+        self.queries.append((sql, duration))
+
+    def time_serializer(self, to_representation):
+        """
+        Wrap a serializer's `to_representation` to count the time spent in it as serializer time.
+        """
+        @wraps(to_representation)
+        def timed_to_representation(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return to_representation(*args, **kwargs)
+            finally:
+                self.serializer_time += time.perf_counter() - start
+        return timed_to_representation
+
+    def finish(self, response_size=None):
+        self.duration = time.perf_counter() - self.started_at
+        self.response_size = response_size
+
+    @property
+    def n_queries(self):
+        return len(self.queries)
+
+    @property
+    def sql_time(self):
+        return sum(duration for (sql, duration) in self.queries)
+
+    @property
+    def over_budget(self):
+        return self.query_budget is not None and self.n_queries > self.query_budget
+
+    def get_duplicate_queries(self):
+        """
+        Get the SQL statements that were run at least `DEMOCRACY_REQUEST_STATS_DUPLICATE_THRESHOLD` times
+        (with any parameters), which usually means that related objects are fetched one at a time.
+
+        :return: (SQL, count) pairs, most common first
+        :rtype: list[tuple[str, int]]
+        """
+        threshold = getattr(settings, 'DEMOCRACY_REQUEST_STATS_DUPLICATE_THRESHOLD', 5)
+        counts = Counter(sql for (sql, duration) in self.queries)
+        return [(sql, count) for (sql, count) in counts.most_common() if count >= threshold]
+
+    def as_dict(self):
+        return {
+            'view': self.view_name,
+            'duration': self.duration,
+            'queries': self.n_queries,
+            'query_budget': self.query_budget,
+            'over_budget': self.over_budget,
+            'sql_time': self.sql_time,
+            'serializer_time': self.serializer_time,
+            'response_size': self.response_size,
+            'duplicate_queries': [
+                {'sql': sql, 'count': count} for (sql, count) in self.get_duplicate_queries()
+            ],
+        }
+
+
+class QueryRecordingCursorWrapper(CursorWrapper):
+
+    def __init__(self, cursor, db, stats):
+        super().__init__(cursor, db)
+        self.stats = stats
+
+    def execute(self, sql, params=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self.stats.add_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, param_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, param_list)
+        finally:
+            self.stats.add_query(sql, time.perf_counter() - start)
+
+
+def start_recording_queries(stats):
+    """
+    Record the queries of this thread's database connections in the given stats (or any object with an
+    `add_query(sql, duration)` method) until `stop_recording_queries()` is called.
+
+    Django 1.9 has no hook for wrapping query execution, so the cursor factories of the
+    (thread-local) connections are replaced. Recordings may be nested.
+
+    :return: The replaced cursor factories, to pass to `stop_recording_queries()`
+    """
+    replaced = []
+    for connection in connections.all():
+        for method_name in ('make_cursor', 'make_debug_cursor'):
+            replaced.append((connection, method_name, connection.__dict__.get(method_name)))
+            make_cursor = getattr(connection, method_name)
+
+            def make_recording_cursor(cursor, make_cursor=make_cursor, connection=connection):
+                return QueryRecordingCursorWrapper(make_cursor(cursor), connection, stats)
+            setattr(connection, method_name, make_recording_cursor)
+    return replaced
+
+
+def stop_recording_queries(replaced):
+    for (connection, method_name, make_cursor) in reversed(replaced):
+        if make_cursor is None:
+            connection.__dict__.pop(method_name, None)
+        else:
+            setattr(connection, method_name, make_cursor)
+
+
+@contextmanager
+def record_queries(stats):
+    replaced = start_recording_queries(stats)
+    try:
+        yield stats
+    finally:
+        stop_recording_queries(replaced)
+
+
+class Histogram(object):
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+
+    def add(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def as_dict(self):
+        labels = ['<=%s' % bound for bound in self.buckets] + ['>%s' % self.buckets[-1]]
+        return {
+            'buckets': dict(zip(labels, self.counts)),
+            'count': sum(self.counts),
+            'sum': self.total,
+        }
+
+
+class ViewStats(object):
+    """
+    Aggregated statistics of the requests to a view.
+    """
+
+    def __init__(self):
+        self.durations = Histogram(DURATION_BUCKETS)
+        self.query_counts = Histogram(QUERY_COUNT_BUCKETS)
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.response_size = 0
+        self.n_over_budget = 0
+        self.n_with_duplicate_queries = 0
+
+    def add(self, stats):
+        self.durations.add(stats.duration)
+        self.query_counts.add(stats.n_queries)
+        self.sql_time += stats.sql_time
+        self.serializer_time += stats.serializer_time
+        self.response_size += stats.response_size or 0
+        self.n_over_budget += stats.over_budget
+        self.n_with_duplicate_queries += bool(stats.get_duplicate_queries())
+
+    def as_dict(self):
+        return {
+            'requests': self.durations.as_dict()['count'],
+            'duration': self.durations.as_dict(),
+            'queries': self.query_counts.as_dict(),
+            'sql_time': self.sql_time,
+            'serializer_time': self.serializer_time,
+            'response_size': self.response_size,
+            'over_budget': self.n_over_budget,
+            'with_duplicate_queries': self.n_with_duplicate_queries,
+        }
+
+
+class RequestStatsCollector(object):
+    """
+    Statistics of the requests handled by this process, by view.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def add(self, stats):
+        with self._lock:
+            self._views.setdefault(stats.view_name, ViewStats()).add(stats)
+
+    def as_dict(self):
+        with self._lock:
+            return {view_name: view_stats.as_dict() for (view_name, view_stats) in self._views.items()}
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+
+request_stats_collector = RequestStatsCollector()
+
+
+def get_query_budget(view_func, method):
+    """
+    Get the query budget a viewset declares for the action handling the given method,
+    in its `query_budgets` dict of action name to the maximum number of queries.
+
+    :rtype: int|None
+    """
+    actions = getattr(view_func, 'actions', None) or {}
+    query_budgets = getattr(getattr(view_func, 'cls', None), 'query_budgets', None) or {}
+    return query_budgets.get(actions.get(method.lower()))
@@ -0,0 +1,145 @@
+"""
+Attribution of serialization time and SQL queries to serializer fields, for finding expensive fields.
+
+While a `SerializerProfiler` is active in a thread, the fields of the serializers given to
+`SerializerProfiler.profile_fields()` are measured, as well as the fields of the serializers using
+`ProfiledSerializerMixin`, e.g. ones that other fields create on the fly. The measurements are
+aggregated into a tree by field name: e.g. the `images` field of each section of a hearing is a single
+`sections` → `images` node, whose count is the number of sections.
+
+The `to_representation` of each profiled field is wrapped on the field instance only, so the serializers
+of requests that are not profiled are not affected.
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from rest_framework import serializers
+
+from democracy.utils.request_stats import start_recording_queries, stop_recording_queries
+
+_local = threading.local()
+
+
+class ProfileNode(object):
+
+    def __init__(self, name, field_class=None):
+        self.name = name
+        self.field_class = field_class
+        self.calls = 0
+        self.time = 0.0
+        self.n_queries = 0
+        self.children = OrderedDict()
+
+    def get_child(self, name, field_class):
+        child = self.children.get(name)
+        if child is None:
+            child = self.children[name] = ProfileNode(name, field_class)
+        return child
+
+    def as_dict(self):
+        """
+        :return: The node with its children, most expensive first
+        """
+        return {
+            'name': self.name,
+            'field': self.field_class,
+            'calls': self.calls,
+            'time': self.time,
+            'queries': self.n_queries,
+            'fields': [
+                child.as_dict() for child in sorted(self.children.values(), key=lambda child: -child.time)
+            ],
+        }
+
+
+class SerializerProfiler(object):
+
+    def __init__(self, name):
+        self.root = ProfileNode(name)
+        self._stack = [self.root]
+        self.n_queries = 0
+
+    def add_query(self, sql, duration):
+        self.n_queries += 1
+
+    @contextmanager
+    def measure(self, name, field_class=None):
+        """
+        Measure the time and queries of the block, in the node of the given name under the current node.
+        """
+        node = self._stack[-1].get_child(name, field_class)
+        self._stack.append(node)
+        start = time.perf_counter()
+        n_queries = self.n_queries
+        try:
+            yield node
+        finally:
+            node.calls += 1
+            node.time += time.perf_counter() - start
+            node.n_queries += self.n_queries - n_queries
+            self._stack.pop()
+
+    def profile_fields(self, serializer):
+        """
+        Measure the fields of the serializer, or of the child of a list serializer, when they are serialized.
+        """
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        if getattr(serializer, '_profiler', None) is self:
+            return
+        serializer._profiler = self
+        for field in serializer.fields.values():
+            field.to_representation = self._measure_field(field, field.to_representation)
+
+    def _measure_field(self, field, to_representation):
+        def measured_to_representation(value):
+            with self.measure(field.field_name, type(field).__name__):
+                return to_representation(value)
+        return measured_to_representation
+
+    def start(self):
+        """
+        Start profiling the serializers run by this thread, until `stop()` is called.
+        """
+        _local.profiler = self
+        self._started_at = time.perf_counter()
+        self._replaced_cursors = start_recording_queries(self)
+
+    def stop(self):
+        stop_recording_queries(self._replaced_cursors)
+        _local.profiler = None
+        self.root.calls = 1
+        self.root.time = time.perf_counter() - self._started_at
+        self.root.n_queries = self.n_queries
+
+    @contextmanager
+    def activate(self):
+        self.start()
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    def as_dict(self):
+        return self.root.as_dict()
+
+
+def get_active_profiler():
+    """
+    :rtype: SerializerProfiler|None
+    """
+    return getattr(_local, 'profiler', None)
+
+
+class ProfiledSerializerMixin(object):
+    """
+    Serializer mixin for measuring the fields of the serializer while a `SerializerProfiler` is active.
+    """
+
+    def to_representation(self, instance):
+        profiler = get_active_profiler()
+        if profiler is not None:
+            profiler.profile_fields(self)
+        return super().to_representation(instance)
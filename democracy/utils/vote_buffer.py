@@ -0,0 +1,208 @@
+"""
+Write-behind buffering of anonymous comment votes.
+
+With `DEMOCRACY_VOTE_BUFFER` set, anonymous votes are acknowledged as soon as they have been
+added to a buffer, and written to the database in batches with one UPDATE per comment:
+
+* `'memory'` keeps the votes in process memory. Votes not flushed yet are lost if the process dies.
+* Any other value is the path of a SQLite journal file, which keeps the votes across restarts and
+  is shared by all processes on the host.
+
+The buffer is flushed once it holds `DEMOCRACY_VOTE_BUFFER_FLUSH_SIZE` votes, and by a timer thread
+`DEMOCRACY_VOTE_BUFFER_FLUSH_INTERVAL` seconds after the first vote added to it since the last flush.
+A memory buffer is also flushed when the process exits. The `democracy_flush_votes` management command
+flushes a journal whose votes were added by processes that are no longer running.
+"""
+import atexit
+import logging
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import closing, contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+def apply_votes(votes):
+    """
+    Add the given numbers of unregistered votes to comments, with one UPDATE per comment.
+
+    :param votes: dict of (model label, comment pk) to the number of votes
+    :type votes: dict[tuple[str, str], int]
+    """
+    with transaction.atomic():
+        for (model_label, pk), n_votes in sorted(votes.items()):
+            apps.get_model(model_label)._base_manager.filter(pk=pk).update(
+                n_unregistered_votes=F('n_unregistered_votes') + n_votes,
+                n_votes=F('n_votes') + n_votes,
+            )
+
+
+class BaseVoteBuffer(object):
+
+    def __init__(self, flush_size, flush_interval):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._flush_lock = threading.Lock()
+        # guards the number of votes added by this process since its last flush and the flush timer
+        self._state_lock = threading.Lock()
+        self._n_added = 0
+        self._flush_timer = None
+
+    def add(self, comment):
+        """
+        Add an unregistered vote for the given comment, flushing the buffer if it is full.
+
+        :type comment: democracy.models.comment.BaseComment
+        """
+        self._add(comment._meta.label, str(comment.pk))
+        with self._state_lock:
+            self._n_added += 1
+            is_full = self._n_added >= self.flush_size
+            if not is_full and self._flush_timer is None:
+                self._start_flush_timer()
+        if is_full:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all the buffered votes to the database.
+
+        :return: The number of votes written
+        :rtype: int
+        """
+        with self._flush_lock:
+            with self._state_lock:
+                self._n_added = 0
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+            with self._take_votes() as votes:
+                if votes:
+                    apply_votes(votes)
+                return sum(votes.values())
+
+    def _start_flush_timer(self):
+        self._flush_timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not write the buffered votes, retrying in %s seconds', self.flush_interval)
+            with self._state_lock:
+                if self._flush_timer is None:
+                    self._start_flush_timer()
+        finally:
+            # the timer thread has a database connection of its own
+            connection.close()
+
+    def _add(self, model_label, pk):  # pragma: no cover
+        raise NotImplementedError("Subclasses must implement _add")
+
+    @contextmanager
+    def _take_votes(self):  # pragma: no cover
+        """
+        Get the buffered votes, which are removed from the buffer unless an exception is raised.
+        """
+        raise NotImplementedError("Subclasses must implement _take_votes")
+
+
+class MemoryVoteBuffer(BaseVoteBuffer):
+
+    def __init__(self, flush_size, flush_interval):
+        super().__init__(flush_size, flush_interval)
+        self._lock = threading.Lock()
+        self._votes = Counter()
+        atexit.register(self.flush)
+
+    def _add(self, model_label, pk):
+        with self._lock:
+            self._votes[(model_label, pk)] += 1
+
+    @contextmanager
+    def _take_votes(self):
+        with self._lock:
+            votes, self._votes = self._votes, Counter()
+        try:
+            yield votes
+        except Exception:
+            with self._lock:
+                self._votes.update(votes)
+            raise
+
+
+class SQLiteVoteBuffer(BaseVoteBuffer):
+
+    def __init__(self, path, flush_size, flush_interval):
+        super().__init__(flush_size, flush_interval)
+        self.path = path
+        with closing(self._connect()) as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS votes '
+                '(id INTEGER PRIMARY KEY AUTOINCREMENT, model_label TEXT NOT NULL, pk TEXT NOT NULL)'
+            )
+
+    def _connect(self):
+        # autocommit mode, transactions are started explicitly
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _add(self, model_label, pk):
+        with closing(self._connect()) as connection:
+            connection.execute('INSERT INTO votes (model_label, pk) VALUES (?, ?)', (model_label, pk))
+
+    @contextmanager
+    def _take_votes(self):
+        with closing(self._connect()) as connection:
+            # the write lock keeps other processes from adding or flushing votes until these are written
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                rows = connection.execute('SELECT model_label, pk, COUNT(*) FROM votes GROUP BY model_label, pk')
+                yield {(model_label, pk): n_votes for (model_label, pk, n_votes) in rows.fetchall()}
+                connection.execute('DELETE FROM votes')
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+
+
+_vote_buffer = None
+_vote_buffer_lock = threading.Lock()
+
+
+def get_vote_buffer():
+    """
+    Get the vote buffer configured with `DEMOCRACY_VOTE_BUFFER`, or None if votes are not buffered.
+
+    :rtype: BaseVoteBuffer|None
+    """
+    global _vote_buffer
+    backend = getattr(settings, 'DEMOCRACY_VOTE_BUFFER', None)
+    if not backend:
+        return None
+    with _vote_buffer_lock:
+        if _vote_buffer is None:
+            flush_size = getattr(settings, 'DEMOCRACY_VOTE_BUFFER_FLUSH_SIZE', 100)
+            flush_interval = getattr(settings, 'DEMOCRACY_VOTE_BUFFER_FLUSH_INTERVAL', 10)
+            if backend == 'memory':
+                _vote_buffer = MemoryVoteBuffer(flush_size, flush_interval)
+            else:
+                _vote_buffer = SQLiteVoteBuffer(backend, flush_size, flush_interval)
+        return _vote_buffer
+
+
+def reset_vote_buffer(setting, **kwargs):
+    global _vote_buffer
+    if setting.startswith('DEMOCRACY_VOTE_BUFFER'):
+        _vote_buffer = None
+
+
+setting_changed.connect(reset_vote_buffer)
@@ -1,6 +1,8 @@
 from .contact_person import ContactPersonViewSet
 from .hearing import HearingViewSet
+from .image_upload import ImageUploadViewSet
 from .label import LabelViewSet
+from .request_stats import RequestStatsView
 from .section import ImageViewSet, SectionViewSet, RootSectionViewSet
 from .section_comment import SectionCommentViewSet, CommentViewSet
 from .user import UserDataViewSet
@@ -9,8 +11,10 @@ __all__ = [
     "ContactPersonViewSet",
     "CommentViewSet",
     "HearingViewSet",
+    "ImageUploadViewSet",
     "ImageViewSet",
     "LabelViewSet",
+    "RequestStatsView",
     "RootSectionViewSet",
     "SectionCommentViewSet",
     "SectionViewSet",
@@ -1,10 +1,17 @@
+import os
+
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.db import transaction
+from django.utils.translation import ugettext as _
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 
 from democracy.models.base import BaseModel
 from democracy.models.images import BaseImage
-from democracy.views.utils import AbstractSerializerMixin
+from democracy.utils.serializer_profiling import ProfiledSerializerMixin
+from democracy.views.utils import Base64ImageField, ImageUploadField
 
 
 class UserFieldSerializer(serializers.ModelSerializer):
@@ -25,18 +32,18 @@ class CreatedBySerializer(serializers.ModelSerializer):
     created_by = UserFieldSerializer()
 
 
-class BaseImageSerializer(AbstractSerializerMixin, serializers.ModelSerializer):
+class BaseImageSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Image objects.
     """
     url = serializers.SerializerMethodField()
+    variants = serializers.SerializerMethodField()
 
     class Meta:
         model = BaseImage
-        fields = ['title', 'url', 'width', 'height', 'caption']
+        fields = ['title', 'url', 'width', 'height', 'caption', 'variants']
 
-    def get_url(self, obj):
-        url = obj.image.url
+    def _build_absolute_uri(self, url):
         if not self.context:
             raise NotImplementedError("Not implemented")  # pragma: no cover
 
@@ -46,6 +53,68 @@ class BaseImageSerializer(AbstractSerializerMixin, serializers.ModelSerializer):
 
         return url
 
+    def get_url(self, obj):
+        return self._build_absolute_uri(obj.image.url)
+
+    def get_variants(self, obj):
+        storage = obj.image.storage
+        return {
+            alias: {
+                'url': self._build_absolute_uri(storage.url(variant['name'])),
+                'width': variant['width'],
+                'height': variant['height'],
+            }
+            for (alias, variant) in (obj.variants or {}).items()
+        }
+
+
+def claim_image_upload(upload):
+    """
+    Claim the upload an image was created from, after the image has been saved, see `ImageUpload.claim`.
+
+    Must be called in the transaction that saved the image, so that the image is not saved if the upload
+    was already claimed by a concurrent request.
+
+    :type upload: democracy.models.ImageUpload|None
+    """
+    if upload and not upload.claim():
+        message = ImageUploadField.default_error_messages['does_not_exist'].format(pk_value=upload.pk)
+        raise ValidationError({'upload': [message]})
+
+
+class BaseImageCreateSerializer(BaseImageSerializer):
+    """
+    Serializer for creating and updating Image objects.
+
+    The image is given either as base64 encoded `image` data, or as the token of an
+    image uploaded to the image upload endpoint in `upload`. An upload can be used only once.
+    """
+    image = Base64ImageField(required=False)
+    upload = ImageUploadField(required=False, write_only=True)
+
+    def validate(self, attrs):
+        upload = attrs.get('upload')
+        if upload:
+            # a new file object makes the image field copy the uploaded file into its own location
+            attrs['image'] = File(upload.image.file, name=os.path.basename(upload.image.name))
+        elif not self.instance and not attrs.get('image'):
+            raise ValidationError({'image': [_('This field is required.')]})
+        return super().validate(attrs)
+
+    @transaction.atomic()
+    def create(self, validated_data):
+        upload = validated_data.pop('upload', None)
+        image = super().create(validated_data)
+        claim_image_upload(upload)
+        return image
+
+    @transaction.atomic()
+    def update(self, instance, validated_data):
+        upload = validated_data.pop('upload', None)
+        image = super().update(instance, validated_data)
+        claim_image_upload(upload)
+        return image
+
 
 class AdminsSeeUnpublishedMixin(object):
     model = None
@@ -9,15 +9,16 @@ from rest_framework.settings import api_settings
 from reversion import revisions
 
 from democracy.models.comment import BaseComment
+from democracy.utils.vote_buffer import get_vote_buffer
 from democracy.views.base import AdminsSeeUnpublishedMixin, CreatedBySerializer
-from democracy.views.utils import AbstractSerializerMixin
+from democracy.views.utils import BoundingBoxFilter, GeoJSONStreamingMixin, RequestStatsMixin
 from democracy.renderers import GeoJSONRenderer
 
 COMMENT_FIELDS = ['id', 'content', 'author_name', 'n_votes', 'created_at', 'is_registered', 'can_edit',
                   'geojson', 'images', 'label']
 
 
-class BaseCommentSerializer(AbstractSerializerMixin, CreatedBySerializer, serializers.ModelSerializer):
+class BaseCommentSerializer(CreatedBySerializer, serializers.ModelSerializer):
     is_registered = serializers.SerializerMethodField()
     can_edit = serializers.SerializerMethodField()
 
@@ -45,13 +46,14 @@ class BaseCommentSerializer(AbstractSerializerMixin, CreatedBySerializer, serial
 
 class BaseCommentFilter(django_filters.FilterSet):
     authorization_code = django_filters.CharFilter()
+    bbox = BoundingBoxFilter()
 
     class Meta:
         model = BaseComment
-        fields = ['authorization_code', ]
+        fields = ['authorization_code', 'bbox']
 
 
-class BaseCommentViewSet(AdminsSeeUnpublishedMixin, viewsets.ModelViewSet):
+class BaseCommentViewSet(RequestStatsMixin, AdminsSeeUnpublishedMixin, GeoJSONStreamingMixin, viewsets.ModelViewSet):
     """
     Base viewset for comments.
     """
@@ -62,15 +64,30 @@ class BaseCommentViewSet(AdminsSeeUnpublishedMixin, viewsets.ModelViewSet):
     filter_class = BaseCommentFilter
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [GeoJSONRenderer, ]
 
+    _serializer_class_override = None
+
     def get_serializer(self, *args, **kwargs):
-        serializer_class = kwargs.pop("serializer_class", None) or self.get_serializer_class()
-        context = kwargs['context'] = self.get_serializer_context()
+        # `serializer_class` may be given to e.g. deserialize with `create_serializer_class`
+        self._serializer_class_override = kwargs.pop("serializer_class", None)
+        serializer_class = self.get_serializer_class()
         if serializer_class is self.create_serializer_class and "data" in kwargs:  # Creating things with data?
             # So inject a reference to the parent object
-            data = kwargs["data"].copy()
-            data[serializer_class.Meta.model.parent_field] = context["comment_parent"]
-            kwargs["data"] = data
-        return serializer_class(*args, **kwargs)
+            parent_field = serializer_class.Meta.model.parent_field
+            parent_id = self.get_comment_parent_id()
+            if kwargs.get("many"):
+                if isinstance(kwargs["data"], list):
+                    kwargs["data"] = [
+                        dict(datum, **{parent_field: parent_id}) if isinstance(datum, dict) else datum
+                        for datum in kwargs["data"]
+                    ]
+            else:
+                data = kwargs["data"].copy()
+                data[parent_field] = parent_id
+                kwargs["data"] = data
+        return super().get_serializer(*args, **kwargs)
+
+    def get_serializer_class(self):
+        return self._serializer_class_override or super().get_serializer_class()
 
     def get_comment_parent_id(self):
         return self.kwargs["comment_parent_pk"]
@@ -176,8 +193,12 @@ class BaseCommentViewSet(AdminsSeeUnpublishedMixin, viewsets.ModelViewSet):
 
         if not request.user.is_authenticated():
             # If the check went through, anonymous voting is allowed
-            comment.n_unregistered_votes += 1
-            comment.recache_n_votes()
+            vote_buffer = get_vote_buffer()
+            if vote_buffer:
+                vote_buffer.add(comment)
+            else:
+                comment.n_unregistered_votes += 1
+                comment.recache_n_votes()
             return response.Response({'status': 'Vote has been counted'}, status=status.HTTP_200_OK)
         # Check if user voted already. If yes, return 304.
         if comment.__class__.objects.filter(id=comment.id, voters=request.user).exists():
@@ -1,20 +1,18 @@
 from democracy.models.section import CommentImage
-from democracy.views.base import BaseImageSerializer
-from democracy.views.utils import Base64ImageField
+from democracy.views.base import BaseImageCreateSerializer, BaseImageSerializer
 
 
 class CommentImageSerializer(BaseImageSerializer):
     class Meta:
         model = CommentImage
-        fields = ['url', 'width', 'height', 'title', 'caption', 'id']
+        fields = ['url', 'width', 'height', 'title', 'caption', 'id', 'variants']
 
 
-class CommentImageCreateSerializer(BaseImageSerializer):
+class CommentImageCreateSerializer(BaseImageCreateSerializer):
     """
     Serializer for comment_image creation.
     """
-    image = Base64ImageField()
 
     class Meta:
         model = CommentImage
-        fields = ['title', 'image', 'id', 'width', 'height', 'caption']
+        fields = ['title', 'image', 'upload', 'id', 'width', 'height', 'caption']
@@ -2,6 +2,7 @@ from rest_framework import serializers, viewsets
 
 from democracy.models import ContactPerson
 from democracy.pagination import DefaultLimitPagination
+from democracy.views.utils import RequestStatsMixin
 
 
 class ContactPersonSerializer(serializers.ModelSerializer):
@@ -12,7 +13,8 @@ class ContactPersonSerializer(serializers.ModelSerializer):
         fields = ('id', 'title', 'name', 'phone', 'email', 'organization')
 
 
-class ContactPersonViewSet(viewsets.ReadOnlyModelViewSet):
+class ContactPersonViewSet(RequestStatsMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ContactPersonSerializer
     queryset = ContactPerson.objects.select_related('organization')
     pagination_class = DefaultLimitPagination
+    query_budgets = {'list': 2, 'retrieve': 1}
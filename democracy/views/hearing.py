@@ -13,17 +13,24 @@ from rest_framework.settings import api_settings
 
 from democracy.enums import InitialSectionType
 from democracy.models import ContactPerson, Hearing, Label, Section, SectionImage
+from democracy.models.counters import (
+    PREFETCHED_SHARDS_ATTR, prefetch_comment_counter_shards, set_prefetched_comment_counter_shards
+)
+from democracy.models.section import section_types
 from democracy.pagination import DefaultLimitPagination
 from democracy.renderers import GeoJSONRenderer
+from democracy.utils.geo import zoom_to_tolerance
 from democracy.views.base import AdminsSeeUnpublishedMixin
 from democracy.views.contact_person import ContactPersonSerializer
 from democracy.views.label import LabelSerializer
 from democracy.views.section import (
-    SectionCreateUpdateSerializer, SectionFieldSerializer, SectionImageSerializer, SectionSerializer
+    SectionCreateUpdateSerializer, SectionImageSerializer, SectionSerializer
 )
 from democracy.views.utils import TranslatableSerializer
 from .hearing_report import HearingReport
-from .utils import NestedPKRelatedField, filter_by_hearing_visible
+from .utils import (
+    BoundingBoxFilter, GeoJSONStreamingMixin, NestedPKRelatedField, RequestStatsMixin, filter_by_hearing_visible
+)
 
 
 class HearingFilter(django_filters.FilterSet):
@@ -32,10 +39,11 @@ class HearingFilter(django_filters.FilterSet):
     title = django_filters.CharFilter(lookup_type='icontains', name='translations__title')
     label = django_filters.Filter(name='labels__id', lookup_type='in', distinct=True,
                                   widget=django_filters.widgets.CSVWidget)
+    bbox = BoundingBoxFilter()
 
     class Meta:
         model = Hearing
-        fields = ['published', 'open_at_lte', 'open_at_gt', 'title', 'label']
+        fields = ['published', 'open_at_lte', 'open_at_gt', 'title', 'label', 'bbox']
 
 
 class HearingCreateUpdateSerializer(serializers.ModelSerializer, TranslatableSerializer):
@@ -86,6 +94,8 @@ class HearingCreateUpdateSerializer(serializers.ModelSerializer, TranslatableSer
         :rtype: Set of democracy.models.Section
         """
         sections = set()
+        # fetch all the existing sections at once instead of one query per section
+        existing_sections = {} if force_create else {section.pk: section for section in hearing.sections.all()}
         for index, section_data in enumerate(sections_data):
             section_data['ordering'] = index
             pk = section_data.pop('id', None)
@@ -94,12 +104,8 @@ class HearingCreateUpdateSerializer(serializers.ModelSerializer, TranslatableSer
                 'data': section_data,
             }
 
-            if pk and not force_create:
-                try:
-                    section = hearing.sections.get(id=pk)
-                    serializer_params['instance'] = section
-                except Section.DoesNotExist:
-                    pass
+            if pk in existing_sections:
+                serializer_params['instance'] = existing_sections[pk]
 
             serializer = SectionCreateUpdateSerializer(**serializer_params)
 
@@ -142,10 +148,7 @@ class HearingCreateUpdateSerializer(serializers.ModelSerializer, TranslatableSer
         hearing = super().update(instance, validated_data)
         sections = self._create_or_update_sections(hearing, sections_data)
         new_section_ids = set([section.id for section in sections])
-        for section in hearing.sections.exclude(id__in=new_section_ids):
-            for image in section.images.all():
-                image.soft_delete()
-            section.soft_delete()
+        hearing.sections.exclude(id__in=new_section_ids).soft_delete(cascade=True)
 
         return hearing
 
@@ -192,6 +195,7 @@ class HearingSerializer(serializers.ModelSerializer, TranslatableSerializer):
     abstract = serializers.SerializerMethodField()
     contact_persons = ContactPersonSerializer(many=True, read_only=True)
     default_to_fullscreen = serializers.SerializerMethodField()
+    n_comments = serializers.IntegerField(source='get_n_comments', read_only=True)
 
     def _get_main_section(self, hearing):
         prefetched_mains = getattr(hearing, 'main_section_list', [])
@@ -203,7 +207,7 @@ class HearingSerializer(serializers.ModelSerializer, TranslatableSerializer):
             return ''
         translations = {
             t.language_code: t.abstract for t in
-            main_section.translations.filter(language_code__in=self.Meta.translation_lang)
+            main_section.translations.filter(language_code__in=self.translation_lang)
         }
         abstract = {}
         for lang_code, translation in translations.items():
@@ -214,16 +218,22 @@ class HearingSerializer(serializers.ModelSerializer, TranslatableSerializer):
     def get_sections(self, hearing):
         queryset = hearing.sections.all()
         if not hearing.closed:
-            queryset = queryset.exclude(type__identifier=InitialSectionType.CLOSURE_INFO)
+            queryset = queryset.exclude(type_id=section_types.get_pk(InitialSectionType.CLOSURE_INFO))
 
-        serializer = SectionFieldSerializer(many=True, read_only=True)
+        serializer = SectionSerializer(many=True, read_only=True)
         serializer.bind('sections', self)  # this is needed to get context in the serializer
+        hearing_shards = getattr(hearing, PREFETCHED_SHARDS_ATTR, None)
+        if hearing_shards is not None:
+            # the comment counter shards of the sections were prefetched with the hearing
+            sections = list(queryset.prefetch_related('translations'))
+            set_prefetched_comment_counter_shards(sections, hearing_shards)
+            return serializer.to_representation(sections)
         return serializer.to_representation(queryset)
 
     def get_main_image(self, hearing):
         main_image = SectionImage.objects.filter(
             section__hearing=hearing,
-            section__type__identifier='main'
+            section__type_id=section_types.get_pk(InitialSectionType.MAIN)
         ).first()
 
         if not main_image:
@@ -264,7 +274,10 @@ class HearingListSerializer(HearingSerializer):
 
 
 class HearingMapSerializer(serializers.ModelSerializer, TranslatableSerializer):
-    geojson = JSONField()
+    geojson = serializers.SerializerMethodField()
+
+    def get_geojson(self, hearing):
+        return hearing.get_map_geojson(self.context.get('tolerance'))
 
     class Meta:
         model = Hearing
@@ -273,7 +286,7 @@ class HearingMapSerializer(serializers.ModelSerializer, TranslatableSerializer):
         ]
 
 
-class HearingViewSet(AdminsSeeUnpublishedMixin, viewsets.ModelViewSet):
+class HearingViewSet(RequestStatsMixin, AdminsSeeUnpublishedMixin, GeoJSONStreamingMixin, viewsets.ModelViewSet):
     """
     API endpoint for hearings.
     """
@@ -282,6 +295,7 @@ class HearingViewSet(AdminsSeeUnpublishedMixin, viewsets.ModelViewSet):
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     pagination_class = DefaultLimitPagination
     serializer_class = HearingListSerializer
+    query_budgets = {'retrieve': 13}
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [GeoJSONRenderer, ]
 
     ordering_fields = ('created_at', 'close_at', 'open_at', 'n_comments')
@@ -318,11 +332,11 @@ class HearingViewSet(AdminsSeeUnpublishedMixin, viewsets.ModelViewSet):
                                              hearing_lookup='').prefetch_related(
             Prefetch(
                 'sections',
-                queryset=Section.objects.filter(type__identifier='main'),
+                queryset=Section.objects.filter(type_id=section_types.get_pk(InitialSectionType.MAIN)),
                 to_attr='main_section_list'
             )
         )
-        return queryset
+        return prefetch_comment_counter_shards(queryset)
 
     def get_object(self):
         id_or_slug = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
@@ -331,10 +345,11 @@ class HearingViewSet(AdminsSeeUnpublishedMixin, viewsets.ModelViewSet):
         queryset = queryset.prefetch_related(
             Prefetch(
                 'sections',
-                queryset=Section.objects.filter(type__identifier='main'),
+                queryset=Section.objects.filter(type_id=section_types.get_pk(InitialSectionType.MAIN)),
                 to_attr='main_section_list'
             )
         )
+        queryset = prefetch_comment_counter_shards(queryset)
 
         try:
             obj = queryset.get_by_id_or_slug(id_or_slug)
@@ -386,16 +401,46 @@ class HearingViewSet(AdminsSeeUnpublishedMixin, viewsets.ModelViewSet):
         report = HearingReport(HearingSerializer(self.get_object(), context=context).data, context=context)
         return report.get_response()
 
+    def _get_map_tolerance(self):
+        """
+        Get the simplification tolerance requested with either `tolerance` (degrees) or `zoom` (map zoom level).
+        """
+        params = self.request.query_params
+        try:
+            if 'tolerance' in params:
+                tolerance = float(params['tolerance'])
+                if not tolerance >= 0:
+                    raise ValueError('Negative tolerance')
+                return tolerance
+            if 'zoom' in params:
+                zoom = int(params['zoom'])
+                if not 0 <= zoom <= 30:
+                    raise ValueError('Zoom level out of range')
+                return zoom_to_tolerance(zoom)
+        except ValueError:
+            raise ValidationError('Invalid simplification parameters. Expected tolerance >= 0 or zoom from 0 to 30.')
+        return None
+
     @list_route(methods=['get'])
     def map(self, request):
+        """
+        List hearing areas for map display.
+
+        Supports simplified geometries with `tolerance` or `zoom`, and filtering
+        with `bbox=minx,miny,maxx,maxy` like the hearing list.
+        """
+        tolerance = self._get_map_tolerance()
         queryset = self.filter_queryset(self.get_queryset())
+        if tolerance is None:
+            queryset = queryset.defer('geojson_simplified')
+        context = dict(self.get_serializer_context(), tolerance=tolerance)
 
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = HearingMapSerializer(page, many=True)
+            serializer = HearingMapSerializer(page, many=True, context=context)
             return self.get_paginated_response(serializer.data)
 
-        serializer = HearingMapSerializer(queryset, many=True)
+        serializer = HearingMapSerializer(queryset, many=True, context=context)
         return response.Response(serializer.data)
 
     def create(self, request):
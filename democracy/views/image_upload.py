@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.utils.crypto import get_random_string
+from django.utils.translation import ugettext as _
+from rest_framework import mixins, permissions, serializers, throttling, viewsets
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.parsers import FileUploadParser, MultiPartParser
+
+from democracy.models import ImageUpload
+from democracy.views.utils import RequestStatsMixin, validate_image_dimensions
+
+# room for the multipart boundaries and headers around the image itself
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+class RawImageUploadParser(FileUploadParser):
+    """
+    Parser for a request body that is the image file itself, e.g. `Content-Type: image/jpeg`.
+
+    The file name is optional, as it will be replaced anyway.
+    """
+    media_type = 'image/*'
+
+    def get_filename(self, stream, media_type, parser_context):
+        return super().get_filename(stream, media_type, parser_context) or 'image'
+
+
+class ImageUploadRateThrottle(throttling.SimpleRateThrottle):
+    """
+    Limit the uploads of each user, or of each IP address for anonymous uploads, to `DEMOCRACY_IMAGE_UPLOAD_RATE`.
+    """
+    scope = 'image_upload'
+
+    def get_rate(self):
+        return getattr(settings, 'DEMOCRACY_IMAGE_UPLOAD_RATE', '100/hour')
+
+    def get_cache_key(self, request, view):
+        ident = request.user.pk if request.user.is_authenticated() else self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    token = serializers.CharField(source='id', read_only=True)
+
+    class Meta:
+        model = ImageUpload
+        fields = ['token', 'image', 'width', 'height']
+        extra_kwargs = {'image': {'write_only': True}}
+
+    def validate_image(self, image):
+        if image.size > getattr(settings, 'MAX_IMAGE_SIZE', image.size):
+            raise ValidationError(_('Image size should be smaller than {} bytes.'.format(settings.MAX_IMAGE_SIZE)))
+        validate_image_dimensions(*image.image.size)
+        # don't leak the client's file name into the storage
+        image.name = '%s.%s' % (get_random_string(8), image.image.format.lower())
+        return image
+
+
+class ImageUploadViewSet(RequestStatsMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
+    """
+    API endpoint for uploading images as multipart form data (in the `image` field) or as the raw request body.
+
+    The returned token can be given as `upload` instead of base64 encoded `image` data when creating or
+    updating comment and section images. The uploads are throttled with `ImageUploadRateThrottle`.
+    """
+    queryset = ImageUpload.objects.none()
+    serializer_class = ImageUploadSerializer
+    permission_classes = (permissions.AllowAny,)
+    throttle_classes = (ImageUploadRateThrottle,)
+    parser_classes = (MultiPartParser, RawImageUploadParser)
+
+    def create(self, request, *args, **kwargs):
+        self._check_content_length(request)
+        return super().create(request, *args, **kwargs)
+
+    def _check_content_length(self, request):
+        """
+        Reject too large uploads before their body is read.
+        """
+        max_size = getattr(settings, 'MAX_IMAGE_SIZE', None)
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            raise ParseError(_('Invalid Content-Length.'))
+        if max_size is not None and content_length > max_size + MULTIPART_OVERHEAD:
+            raise ValidationError({'image': [_('Image size should be smaller than {} bytes.'.format(max_size))]})
+
+    def get_serializer(self, *args, **kwargs):
+        if 'data' in kwargs and 'file' in self.request.FILES:
+            # the raw image parser places the image in `file`
+            kwargs['data'] = {'image': self.request.FILES['file']}
+        return super().get_serializer(*args, **kwargs)
+
+    def perform_create(self, serializer):
+        user = self.request.user
+        serializer.save(created_by=(user if user.is_authenticated() else None))
@@ -3,7 +3,8 @@ import django_filters
 
 from democracy.models import Label
 from democracy.pagination import DefaultLimitPagination
-from democracy.views.utils import TranslatableSerializer
+from democracy.utils.serializer_profiling import ProfiledSerializerMixin
+from democracy.views.utils import RequestStatsMixin, TranslatableSerializer
 
 
 class LabelFilter(django_filters.FilterSet):
@@ -14,13 +15,13 @@ class LabelFilter(django_filters.FilterSet):
         fields = ['label']
 
 
-class LabelSerializer(serializers.ModelSerializer, TranslatableSerializer):
+class LabelSerializer(ProfiledSerializerMixin, serializers.ModelSerializer, TranslatableSerializer):
     class Meta:
         model = Label
         fields = ('id', 'label')
 
 
-class LabelViewSet(viewsets.ReadOnlyModelViewSet):
+class LabelViewSet(RequestStatsMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = LabelSerializer
     queryset = Label.objects.all()
     pagination_class = DefaultLimitPagination
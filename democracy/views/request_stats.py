@@ -0,0 +1,20 @@
+from rest_framework import permissions, response, status
+from rest_framework.views import APIView
+
+from democracy.utils.request_stats import request_stats_collector
+
+
+class RequestStatsView(APIView):
+    """
+    Statistics of the requests handled by this process, aggregated by view.
+
+    Only collected when `DEMOCRACY_REQUEST_STATS` is enabled. DELETE clears the statistics.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, format=None):
+        return response.Response(request_stats_collector.as_dict())
+
+    def delete(self, request, format=None):
+        request_stats_collector.clear()
+        return response.Response(status=status.HTTP_204_NO_CONTENT)
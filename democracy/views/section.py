@@ -1,51 +1,83 @@
 import django_filters
 from django.db.models import Q
-from django.db import transaction
+from django.db import models, transaction
 from django.utils.timezone import now
-from rest_framework import filters, serializers, viewsets
-from rest_framework.exceptions import ValidationError
+from django.utils.translation import ugettext as _
+from rest_framework import filters, response, serializers, viewsets
+from rest_framework.decorators import detail_route
+from rest_framework.exceptions import NotFound, ValidationError
 
 from democracy.enums import Commenting, InitialSectionType
-from democracy.models import Hearing, Section, SectionImage, SectionType
+from democracy.models import Hearing, Section, SectionImage, SectionPluginSummary, SectionType
+from democracy.models.counters import prefetch_comment_counter_shards
+from democracy.models.section import section_types
 from democracy.pagination import DefaultLimitPagination
 from democracy.utils.drf_enum_field import EnumField
-from democracy.views.base import AdminsSeeUnpublishedMixin, BaseImageSerializer
+from democracy.utils.serializer_profiling import ProfiledSerializerMixin
+from democracy.views.base import AdminsSeeUnpublishedMixin, BaseImageCreateSerializer, BaseImageSerializer
 from democracy.views.utils import (
-    Base64ImageField, filter_by_hearing_visible, PublicFilteredImageField, TranslatableSerializer
+    filter_by_hearing_visible, PublicFilteredImageField, RequestStatsMixin, TranslatableSerializer
 )
 
 
+class SectionTypeField(serializers.SlugRelatedField):
+    """
+    Section type field that looks the types up in the section type registry instead of the database.
+    """
+
+    def get_attribute(self, section):
+        return section_types.get_by_pk(section.type_id)
+
+    def to_internal_value(self, data):
+        try:
+            return section_types.get(data)
+        except SectionType.DoesNotExist:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=data)
+        except TypeError:
+            self.fail('invalid')
+
+
 class SectionImageSerializer(BaseImageSerializer, TranslatableSerializer):
     class Meta:
         model = SectionImage
-        fields = ['id', 'title', 'url', 'width', 'height', 'caption']
+        fields = ['id', 'title', 'url', 'width', 'height', 'caption', 'variants']
 
 
-class SectionImageCreateUpdateSerializer(BaseImageSerializer, TranslatableSerializer):
-    image = Base64ImageField()
+class SectionImageCreateUpdateSerializer(BaseImageCreateSerializer, TranslatableSerializer):
+    class Meta:
+        model = SectionImage
+        fields = ['title', 'url', 'width', 'height', 'caption', 'image', 'upload']
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
 
-        # image content isn't mandatory on updates
-        if self.instance:
-            self.fields['image'].required = False
+class SectionListSerializer(serializers.ListSerializer):
+    """
+    Serializer for lists of sections, fetching the translations, images and comment counter shards of all
+    the sections at once.
+    """
 
-    class Meta:
-        model = SectionImage
-        fields = ['title', 'url', 'width', 'height', 'caption', 'image']
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        if isinstance(data, models.QuerySet):
+            data = prefetch_comment_counter_shards(data.prefetch_related('translations'))
+        sections = list(data)
+        images_field = self.child.fields.get('images')
+        if isinstance(images_field, PublicFilteredImageField):
+            images_field.prefetch_images(sections)
+        return [self.child.to_representation(section) for section in sections]
 
 
-class SectionSerializer(serializers.ModelSerializer, TranslatableSerializer):
+class SectionSerializer(ProfiledSerializerMixin, serializers.ModelSerializer, TranslatableSerializer):
     """
     Serializer for section instance.
     """
     images = PublicFilteredImageField(serializer_class=SectionImageSerializer)
-    type = serializers.SlugRelatedField(slug_field='identifier', read_only=True)
-    type_name_singular = serializers.SlugRelatedField(source='type', slug_field='name_singular', read_only=True)
-    type_name_plural = serializers.SlugRelatedField(source='type', slug_field='name_plural', read_only=True)
+    type = SectionTypeField(slug_field='identifier', read_only=True)
+    type_name_singular = SectionTypeField(source='type', slug_field='name_singular', read_only=True)
+    type_name_plural = SectionTypeField(source='type', slug_field='name_plural', read_only=True)
     commenting = EnumField(enum_type=Commenting)
     voting = EnumField(enum_type=Commenting)
+    n_comments = serializers.IntegerField(source='get_n_comments', read_only=True)
 
     class Meta:
         model = Section
@@ -55,15 +87,7 @@ class SectionSerializer(serializers.ModelSerializer, TranslatableSerializer):
             'type_name_singular', 'type_name_plural',
             'plugin_identifier', 'plugin_data', 'plugin_iframe_url', 'plugin_fullscreen',
         ]
-
-
-class SectionFieldSerializer(serializers.RelatedField):
-    """
-    Serializer for section field. A property of other instance.
-    """
-
-    def to_representation(self, section):
-        return SectionSerializer(section, context=self.context).data
+        list_serializer_class = SectionListSerializer
 
 
 class SectionCreateUpdateSerializer(serializers.ModelSerializer, TranslatableSerializer):
@@ -71,7 +95,7 @@ class SectionCreateUpdateSerializer(serializers.ModelSerializer, TranslatableSer
     Serializer for section create/update.
     """
     id = serializers.CharField(required=False)
-    type = serializers.SlugRelatedField(slug_field='identifier', queryset=SectionType.objects.all())
+    type = SectionTypeField(slug_field='identifier', queryset=SectionType.objects.all())
     commenting = EnumField(enum_type=Commenting)
 
     # this field is used only for incoming data validation, outgoing data is added manually
@@ -105,7 +129,7 @@ class SectionCreateUpdateSerializer(serializers.ModelSerializer, TranslatableSer
         for index, image_data in enumerate(data):
             pk = image_data.get('id')
             image_data['ordering'] = index
-            serializer_params = {'data': image_data}
+            serializer_params = {'data': image_data, 'context': self.context}
 
             if pk:
                 try:
@@ -131,8 +155,7 @@ class SectionCreateUpdateSerializer(serializers.ModelSerializer, TranslatableSer
             image = serializer.save(section=section)
             new_image_ids.add(image.id)
 
-        for image in section.images.exclude(id__in=new_image_ids):
-            image.soft_delete()
+        section.images.exclude(id__in=new_image_ids).soft_delete()
 
         return section
 
@@ -146,18 +169,37 @@ class SectionCreateUpdateSerializer(serializers.ModelSerializer, TranslatableSer
         return data
 
 
-class SectionViewSet(AdminsSeeUnpublishedMixin, viewsets.ReadOnlyModelViewSet):
+class SectionPluginSummarySerializer(serializers.ModelSerializer):
+    summary = serializers.JSONField(read_only=True)
+
+    class Meta:
+        model = SectionPluginSummary
+        fields = ['plugin_identifier', 'n_comments', 'summary', 'modified_at']
+
+
+class SectionViewSet(RequestStatsMixin, AdminsSeeUnpublishedMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = SectionSerializer
     model = Section
+    query_budgets = {'list': 6}
 
     def get_queryset(self):
         id_or_slug = self.kwargs['hearing_pk']
         hearing = Hearing.objects.get_by_id_or_slug(id_or_slug)
         queryset = super().get_queryset().filter(hearing=hearing)
         if not hearing.closed:
-            queryset = queryset.exclude(type__identifier=InitialSectionType.CLOSURE_INFO)
+            queryset = queryset.exclude(type_id=section_types.get_pk(InitialSectionType.CLOSURE_INFO))
         return queryset
 
+    @detail_route(methods=['get'])
+    def plugin_summary(self, request, **kwargs):
+        """
+        The plugin data of the public comments of the section, summarized by the section's plugin.
+        """
+        plugin_summary = SectionPluginSummary.get_for_section(self.get_object())
+        if plugin_summary is None:
+            raise NotFound(_("The plugin of this section does not summarize comments."))
+        return response.Response(SectionPluginSummarySerializer(plugin_summary).data)
+
 
 class RootSectionImageSerializer(SectionImageSerializer):
     """
@@ -179,7 +221,7 @@ class ImageFilter(filters.FilterSet):
 
 
 # root level SectionImage endpoint
-class ImageViewSet(AdminsSeeUnpublishedMixin, viewsets.ReadOnlyModelViewSet):
+class ImageViewSet(RequestStatsMixin, AdminsSeeUnpublishedMixin, viewsets.ReadOnlyModelViewSet):
     model = SectionImage
     serializer_class = RootSectionImageSerializer
     pagination_class = DefaultLimitPagination
@@ -209,11 +251,12 @@ class SectionFilter(filters.FilterSet):
 
 
 # root level Section endpoint
-class RootSectionViewSet(AdminsSeeUnpublishedMixin, viewsets.ReadOnlyModelViewSet):
+class RootSectionViewSet(RequestStatsMixin, AdminsSeeUnpublishedMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = RootSectionSerializer
     model = Section
     pagination_class = DefaultLimitPagination
     filter_class = SectionFilter
+    query_budgets = {'list': 5}
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -221,6 +264,7 @@ class RootSectionViewSet(AdminsSeeUnpublishedMixin, viewsets.ReadOnlyModelViewSe
 
         n = now()
         open_hearings = Q(hearing__force_closed=False) & Q(hearing__open_at__lte=n) & Q(hearing__close_at__gt=n)
-        queryset = queryset.exclude(open_hearings, type__identifier=InitialSectionType.CLOSURE_INFO)
+        queryset = queryset.exclude(open_hearings, type_id=section_types.get_pk(InitialSectionType.CLOSURE_INFO))
 
-        return queryset
+        # pages are serialized as lists, so the translations and counters can't be prefetched by the list serializer
+        return prefetch_comment_counter_shards(queryset.prefetch_related('translations'))
@@ -1,8 +1,12 @@
+from collections import OrderedDict
+
 import django_filters
+from django.conf import settings
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db.transaction import atomic
 from django.utils.translation import ugettext as _
-from rest_framework import filters, serializers
+from rest_framework import filters, response, serializers, status
+from rest_framework.decorators import list_route
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import JSONField
 from rest_framework.serializers import as_serializer_error
@@ -10,11 +14,65 @@ from rest_framework.settings import api_settings
 
 from democracy.models import SectionComment, Label, Section
 from democracy.models.section import CommentImage
+from democracy.views.base import claim_image_upload
 from democracy.views.comment import COMMENT_FIELDS, BaseCommentViewSet, BaseCommentSerializer
 from democracy.views.label import LabelSerializer
 from democracy.pagination import DefaultLimitPagination
 from democracy.views.comment_image import CommentImageCreateSerializer, CommentImageSerializer
-from democracy.views.utils import filter_by_hearing_visible, GeoJSONField, NestedPKRelatedField
+from democracy.views.utils import BoundingBoxFilter, filter_by_hearing_visible, GeoJSONField, NestedPKRelatedField
+
+
+def get_plugin_data_error_detail(error):
+    """
+    Get the detail of a plugin data validation error, with the non-field errors as `plugin_data` errors.
+    """
+    detail = as_serializer_error(error)
+    detail.setdefault("plugin_data", []).extend(detail.pop(api_settings.NON_FIELD_ERRORS_KEY, ()))
+    return detail
+
+
+class SectionCommentCreateListSerializer(serializers.ListSerializer):
+    """
+    Serializer for creating many comments at once.
+
+    The plugin data of the comments are cleaned with one `Plugin.clean_client_data_batch` call per section.
+    At most `DEMOCRACY_COMMENT_BATCH_MAX_SIZE` comments may be created at once.
+    """
+
+    def to_internal_value(self, data):
+        max_size = getattr(settings, 'DEMOCRACY_COMMENT_BATCH_MAX_SIZE', 100)
+        if isinstance(data, list) and len(data) > max_size:
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                _("At most %(max_size)d comments may be created at once.") % {"max_size": max_size}
+            ]})
+        validated_data = super(SectionCommentCreateListSerializer, self).to_internal_value(data)
+
+        indexes_by_section = OrderedDict()
+        for index, attrs in enumerate(validated_data):
+            if attrs.get("plugin_data"):
+                indexes_by_section.setdefault(attrs["section"], []).append(index)
+        errors = [{} for attrs in validated_data]
+        for section, indexes in indexes_by_section.items():
+            results = section.plugin_implementation.clean_client_data_batch(
+                [validated_data[index]["plugin_data"] for index in indexes]
+            )
+            for index, result in zip(indexes, results):
+                if isinstance(result, Exception):
+                    errors[index] = get_plugin_data_error_detail(result)
+                else:
+                    validated_data[index]["plugin_data"] = result
+        if any(errors):
+            raise ValidationError(errors)
+        return validated_data
+
+    @atomic
+    def save(self, **kwargs):
+        user = self.context['request'].user
+        author_names = [attrs['author_name'] for attrs in self.validated_data if attrs.get('author_name')]
+        if user.is_authenticated() and author_names:
+            user.nickname = author_names[-1]
+            user.save(update_fields=('nickname',))
+        return super(SectionCommentCreateListSerializer, self).save(**kwargs)
 
 
 class SectionCommentCreateSerializer(serializers.ModelSerializer):
@@ -35,6 +93,7 @@ class SectionCommentCreateSerializer(serializers.ModelSerializer):
         model = SectionComment
         fields = ['section', 'content', 'plugin_data', 'authorization_code', 'author_name',
                   'label', 'images', 'geojson', 'language_code']
+        list_serializer_class = SectionCommentCreateListSerializer
 
     def to_internal_value(self, data):
         if data.get("plugin_data") is None:
@@ -49,13 +108,15 @@ class SectionCommentCreateSerializer(serializers.ModelSerializer):
             try:
                 if not section.plugin_identifier:
                     raise ValidationError("The section %s has no plugin; no plugin data is allowed." % section)
-                plugin = section.plugin_implementation
-                attrs["plugin_data"] = plugin.clean_client_data(attrs["plugin_data"])
+                # in a batch, the plugin data of all the comments are cleaned by the list serializer
+                if not isinstance(self.parent, SectionCommentCreateListSerializer):
+                    [result] = section.plugin_implementation.clean_client_data_batch([attrs["plugin_data"]])
+                    if isinstance(result, Exception):
+                        raise result
+                    attrs["plugin_data"] = result
             except (ValidationError, DjangoValidationError) as ve:
                 # Massage the validation error slightly...
-                detail = as_serializer_error(ve)
-                detail.setdefault("plugin_data", []).extend(detail.pop(api_settings.NON_FIELD_ERRORS_KEY, ()))
-                raise ValidationError(detail=detail)
+                raise ValidationError(detail=get_plugin_data_error_detail(ve))
             attrs["plugin_identifier"] = section.plugin_identifier
         if not any([attrs.get(field) for field in SectionComment.fields_to_check_for_data]):
             raise ValidationError("You must supply at least one of the following data in a comment: " +
@@ -75,7 +136,9 @@ class SectionCommentCreateSerializer(serializers.ModelSerializer):
         images = validated_data.pop('images', [])
         comment = SectionComment.objects.create(**validated_data)
         for image in images:
+            upload = image.pop('upload', None)
             CommentImage.objects.get_or_create(comment=comment, **image)
+            claim_image_upload(upload)
         return comment
 
 
@@ -97,8 +160,29 @@ class SectionCommentViewSet(BaseCommentViewSet):
     serializer_class = SectionCommentSerializer
     create_serializer_class = SectionCommentCreateSerializer
     filter_backends = (filters.DjangoFilterBackend, filters.OrderingFilter)
+    query_budgets = {'list': 4}
     ordering_fields = ('created_at', 'n_votes')
 
+    @list_route(methods=['post'])
+    def batch(self, request, **kwargs):
+        """
+        Create a list of comments at once, e.g. the answers of a map questionnaire.
+
+        Either all the comments are created or none of them is.
+        """
+        resp = self._check_may_comment(request)
+        if resp:
+            return resp
+
+        serializer = self.get_serializer(serializer_class=self.create_serializer_class, data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        kwargs = {}
+        if self.request.user.is_authenticated():
+            kwargs['created_by'] = self.request.user
+        comments = serializer.save(**kwargs)
+        serializer = self.get_serializer(instance=comments, many=True)
+        return response.Response(serializer.data, status=status.HTTP_201_CREATED)
+
 
 class RootSectionCommentSerializer(SectionCommentSerializer):
     """
@@ -112,10 +196,11 @@ class RootSectionCommentSerializer(SectionCommentSerializer):
 
 class CommentFilter(filters.FilterSet):
     hearing = django_filters.CharFilter(name='section__hearing__id')
+    bbox = BoundingBoxFilter()
 
     class Meta:
         model = SectionComment
-        fields = ['authorization_code', 'section', 'hearing']
+        fields = ['authorization_code', 'section', 'hearing', 'bbox']
 
 
 # root level SectionComment endpoint
@@ -123,12 +208,16 @@ class CommentViewSet(SectionCommentViewSet):
     serializer_class = RootSectionCommentSerializer
     pagination_class = DefaultLimitPagination
     filter_class = CommentFilter
+    query_budgets = {}
 
     def get_comment_parent_id(self):
         method = self.request.method
         data = self.request.data
 
         if method == 'POST':
+            if isinstance(data, list):  # a batch of comments, which must all be for the same section
+                sections = {datum.get('section') for datum in data if isinstance(datum, dict)}
+                return sections.pop() if len(sections) == 1 else None
             return data.get('section') if 'section' in data else None
         elif method in ('PUT', 'PATCH'):
             return data.get('section') if 'section' in data else self.get_object().section_id
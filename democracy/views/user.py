@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from rest_framework import permissions, serializers, viewsets
 
+from democracy.views.utils import RequestStatsMixin
+
 
 class ForeignKeyListSerializer(serializers.ReadOnlyField):
 
@@ -23,7 +25,7 @@ class UserDataSerializer(serializers.ModelSerializer):
         ]
 
 
-class UserDataViewSet(viewsets.ReadOnlyModelViewSet):
+class UserDataViewSet(RequestStatsMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = UserDataSerializer
     permission_classes = (permissions.IsAuthenticated,)
     lookup_field = 'uuid'
@@ -1,80 +1,38 @@
 # -*- coding: utf-8 -*-
 import base64
-from collections import OrderedDict
-from functools import lru_cache
-import json
+import binascii
+import re
+import tempfile
+from collections import defaultdict, OrderedDict
 
+import django_filters
 from django.conf import settings
-from django.contrib.gis.geos import GEOSGeometry
-from django.contrib.gis.gdal.error import GDALException
 from django.core.exceptions import ImproperlyConfigured
-from django.core.files.base import ContentFile
-from django.db.models.query import QuerySet
+from django.core.files.uploadedfile import UploadedFile
 from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.utils.crypto import get_random_string
+from django.utils.functional import cached_property
 from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
+from PIL import Image, ImageFile
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from rest_framework.relations import ManyRelatedField, MANY_RELATION_KWARGS, PrimaryKeyRelatedField
+from rest_framework.relations import PrimaryKeyRelatedField
 
+from democracy.models.base import SpatiallyIndexed
+from democracy.models.images import ImageUpload
+from democracy.renderers import GeoJSONRenderer
+from democracy.utils.geo import GeoJSONValidationError, parse_bbox, validate_geometry, ValidatedGeoJSON
+from democracy.utils.serializer_profiling import SerializerProfiler
 
-class AbstractFieldSerializer(serializers.RelatedField):
-    parent_serializer_class = serializers.ModelSerializer
-    many_field_class = ManyRelatedField
 
-    def to_representation(self, image):
-        return self.parent_serializer_class(image, context=self.context).data
-
-    @classmethod
-    def many_init(cls, *args, **kwargs):
-        list_kwargs = {'child_relation': cls(*args, **kwargs)}
-        for key in kwargs.keys():
-            if key in MANY_RELATION_KWARGS:
-                list_kwargs[key] = kwargs[key]
-        return cls.many_field_class(**list_kwargs)
-
-
-class AbstractSerializerMixin(object):
-
-    @classmethod
-    @lru_cache()
-    def get_field_serializer_class(cls, many_field_class=ManyRelatedField):
-        return type('%sFieldSerializer' % cls.Meta.model, (AbstractFieldSerializer,), {
-            "parent_serializer_class": cls,
-            "many_field_class": many_field_class,
-        })
-
-    @classmethod
-    def get_field_serializer(cls, **kwargs):
-        many_field_class = kwargs.pop("many_field_class", ManyRelatedField)
-        return cls.get_field_serializer_class(many_field_class=many_field_class)(**kwargs)
-
-
-class IOErrorIgnoringManyRelatedField(ManyRelatedField):
+class PublicFilteredImageField(serializers.Field):
     """
-    A ManyRelatedField that ignores IOErrors occurring during iterating the children.
+    Field for the images of an object, limited to the published ones unless the user is a superuser.
 
-    This is mainly useful for images that are referenced in the database but do not exist
-    on the server (where constructing them requires accessing them to populate the width
-    and height fields).
+    The images of many objects can be fetched with a single query with `prefetch_images()`.
     """
-    def to_representation(self, iterable):
-        out = []
-        if isinstance(iterable, QuerySet):
-            iterable = iterable.iterator()
-        while True:
-            try:
-                value = next(iterable)
-                out.append(self.child_relation.to_representation(value))
-            except StopIteration:
-                break
-            except IOError:
-                continue
-        return out
-
-
-class PublicFilteredImageField(serializers.Field):
 
     def __init__(self, *args, **kwargs):
         self.serializer_class = kwargs.pop('serializer_class', None)
@@ -82,7 +40,17 @@ class PublicFilteredImageField(serializers.Field):
             raise ImproperlyConfigured('Keyword argument serializer_class required')
         super().__init__(*args, **kwargs)
 
-    def to_representation(self, images):
+    @cached_property
+    def images_serializer(self):
+        serializer = self.serializer_class(many=True, read_only=True)
+        serializer.bind(self.field_name, self)  # this is needed to get context in the serializer
+        return serializer
+
+    @property
+    def prefetch_attr(self):
+        return 'visible_%s' % self.source
+
+    def filter_images(self, images):
         request = self.context.get('request')
 
         if request and request.user and request.user.is_authenticated() and request.user.is_superuser:
@@ -91,14 +59,33 @@ class PublicFilteredImageField(serializers.Field):
             images = images.public()
 
         # Remove duplicated rows
-        images = images.order_by('pk')
+        return images.order_by('pk')
 
-        serializer = self.serializer_class.get_field_serializer(
-            many=True, read_only=True, many_field_class=IOErrorIgnoringManyRelatedField
-        )
-        serializer.bind(self.source, self)  # this is needed to get context in the serializer
+    def prefetch_images(self, instances):
+        """
+        Fetch the images of all the given objects in one query and group them by object, so that
+        serializing the objects doesn't query their images one object at a time.
+        """
+        if not instances:
+            return
+        related_field = getattr(instances[0], self.source).field
+        images = self.filter_images(related_field.model.objects).filter(
+            **{'%s__in' % related_field.name: instances}
+        ).prefetch_related('translations')
+        images_by_instance = defaultdict(list)
+        for image in images:
+            images_by_instance[getattr(image, related_field.attname)].append(image)
+        for instance in instances:
+            setattr(instance, self.prefetch_attr, images_by_instance[instance.pk])
+
+    def get_attribute(self, instance):
+        prefetched_images = getattr(instance, self.prefetch_attr, None)
+        if prefetched_images is not None:
+            return prefetched_images
+        return self.filter_images(super().get_attribute(instance))
 
-        return serializer.to_representation(images)
+    def to_representation(self, images):
+        return self.images_serializer.to_representation(images)
 
 
 def filter_by_hearing_visible(queryset, request, hearing_lookup='hearing'):
@@ -126,6 +113,129 @@ def filter_by_hearing_visible(queryset, request, hearing_lookup='hearing'):
     return queryset.filter(q)
 
 
+class BoundingBoxFilter(django_filters.Filter):
+    """
+    Filter spatially indexed objects by a `minx,miny,maxx,maxy` bounding box.
+
+    Objects whose bounding box intersects the given one are included.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.lookup_prefix = kwargs.pop('lookup_prefix', '')
+        super().__init__(*args, **kwargs)
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        try:
+            bbox = parse_bbox(value)
+        except ValueError as e:
+            raise ValidationError({'bbox': [str(e)]})
+        return qs.filter(SpatiallyIndexed.get_bbox_q(bbox, prefix=self.lookup_prefix))
+
+
+class RequestStatsMixin(object):
+    """
+    Viewset mixin for request statistics and serializer profiling.
+
+    * When `democracy.middleware.RequestStatsMiddleware` is enabled, the time spent serializing
+      the response data is counted in the request stats. Viewsets may declare the maximum number
+      of queries of their actions in `query_budgets`, e.g. `{'list': 10}`; requests exceeding it
+      are logged and counted in the stats.
+    * Staff users can have the time and queries of each serializer field profiled by sending the
+      `X-Profile-Serializers: 1` header, or in all their requests with `DEMOCRACY_SERIALIZER_PROFILING`.
+      The response data is then returned in `data`, and the profile in `serializer_profile`. The fields of
+      the serializer from `get_serializer()` are profiled, and those of serializers created on the fly
+      if they use `ProfiledSerializerMixin`.
+    """
+    query_budgets = {}
+    serializer_profiler = None
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.serializer_profiler:
+            self.serializer_profiler.profile_fields(serializer)
+        stats = getattr(self.request, 'request_stats', None)
+        if stats is not None:
+            serializer.to_representation = stats.time_serializer(serializer.to_representation)
+        return serializer
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self._is_serializer_profiling_requested(request):
+            self.serializer_profiler = SerializerProfiler(name=type(self).__name__)
+            self.serializer_profiler.start()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.serializer_profiler:
+            self.serializer_profiler.stop()
+            if hasattr(response, 'data'):  # not a streaming response
+                response.data = {'data': response.data, 'serializer_profile': self.serializer_profiler.as_dict()}
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def _is_serializer_profiling_requested(self, request):
+        if not (request.user and request.user.is_staff):
+            return False
+        header = request.META.get('HTTP_X_PROFILE_SERIALIZERS', '').lower()
+        return header in ('1', 'true') or getattr(settings, 'DEMOCRACY_SERIALIZER_PROFILING', False)
+
+
+class GeoJSONStreamingMixin(object):
+    """
+    Viewset mixin for streaming unpaginated GeoJSON exports of the list endpoint.
+
+    `?format=geojson&stream=1` returns every matching object as a single FeatureCollection
+    that is serialized and sent in chunks of `stream_chunk_size` objects. Requests matching more
+    than `DEMOCRACY_GEOJSON_STREAM_MAX_OBJECTS` objects are rejected.
+    """
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        if self._is_geojson_stream_request():
+            queryset = self.filter_queryset(self.get_queryset())
+            self.check_stream_size(queryset)
+            return self.stream_geojson(queryset)
+        return super().list(request, *args, **kwargs)
+
+    def check_stream_size(self, queryset):
+        max_objects = getattr(settings, 'DEMOCRACY_GEOJSON_STREAM_MAX_OBJECTS', 10000)
+        if max_objects is not None and queryset.count() > max_objects:
+            raise ValidationError({'stream': [
+                _("At most %(max_objects)d objects can be streamed at once, use filters to narrow down the "
+                  "results.") % {'max_objects': max_objects}
+            ]})
+
+    def _is_geojson_stream_request(self):
+        return (
+            isinstance(self.request.accepted_renderer, GeoJSONRenderer) and
+            self.request.query_params.get('stream', '').lower() in ('1', 'true')
+        )
+
+    def iterate_in_chunks(self, queryset):
+        """
+        Iterate over the queryset a chunk at a time so that prefetches still apply within each chunk.
+        """
+        if not queryset.query.can_filter():  # sliced querysets are small enough as is
+            yield from queryset
+            return
+        pks = list(queryset.values_list('pk', flat=True))
+        for start in range(0, len(pks), self.stream_chunk_size):
+            chunk_pks = pks[start:start + self.stream_chunk_size]
+            objects = {obj.pk: obj for obj in queryset.filter(pk__in=chunk_pks)}
+            for pk in chunk_pks:
+                if pk in objects:
+                    yield objects[pk]
+
+    def stream_geojson(self, queryset):
+        serializer = self.get_serializer()
+        items = (serializer.to_representation(obj) for obj in self.iterate_in_chunks(queryset))
+        renderer = self.request.accepted_renderer
+        content = renderer.render_stream(
+            items, self.request.accepted_media_type, self.get_renderer_context()
+        )
+        return StreamingHttpResponse(content, content_type=renderer.media_type)
+
+
 class NestedPKRelatedField(PrimaryKeyRelatedField):
     """
     Support of showing and saving of expanded nesting or just a resource ID.
@@ -179,53 +289,162 @@ class GeoJSONField(serializers.JSONField):
             raise ValidationError('Invalid geojson format. "geometry" field is required. Got %(data)s' % {'data': data})
 
         try:
-            GEOSGeometry(json.dumps(data["geometry"]))
-        except GDALException:
+            bbox = validate_geometry(
+                data["geometry"],
+                max_vertices=settings.DEMOCRACY_GEOJSON_MAX_VERTICES,
+                bounds=settings.DEMOCRACY_GEOJSON_BOUNDS,
+                geos_vertex_threshold=settings.DEMOCRACY_GEOJSON_GEOS_VERTEX_THRESHOLD,
+            )
+        except GeoJSONValidationError:
             raise ValidationError('Invalid geojson format: %(data)s' % {'data': data})
-        return super(GeoJSONField, self).to_internal_value(data)
+        return ValidatedGeoJSON(super(GeoJSONField, self).to_internal_value(data), bbox=bbox)
+
+
+class ImageUploadField(PrimaryKeyRelatedField):
+    """
+    Field for referring to an `ImageUpload` by its token.
+    """
+    default_error_messages = {
+        'does_not_exist': _('Invalid or expired upload token "{pk_value}".'),
+    }
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('queryset', ImageUpload.objects.all())
+        super().__init__(**kwargs)
+
+    def get_queryset(self):
+        request = self.context.get('request')
+        return super().get_queryset().claimable_by(request.user if request else None)
+
+
+def validate_image_dimensions(width, height):
+    max_pixels = getattr(settings, 'MAX_IMAGE_PIXELS', None)
+    if max_pixels is not None and width * height > max_pixels:
+        raise ValidationError(_('Image should have less than {} pixels.'.format(max_pixels)))
 
 
 class Base64ImageField(serializers.ImageField):
+    """
+    Image field accepting `data:image/<ext>;base64,<data>` URIs.
+
+    The image is decoded in chunks into a spooled temporary file. Its decoded size is known
+    from the encoded length before decoding, and its header (format and pixel dimensions)
+    is checked as soon as the first chunks have been decoded.
+    """
+    # encoded characters decoded at a time; must be a multiple of 4
+    chunk_size = 64 * 1024
+    # how much decoded data may be needed to read the image header
+    max_header_size = 256 * 1024
+    base64_separator = ';base64,'
+    # characters that base64.b64decode ignores (or that are padding)
+    base64_ignored_chars = re.compile(r'[^A-Za-z0-9+/]')
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             # base64 encoded image - decode
-            try:
-                format, imgstr = data.split(';base64,')
-            except ValueError:
+            if data.count(self.base64_separator) != 1:
                 raise ValidationError(_('Not a valid base64 image.'))
+            offset = data.index(self.base64_separator) + len(self.base64_separator)
+            ext = data[:offset - len(self.base64_separator)].split('/')[-1]  # guess file extension
 
-            ext = format.split('/')[-1]  # guess file extension
-
-            data = ContentFile(base64.b64decode(imgstr), name='%s.%s' % (get_random_string(8), ext))
+            n_ignored_chars = sum(1 for _match in self.base64_ignored_chars.finditer(data, offset))
+            size = (len(data) - offset - n_ignored_chars) * 3 // 4
 
             # Do not limit image size if there is no settings for that
-            if data.size <= getattr(settings, 'MAX_IMAGE_SIZE', data.size):
-                return super(Base64ImageField, self).to_internal_value(data)
-            else:
+            if size > getattr(settings, 'MAX_IMAGE_SIZE', size):
                 raise ValidationError(_('Image size should be smaller than {} bytes.'.format(settings.MAX_IMAGE_SIZE)))
+
+            file = self._decode(data, offset)
+            self._verify_image(file)
+            return UploadedFile(
+                file, name='%s.%s' % (get_random_string(8), ext), content_type='image/%s' % ext, size=size
+            )
         raise ValidationError(_('Invalid content. Expected "data:image"'))
 
+    def _decode(self, data, offset):
+        file = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        parser = ImageFile.Parser()
+        header_size = 0
+        remainder = ''
+        try:
+            for start in range(offset, len(data), self.chunk_size):
+                chunk = remainder + self.base64_ignored_chars.sub('', data[start:start + self.chunk_size])
+                n_decodable = len(chunk) - len(chunk) % 4
+                remainder = chunk[n_decodable:]
+                decoded = base64.b64decode(chunk[:n_decodable])
+                file.write(decoded)
+                if parser.image is None:
+                    if header_size > self.max_header_size:
+                        self.fail('invalid_image')
+                    parser.feed(decoded)
+                    header_size += len(decoded)
+                    self._check_header(parser.image)
+            if remainder:
+                file.write(base64.b64decode(remainder + '=' * (-len(remainder) % 4)))
+        except binascii.Error:
+            file.close()
+            raise ValidationError(_('Not a valid base64 image.'))
+        except ValidationError:
+            file.close()
+            raise
+        if parser.image is None:
+            file.close()
+            self.fail('invalid_image')
+        file.seek(0)
+        return file
+
+    def _check_header(self, image):
+        if image is not None:
+            validate_image_dimensions(*image.size)
+
+    def _verify_image(self, file):
+        try:
+            Image.open(file).verify()
+        except Exception:
+            # Pillow raises a variety of exceptions for broken images
+            file.close()
+            self.fail('invalid_image')
+        file.seek(0)
+
+
+class TranslatableSerializerMetaclass(serializers.SerializerMetaclass):
+    """
+    Find the translated fields of a translatable serializer once, when the class is created.
 
-class TranslatableSerializer(serializers.Serializer):
+    They are set in the `translated_fields` class attribute, and the translation languages in
+    `translation_lang`. The Meta class is left as is, as it may be shared by several serializers.
+    """
+
+    def __new__(cls, name, bases, attrs):
+        new_class = super().__new__(cls, name, bases, attrs)
+        meta = getattr(new_class, 'Meta', None)
+        model = getattr(meta, 'model', None)
+        if model is not None:
+            fields = getattr(meta, 'fields', None)
+            if fields is None or fields == serializers.ALL_FIELDS:
+                # `fields = '__all__'` (or only `exclude`) means every translated field is serialized
+                exclude = tuple(getattr(meta, 'exclude', None) or ())
+                fields = [field for field in model._parler_meta._fields_to_model if field not in exclude]
+            else:
+                fields = tuple(fields)
+            new_class.translated_fields = [
+                field for field in model._parler_meta._fields_to_model if field in fields
+            ]
+        new_class.translation_lang = list(getattr(meta, 'translation_lang', None) or [
+            lang['code'] for lang in settings.PARLER_LANGUAGES[None]
+        ])
+        return new_class
+
+
+class TranslatableSerializer(serializers.Serializer, metaclass=TranslatableSerializerMetaclass):
     """
     A serializer for translated fields.
 
-    translated_fields must be declared in the Meta class.
+    The translated fields are those of the Meta class `fields` that are translated in the model.
     By default, translation languages obtained from settings, but can be overriden
     by defining translation_lang in the Meta class.
     """
-
-    def __init__(self, *args, **kwargs):
-        self.Meta.translated_fields = [
-            field for field in self.Meta.model._parler_meta._fields_to_model if field in self.Meta.fields
-        ]
-        non_translated_fields = [field for field in self.Meta.fields if field not in self.Meta.translated_fields]
-        self.Meta.fields = non_translated_fields
-        super(TranslatableSerializer, self).__init__(*args, **kwargs)
-        self.Meta.fields = non_translated_fields + self.Meta.translated_fields
-        if not hasattr(self.Meta, 'translation_lang'):
-            self.Meta.translation_lang = [lang['code'] for lang in settings.PARLER_LANGUAGES[None]]
+    translated_fields = []
 
     def _update_lang(self, ret, field, value, lang_code):
         if not ret.get(field) or isinstance(ret[field], str):
@@ -234,27 +453,35 @@ class TranslatableSerializer(serializers.Serializer):
             ret[field][lang_code] = value
         return ret
 
+    def _get_translations(self, instance):
+        if 'translations' in getattr(instance, '_prefetched_objects_cache', {}):
+            return [
+                translation for translation in instance.translations.all()
+                if translation.language_code in self.translation_lang
+            ]
+        return instance.translations.filter(language_code__in=self.translation_lang)
+
     def to_representation(self, instance):
         ret = super(TranslatableSerializer, self).to_representation(instance)
-        translations = instance.translations.filter(language_code__in=self.Meta.translation_lang)
+        translations = self._get_translations(instance)
 
         for translation in translations:
-            for field in self.Meta.translated_fields:
+            for field in self.translated_fields:
                 self._update_lang(ret, field, getattr(translation, field), translation.language_code)
         return ret
 
     def _validate_translated_field(self, field, data):
-        assert field in self.Meta.translated_fields, '%s is not a translated field' % field
+        assert field in self.translated_fields, '%s is not a translated field' % field
         if data is None:
             return
         if not isinstance(data, dict):
             raise ValidationError(_('Not a valid translation format. Expecting {"lang_code": %(data)s}' %
                                     {'data': data}))
         for lang in data:
-            if lang not in self.Meta.translation_lang:
+            if lang not in self.translation_lang:
                 raise ValidationError(_('%(lang)s is not a supported languages (%(allowed)s)' % {
                     'lang': lang,
-                    'allowed': self.Meta.translation_lang,
+                    'allowed': self.translation_lang,
                 }))
 
     def validate(self, data):
@@ -263,7 +490,7 @@ class TranslatableSerializer(serializers.Serializer):
         """
         validated_data = super().validate(data)
         errors = OrderedDict()
-        for field in self.Meta.translated_fields:
+        for field in self.translated_fields:
             try:
                 self._validate_translated_field(field, data.get(field, None))
             except ValidationError as e:
@@ -276,7 +503,7 @@ class TranslatableSerializer(serializers.Serializer):
 
     def to_internal_value(self, value):
         ret = super(TranslatableSerializer, self).to_internal_value(value)
-        for field in self.Meta.translated_fields:
+        for field in self.translated_fields:
             v = value.get(field)
             if v:
                 ret[field] = v
@@ -289,7 +516,7 @@ class TranslatableSerializer(serializers.Serializer):
         translated_data = self._pop_translated_data()
         if not self.instance:
             # forces the translation to be created, since the object cannot be saved without
-            self.validated_data[self.Meta.translated_fields[0]] = ''
+            self.validated_data[self.translated_fields[0]] = ''
         instance = super(TranslatableSerializer, self).save(**kwargs)
         self.save_translations(instance, translated_data)
         instance.save()
@@ -300,7 +527,7 @@ class TranslatableSerializer(serializers.Serializer):
         Separate data of translated fields from other data.
         """
         translated_data = {}
-        for meta in self.Meta.translated_fields:
+        for meta in self.translated_fields:
             translations = self.validated_data.pop(meta, {})
             if translations:
                 translated_data[meta] = translations
@@ -310,10 +537,10 @@ class TranslatableSerializer(serializers.Serializer):
         """
         Save translation data into translation objects.
         """
-        for field in self.Meta.translated_fields:
+        for field in self.translated_fields:
             translations = {}
             if not self.partial:
-                translations = {lang_code: '' for lang_code in self.Meta.translation_lang}
+                translations = {lang_code: '' for lang_code in self.translation_lang}
             translations.update(translated_data.get(field, {}))
 
             for lang_code, value in translations.items():
@@ -16,4 +16,7 @@ class User(AbstractUser):
         return self.nickname or self.get_real_name()
 
     def get_default_organization(self):
+        if 'admin_organizations' in getattr(self, '_prefetched_objects_cache', {}):
+            organizations = sorted(self.admin_organizations.all(), key=lambda org: (org.created_at, org.pk))
+            return organizations[0] if organizations else None
         return self.admin_organizations.order_by('created_at').first()
@@ -41,6 +41,7 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'democracy.middleware.RequestStatsMiddleware',
 )
 
 ROOT_URLCONF = 'kerrokantasi.urls'
@@ -92,7 +93,7 @@ CORS_URLS_REGEX = r'^/[a-z-]*/?v1/.*$'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'helusers.jwt.JWTAuthentication',
+        'democracy.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': ('rest_framework.filters.DjangoFilterBackend',),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
@@ -109,6 +110,11 @@ JWT_AUTH = {
     'JWT_AUDIENCE': 'kerrokantasi'
 }
 
+# Cache the users of validated JWT tokens in each process for this many seconds, at most until the token
+# expires, for up to DEMOCRACY_JWT_CACHE_SIZE tokens. 0 disables. See democracy.authentication.
+DEMOCRACY_JWT_CACHE_TTL = 60
+DEMOCRACY_JWT_CACHE_SIZE = 1000
+
 
 DEMOCRACY_UI_BASE_URL = 'http://localhost:8086'
 DEMOCRACY_PLUGINS = {
@@ -133,9 +139,60 @@ PARLER_LANGUAGES = {
 
 DETECT_LANGS_MIN_PROBA = 0.3
 
+# Tolerances (in degrees) of the simplified hearing areas precomputed for the map endpoint
+DEMOCRACY_MAP_SIMPLIFY_TOLERANCES = (0.00005, 0.0002, 0.001)
+
+# Limits for geometries submitted with comments. Polygons with more vertices than the threshold,
+# or with several rings, are also checked for validity with GEOS.
+DEMOCRACY_GEOJSON_MAX_VERTICES = 10000
+DEMOCRACY_GEOJSON_BOUNDS = (-180, -90, 180, 90)
+DEMOCRACY_GEOJSON_GEOS_VERTEX_THRESHOLD = 100
+
+# Maximum number of objects in a streamed ?format=geojson&stream=1 export, None for no limit
+DEMOCRACY_GEOJSON_STREAM_MAX_OBJECTS = 10000
+
+# Number of counter rows per section that new comments are counted in, instead of updating the comment
+# counts of the section and hearing directly. Run democracy_compact_comment_counters periodically when
+# enabled, and once more after disabling. 0 disables sharded counting.
+DEMOCRACY_COMMENT_COUNTER_SHARDS = 0
+
+# Maximum number of comments created with one request to the comments/batch/ endpoint
+DEMOCRACY_COMMENT_BATCH_MAX_SIZE = 100
+
+# Buffer anonymous comment votes and write them in batches: None to write each vote immediately, 'memory',
+# or the path of a SQLite journal file. See democracy.utils.vote_buffer.
+DEMOCRACY_VOTE_BUFFER = None
+DEMOCRACY_VOTE_BUFFER_FLUSH_SIZE = 100
+DEMOCRACY_VOTE_BUFFER_FLUSH_INTERVAL = 10
+
+# Record the SQL queries, SQL and serializer time and response size of each request, log them and aggregate
+# them by view for the /v1/request_stats/ endpoint. See democracy.middleware.RequestStatsMiddleware.
+DEMOCRACY_REQUEST_STATS = False
+# Flag requests that run the same SQL statement (with any parameters) at least this many times
+DEMOCRACY_REQUEST_STATS_DUPLICATE_THRESHOLD = 5
+# Return the time and queries of each serializer field along with the API responses to staff users. They can
+# also request it with the X-Profile-Serializers: 1 header. See democracy.utils.serializer_profiling.
+DEMOCRACY_SERIALIZER_PROFILING = False
+
+# Image variants generated on upload and listed in the API. A height of 0 keeps the aspect ratio.
+THUMBNAIL_ALIASES = {
+    '': {
+        'small': {'size': (320, 0)},
+        'medium': {'size': (768, 0)},
+        'large': {'size': (1600, 0)},
+    },
+}
+
 # CKEDITOR_CONFIGS is in __init__.py
 CKEDITOR_UPLOAD_PATH = 'uploads/'
 CKEDITOR_IMAGE_BACKEND = 'pillow'
 
 # Image files should not exceed 1MB (SI)
 MAX_IMAGE_SIZE = 10**6
+# Limit the pixel dimensions of uploaded images, as small files may still decompress into huge images
+MAX_IMAGE_PIXELS = 40 * 10**6
+# Hours an image uploaded to /v1/image_upload/ may be attached to a comment or section by its token
+DEMOCRACY_IMAGE_UPLOAD_EXPIRY_HOURS = 24
+# Uploads to /v1/image_upload/ allowed per user, or per IP address for anonymous users, e.g. '100/hour'.
+# None for no limit.
+DEMOCRACY_IMAGE_UPLOAD_RATE = '100/hour'